@@ -1,6 +1,6 @@
 """
 Description :
-    (1) Retrieves testing set correponding to experiment
+    (1) Retrieves testing set correponding to experiment from persisted split manifest
     (2) Loads ESTARFM predictions and groundtruth from test set
     (3) Compare with full reference image quality metrics
     (4) Dump scores
@@ -21,18 +21,18 @@ import numpy as np
 import rasterio
 from progress.bar import Bar
 
-from src.deep_reflectance_fusion.experiments import build_experiment
+from src.deep_reflectance_fusion.data import SplitManifest
 from src.deep_reflectance_fusion.evaluation import metrics
 from src.utils import load_yaml, save_json
 
 
 def main(args):
     root = args['--root']
-    experiment = build_experiment(load_yaml(args['--cfg']))
-    bar = Bar("Patch directory", max=len(experiment.test_set))
+    test_patches = test_patches_from(load_yaml(args['--cfg']))
+    bar = Bar("Patch directory", max=len(test_patches))
     iqa_metrics = defaultdict(list)
 
-    for patch_idx in patches_subset_from(experiment.test_set):
+    for patch_idx in test_patches:
         patch_directory = os.path.join(root, patch_idx)
         if not os.path.isdir(patch_directory):
             # Some patches aren't predicted by ESTARFM as it requires a sample before and one after
@@ -86,11 +86,12 @@ def main(args):
     save_json(dump_path, avg_iqa_metrics)
 
 
-def patches_subset_from(subset):
-    """Retrieves list of patch directory names used in dataset subset
+def test_patches_from(cfg):
+    """Retrieves list of patch directory names of experiment testing set out
+    of split manifest persisted by experiment, without building experiment
     """
-    f = lambda idx: os.path.basename(subset.dataset[idx].root)
-    return map(f, subset.indices)
+    split_manifest = SplitManifest.from_config(cfg=cfg['dataset'], seed=cfg['experiment']['seed'], create=False)
+    return split_manifest.subsets['test']
 
 
 def load_in_multiband_raster(files_paths):
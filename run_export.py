@@ -0,0 +1,67 @@
+"""
+Description :
+    (1) Loads experiment from checkpoint
+    (2) Extracts module reproducing experiment forward pass, e.g. generator
+        followed by residual connection for residual experiments
+    (3) Optionally folds batch normalization into convolutions and drops dropout layers
+    (4) Compiles it to TorchScript, frozen for inference when supported (torch >= 1.8)
+    (5) Checks exported model output matches eager experiment output
+    (6) Saves TorchScript artifact
+
+Usage: run_export.py --cfg=<config_file_path> --chkpt=<path_to_model_checkpoint> --o=<output_path> [--fuse] [--trace] [--atol=<tolerance>]
+
+Options:
+  --cfg=<config_file_path>                      Path to experiment configuration file
+  --chkpt=<path_to_model_checkpoint>            Path to trained experiment checkpoint to export generator from
+  --o=<output_path>                             Path to output TorchScript file
+  --fuse                                        Fold batch normalization into convolutions before export
+  --trace                                       Trace model instead of scripting it
+  --atol=<tolerance>                            Absolute tolerance of parity check with eager output [default: 1e-5]
+"""
+import os
+import copy
+from docopt import docopt
+import logging
+import torch
+from src.deep_reflectance_fusion import build_experiment
+from src.deep_reflectance_fusion.models.modules import fuse_for_inference, export_torchscript, check_parity
+from src.utils import load_yaml
+
+
+def main(args, cfg):
+    # Load experiment on CPU with trained weights
+    cfg['testing']['chkpt'] = args['--chkpt']
+    experiment = build_experiment(cfg, test=True).cpu().eval()
+    example = torch.rand(2, *experiment.model.input_size)
+
+    # Fold batch normalization layers for inference on a copy of inference model
+    inference_model = experiment.inference_model()
+    if args['--fuse']:
+        inference_model = fuse_for_inference(copy.deepcopy(inference_model))
+
+    # Compile to TorchScript
+    exported = export_torchscript(model=inference_model, example=example, trace=args['--trace'])
+
+    # Check parity with eager experiment forward pass
+    max_error = check_parity(model=experiment, exported=exported, example=example, atol=float(args['--atol']))
+    logging.info(f"Max absolute error wrt eager output : {max_error}")
+
+    # Save artifact
+    os.makedirs(os.path.dirname(os.path.abspath(args['--o'])), exist_ok=True)
+    torch.jit.save(exported, args['--o'])
+    logging.info(f"Saved TorchScript model at {args['--o']}")
+
+
+if __name__ == "__main__":
+    # Read input args
+    args = docopt(__doc__)
+
+    # Setup logging
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f'arguments: {args}')
+
+    # Load configuration file
+    cfg = load_yaml(args["--cfg"])
+
+    # Run export
+    main(args, cfg)
@@ -0,0 +1,163 @@
+"""
+Description :
+    (1) Loads experiment from checkpoint along with its persisted dataset split
+    (2) Quantizes generator to int8 : static post-training quantization calibrated
+        on training patches and weight-only quantization
+    (3) Evaluates fp32 and quantized generators on test split on CPU
+    (4) Reports PSNR/SSIM/SAM deltas wrt fp32 generator, speed-up and weights size
+    (5) Dumps report and quantized generators
+
+    Static int8 quantization runs in eager mode and only quantizes Conv2d blocks,
+    transposed convolutions, PReLU and skip concatenations staying in floating
+    point : it does not speed up the shipped Unet generators and is only
+    reported for accuracy. Weight-only int8 reduces weights size, not latency.
+
+Usage: run_quantization.py --cfg=<config_file_path> --chkpt=<path_to_model_checkpoint> --o=<output_dir> [--n_calibration=<n_batches>] [--n_test=<n_batches>] [--n_warmup=<n_batches>] [--backend=<quantized_engine>]
+
+Options:
+  --cfg=<config_file_path>                      Path to experiment configuration file
+  --chkpt=<path_to_model_checkpoint>            Path to trained experiment checkpoint
+  --o=<output_dir>                              Output directory
+  --n_calibration=<n_batches>                   Number of training batches used for calibration [default: 16]
+  --n_test=<n_batches>                          If specified, number of test batches evaluated
+  --n_warmup=<n_batches>                        Number of untimed forward passes run before timing each generator [default: 3]
+  --backend=<quantized_engine>                  Quantized engine, 'fbgemm' on x86 or 'qnnpack' on ARM [default: fbgemm]
+"""
+import os
+import io
+import time
+from collections import defaultdict
+from itertools import islice
+from docopt import docopt
+import logging
+import torch
+from src.deep_reflectance_fusion import build_experiment
+from src.deep_reflectance_fusion.models.modules import quantize_weights_int8, quantize_static_int8
+from src.utils import load_yaml, save_json
+
+
+def main(args, cfg):
+    # Load experiment on CPU with trained generator weights
+    cfg['testing']['chkpt'] = args['--chkpt']
+    experiment = build_experiment(cfg, test=True).cpu().eval()
+    generator = experiment.model
+
+    # Draw calibration inputs from training split
+    n_calibration = int(args['--n_calibration'])
+    calibration_inputs = [experiment._format_batch(batch)[0]
+                          for batch in islice(experiment.train_dataloader(), n_calibration)]
+
+    # Quantize generator
+    generators = {'fp32': generator,
+                  'weight_int8': quantize_weights_int8(generator),
+                  'static_int8': quantize_static_int8(model=generator,
+                                                      calibration_inputs=calibration_inputs,
+                                                      backend=args['--backend'])}
+
+    # Evaluate each generator on test split
+    n_test = int(args['--n_test']) if args['--n_test'] else None
+    n_warmup = int(args['--n_warmup'])
+    scores = {name: evaluate(experiment, model, n_test, n_warmup) for name, model in generators.items()}
+    report = make_report(scores)
+    for name, line in report.items():
+        logging.info(f"{name} : {line}")
+    logging.warning("Static int8 generator only quantizes Conv2d blocks and runs transposed convolutions, PReLU "
+                    "and skip concatenations in fp32, it is not expected to be faster than fp32 generator "
+                    f"(speed-up = {report['static_int8']['speed_up']:.2f})")
+
+    # Dump report and quantized generators
+    os.makedirs(args['--o'], exist_ok=True)
+    save_json(os.path.join(args['--o'], 'quantization_report.json'), report)
+    for name, model in generators.items():
+        torch.save(model, os.path.join(args['--o'], f'generator_{name}.pt'))
+
+
+@torch.no_grad()
+def evaluate(experiment, model, n_test=None, n_warmup=3):
+    """Runs experiment on test split with specified generator, averaging image
+    quality metrics and forward pass latency over test batches
+
+    Args:
+        experiment (ImageTranslationExperiment): experiment to evaluate
+        model (nn.Module): generator used by experiment
+        n_test (int): if specified, number of test batches evaluated
+        n_warmup (int): number of untimed forward passes on first test batch
+            run beforehand, such that allocations and kernels selection are
+            not accounted in latency (default: 3)
+
+    Returns:
+        type: dict[str, float]
+    """
+    fp32_model = experiment.model
+    experiment.model = model
+
+    # Warm up generator on first test batch
+    source, _ = experiment._format_batch(next(iter(experiment.test_dataloader())))
+    for _ in range(n_warmup):
+        experiment(source)
+
+    scores = defaultdict(list)
+    for batch in islice(experiment.test_dataloader(), n_test):
+        source, target = experiment._format_batch(batch)
+        start = time.perf_counter()
+        pred_target = experiment(source)
+        scores['latency'] += [time.perf_counter() - start]
+        psnr, ssim, sam = experiment._compute_batched_iqa_metrics(pred_target, target)
+        scores['psnr'] += [psnr.item()]
+        scores['ssim'] += [ssim.item()]
+        scores['sam'] += [sam.item()]
+    experiment.model = fp32_model
+    scores = {key: sum(value) / len(value) for key, value in scores.items()}
+    scores['size_mb'] = state_dict_size(model)
+    return scores
+
+
+def state_dict_size(model):
+    """Computes serialized size of model weights in MB
+
+    Args:
+        model (nn.Module)
+
+    Returns:
+        type: float
+    """
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 2 ** 20
+
+
+def make_report(scores):
+    """Reports scores of each generator along with metrics deltas, speed-up and
+    compression ratio wrt fp32 generator
+
+    Args:
+        scores (dict[str, dict[str, float]]): evaluation scores by generator name
+
+    Returns:
+        type: dict[str, dict[str, float]]
+    """
+    reference = scores['fp32']
+    report = dict()
+    for name, score in scores.items():
+        report[name] = {**score,
+                        'delta_psnr': score['psnr'] - reference['psnr'],
+                        'delta_ssim': score['ssim'] - reference['ssim'],
+                        'delta_sam': score['sam'] - reference['sam'],
+                        'speed_up': reference['latency'] / score['latency'],
+                        'compression': reference['size_mb'] / score['size_mb']}
+    return report
+
+
+if __name__ == "__main__":
+    # Read input args
+    args = docopt(__doc__)
+
+    # Setup logging
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f'arguments: {args}')
+
+    # Load configuration file
+    cfg = load_yaml(args["--cfg"])
+
+    # Run quantization
+    main(args, cfg)
@@ -29,11 +29,13 @@ def main(args, cfg):
     logger = make_logger(args)
     model_checkpoint = make_model_checkpoint(cfg['model_checkpoint'])
     early_stopping = build_callback(cfg['early_stopping'])
+    profiler = build_callback(cfg.get('profiler'))
 
     # Instantiate trainer instance
     params = {'logger': logger,
               'early_stop_callback': early_stopping,
               'checkpoint_callback': model_checkpoint,
+              'callbacks': [profiler] if profiler else [],
               'resume_from_checkpoint': cfg['experiment']['chkpt'],
               'precision': cfg['experiment']['precision'],
               'max_epochs': cfg['experiment']['max_epochs'],
@@ -23,3 +23,12 @@ def build_early_stopping(cfg):
     else:
         callback = False
     return callback
+
+
+@CALLBACKS.register('throughput_profiler')
+def build_throughput_profiler(cfg):
+    """Builds training throughput profiler callback
+    """
+    from .profiler import ThroughputProfiler
+    callback = ThroughputProfiler.build(cfg)
+    return callback
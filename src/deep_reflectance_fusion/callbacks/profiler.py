@@ -0,0 +1,273 @@
+import os
+import time
+import resource
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+import numpy as np
+import torch
+from torch.autograd.profiler import record_function
+import pytorch_lightning as pl
+
+
+class ThroughputProfiler(pl.Callback):
+    """Instruments training and validation steps to report where time is spent
+
+    At training start, the following phases are instrumented by wrapping
+    experiment and trainer methods and registering forward hooks :
+
+        - `data_wait`: time between end of a batch and start of the next one,
+            i.e. waiting for dataloader - between consecutive validation steps
+            in validation
+        - `h2d_copy`: transfer of batch to GPU
+        - `training_step`, `validation_step`: whole step methods
+        - `generator_forward`, `discriminator_forward`: forward passes of experiment
+            model and discriminator if any
+        - `metrics`: submission and collection of training metrics
+        - `logging`: trainer metrics logging
+        - `backward`, `optimizer_step`
+        - `step`: whole training batch processing, from batch start to batch end
+
+    Phases are prefixed by 'train/' or 'val/' depending on experiment mode.
+    Every `log_every_n_steps` training steps, latency percentiles of each
+    phase, training samples per second, ratio of time spent waiting for data
+    and peak memory are logged to the experiment logger under 'Profiler/' tags.
+    Peak memory is the peak allocated GPU memory since last report if CUDA is
+    used, else the peak resident memory of the process over its whole lifetime,
+    reported as `peak_rss_mb`.
+
+    If `trace_steps` is specified, a chrome trace of autograd profiler events
+    and instrumented phases over this window of training steps is dumped.
+
+    Args:
+        log_every_n_steps (int): number of training steps between reports (default: 50)
+        percentiles (list[int]): reported latency percentiles (default: (50, 90, 99))
+        synchronize (bool): if True, synchronizes CUDA device at phases boundaries
+            for accurate timings, at the expense of some overhead (default: True)
+        trace_steps (list[int]): optional [start, stop) window of training steps to trace
+        trace_path (str): path to chrome trace dump (default: logger_dir/trace.json)
+    """
+    def __init__(self, log_every_n_steps=50, percentiles=(50, 90, 99), synchronize=True,
+                 trace_steps=None, trace_path=None):
+        self.log_every_n_steps = log_every_n_steps
+        self.percentiles = percentiles
+        self.synchronize = synchronize
+        self.trace_steps = trace_steps
+        self.trace_path = trace_path
+        self._timings = defaultdict(list)
+        self._patched = []
+        self._handles = []
+        self._forward_starts = dict()
+        self._n_steps = 0
+        self._n_samples = 0
+        self._step_samples = None
+        self._step_start = None
+        self._last_batch_end = None
+        self._last_val_step_end = None
+        self._trace = None
+
+    def _now(self):
+        if self.synchronize and torch.cuda.is_available() and torch.cuda.is_initialized():
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    @staticmethod
+    def _prefix(pl_module):
+        return 'train' if pl_module.training else 'val'
+
+    @contextmanager
+    def phase(self, name):
+        """Times execution of enclosed block and records it under phase name
+
+        Args:
+            name (str): phase name
+        """
+        with record_function(name):
+            start = self._now()
+            yield
+            self._timings[name] += [self._now() - start]
+
+    def _wrap(self, obj, method_name, phase_name, pl_module):
+        """Replaces bound method of object by a timed version of it
+
+        Args:
+            obj (object): instance whose method is wrapped
+            method_name (str): name of method to wrap
+            phase_name (str): name of phase method execution is recorded under
+            pl_module (pl.LightningModule): experiment giving training or validation mode
+        """
+        method = getattr(obj, method_name, None)
+        if method is None:
+            return
+
+        @wraps(method)
+        def timed_method(*args, **kwargs):
+            with self.phase(f"{self._prefix(pl_module)}/{phase_name}"):
+                return method(*args, **kwargs)
+        setattr(obj, method_name, timed_method)
+        self._patched += [(obj, method_name)]
+
+    def _wrap_validation_step(self, pl_module):
+        """Replaces validation step by a timed version of it, also recording
+        time waited for data since end of previous validation step
+
+        Args:
+            pl_module (pl.LightningModule): experiment whose validation step is wrapped
+        """
+        method = getattr(pl_module, 'validation_step', None)
+        if method is None:
+            return
+
+        @wraps(method)
+        def timed_method(*args, **kwargs):
+            if self._last_val_step_end is not None:
+                self._timings['val/data_wait'] += [self._now() - self._last_val_step_end]
+            with self.phase('val/validation_step'):
+                output = method(*args, **kwargs)
+            self._last_val_step_end = self._now()
+            return output
+        pl_module.validation_step = timed_method
+        self._patched += [(pl_module, 'validation_step')]
+
+    def _hook_forward(self, module, phase_name, pl_module, count_samples=False):
+        """Registers hooks timing forward passes of module
+
+        Args:
+            module (nn.Module): module to time
+            phase_name (str): name of phase forward passes are recorded under
+            pl_module (pl.LightningModule): experiment giving training or validation mode
+            count_samples (bool): if True, counts training samples out of inputs batch size
+        """
+        def pre_hook(module, inputs):
+            if count_samples and pl_module.training and self._step_samples is None:
+                self._step_samples = inputs[0].size(0)
+            self._forward_starts[id(module)] = self._now()
+
+        def hook(module, inputs, output):
+            start = self._forward_starts.pop(id(module))
+            self._timings[f"{self._prefix(pl_module)}/{phase_name}"] += [self._now() - start]
+
+        self._handles += [module.register_forward_pre_hook(pre_hook), module.register_forward_hook(hook)]
+
+    def _instrument(self, trainer, pl_module):
+        """Wraps experiment and trainer methods and hooks models forward passes
+        """
+        self._wrap(trainer, 'transfer_batch_to_gpu', 'h2d_copy', pl_module)
+        self._wrap(trainer, 'log_metrics', 'logging', pl_module)
+        self._wrap(pl_module, 'training_step', 'training_step', pl_module)
+        self._wrap_validation_step(pl_module)
+        self._wrap(pl_module, 'backward', 'backward', pl_module)
+        self._wrap(pl_module, 'optimizer_step', 'optimizer_step', pl_module)
+        if hasattr(pl_module, 'training_metrics'):
+            self._wrap(pl_module.training_metrics, 'submit', 'metrics', pl_module)
+            self._wrap(pl_module.training_metrics, 'collect', 'metrics', pl_module)
+        self._hook_forward(pl_module.model, 'generator_forward', pl_module, count_samples=True)
+        if hasattr(pl_module, 'discriminator'):
+            self._hook_forward(pl_module.discriminator, 'discriminator_forward', pl_module)
+
+    def _restore(self):
+        """Removes wrappers and forward hooks
+        """
+        for obj, method_name in self._patched:
+            delattr(obj, method_name)
+        for handle in self._handles:
+            handle.remove()
+        self._patched, self._handles = [], []
+
+    def _peak_memory(self):
+        """Returns peak allocated memory in MB on GPU since last call if
+        available, else peak resident memory of process over its lifetime
+
+        Returns:
+            type: dict[str, float]
+        """
+        if torch.cuda.is_available() and torch.cuda.is_initialized():
+            peak_memory = {'Profiler/peak_memory_mb': torch.cuda.max_memory_allocated() / 2 ** 20}
+            torch.cuda.reset_peak_memory_stats()
+        else:
+            # Peak resident set size can not be reset, hence is never lower than at previous reports
+            peak_memory = {'Profiler/peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10}
+        return peak_memory
+
+    def _make_report(self):
+        """Computes latency percentiles of each phase, throughput, data waiting
+        ratio and peak memory since last report
+
+        Returns:
+            type: dict[str, float]
+        """
+        report = dict()
+        for name, timings in self._timings.items():
+            timings = 1000 * np.asarray(timings)
+            report[f"Profiler/{name}_mean_ms"] = timings.mean()
+            for q, value in zip(self.percentiles, np.percentile(timings, self.percentiles)):
+                report[f"Profiler/{name}_p{q}_ms"] = value
+
+        # Compute throughput and data waiting ratio over training steps
+        data_wait = sum(self._timings.get('train/data_wait', []))
+        step = sum(self._timings.get('train/step', []))
+        if data_wait + step > 0:
+            report['Profiler/train_samples_per_sec'] = self._n_samples / (data_wait + step)
+            report['Profiler/train_data_wait_ratio'] = data_wait / (data_wait + step)
+        report.update(self._peak_memory())
+        return report
+
+    def _log_report(self, trainer):
+        if self._timings and trainer.logger is not None:
+            trainer.logger.log_metrics(self._make_report(), step=trainer.global_step)
+        self._timings.clear()
+        self._n_samples = 0
+
+    def _start_trace(self):
+        kwargs = {'use_cuda': True} if torch.cuda.is_available() else dict()
+        self._trace = torch.autograd.profiler.profile(**kwargs)
+        self._trace.__enter__()
+
+    def _stop_trace(self, trainer):
+        self._trace.__exit__(None, None, None)
+        trace_path = self.trace_path or os.path.join(trainer.logger.log_dir, 'trace.json')
+        os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+        self._trace.export_chrome_trace(trace_path)
+        self._trace = None
+
+    def on_train_start(self, trainer, pl_module):
+        self._instrument(trainer, pl_module)
+
+    def on_train_end(self, trainer, pl_module):
+        if self._trace is not None:
+            self._stop_trace(trainer)
+        self._log_report(trainer)
+        self._restore()
+
+    def on_batch_start(self, trainer, pl_module):
+        now = self._now()
+        if self._last_batch_end is not None:
+            self._timings['train/data_wait'] += [now - self._last_batch_end]
+        if self.trace_steps and self._n_steps == self.trace_steps[0]:
+            self._start_trace()
+        self._step_samples = None
+        self._step_start = now
+
+    def on_batch_end(self, trainer, pl_module):
+        now = self._now()
+        self._timings['train/step'] += [now - self._step_start]
+        self._n_samples += self._step_samples or 0
+        self._n_steps += 1
+        if self._trace is not None and self._n_steps == self.trace_steps[1]:
+            self._stop_trace(trainer)
+        if self._n_steps % self.log_every_n_steps == 0:
+            self._log_report(trainer)
+        self._last_batch_end = self._now()
+
+    def on_validation_start(self, trainer, pl_module):
+        # Time spent in validation must not be counted as training data waiting
+        self._last_batch_end = None
+        self._last_val_step_end = None
+
+    @classmethod
+    def build(cls, cfg):
+        return cls(log_every_n_steps=cfg.get('log_every_n_steps', 50),
+                   percentiles=cfg.get('percentiles', (50, 90, 99)),
+                   synchronize=cfg.get('synchronize', True),
+                   trace_steps=cfg.get('trace_steps'),
+                   trace_path=cfg.get('trace_path'))
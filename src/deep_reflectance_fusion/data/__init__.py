@@ -13,8 +13,14 @@ def build_dataset(cfg):
 ################################################################################
 
 
-from .datasets import MODISLandsatReflectanceFusionDataset
+from .datasets import MODISLandsatReflectanceFusionDataset, MODISLandsatContextFusionDataset, FlatConcatDataset, \
+    ShardedFusionDataset, BatchFetchDataset
+from .samplers import build_batch_sampler
+from .transforms import RawFusionBatchTransform, BatchAugmentation
+from .split import SplitManifest
 
 
-__all__ = ['build_dataset',
-           'MODISLandsatReflectanceFusionDataset']
+__all__ = ['build_dataset', 'build_batch_sampler',
+           'MODISLandsatReflectanceFusionDataset', 'MODISLandsatContextFusionDataset',
+           'FlatConcatDataset', 'ShardedFusionDataset', 'BatchFetchDataset',
+           'RawFusionBatchTransform', 'BatchAugmentation', 'SplitManifest']
@@ -1,3 +1,8 @@
 from .modis_landsat_fusion import MODISLandsatReflectanceFusionDataset
+from .modis_landsat_context_fusion import MODISLandsatContextFusionDataset
+from .concat import FlatConcatDataset
+from .sharded import ShardedFusionDataset
+from .batch_fetch import BatchFetchDataset
 
-__all__ = ['MODISLandsatReflectanceFusionDataset']
+__all__ = ['MODISLandsatReflectanceFusionDataset', 'MODISLandsatContextFusionDataset', 'FlatConcatDataset',
+           'ShardedFusionDataset', 'BatchFetchDataset']
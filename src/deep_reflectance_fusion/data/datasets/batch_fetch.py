@@ -0,0 +1,77 @@
+from torch.utils.data import Dataset
+from src.prepare_data.preprocessing import FrameFetcher, PrefetchedFrames
+
+
+class BatchFetchDataset(Dataset):
+    """Wraps concatenated patches datasets to load whole batches at once, reading
+    all frames of a batch concurrently
+
+    Meant to be indexed with lists of indices drawn from a batch sampler, i.e.
+    passed to a dataloader as
+    ```
+    DataLoader(dataset, sampler=batch_sampler, batch_size=None, collate_fn=collate_fn)
+    ```
+    Frames requested by the batch samples which are neither preloaded nor
+    cached are fetched concurrently, samples are then assembled by patch datasets
+    out of fetched frames.
+
+    Args:
+        dataset (FlatConcatDataset): concatenated patches datasets
+        num_threads (int): number of frames reading threads (default: 8)
+    """
+    def __init__(self, dataset, num_threads=8):
+        self.dataset = dataset
+        self.fetcher = FrameFetcher(num_threads=num_threads)
+
+    def _frames_to_fetch(self, located):
+        """Lists paths of frames requested by samples which are neither
+        preloaded nor already cached
+
+        Args:
+            located (list[tuple[int]]): (dataset position, index within dataset) of samples
+
+        Returns:
+            type: list[str]
+        """
+        paths = []
+        for dataset_idx, sample_idx in located:
+            patch_dataset = self.dataset.datasets[dataset_idx]
+            if patch_dataset.pool is not None:
+                continue
+            for file_type, step in patch_dataset.frame_requests(sample_idx):
+                path = patch_dataset._get_path(file_type, step)
+                if patch_dataset.cache is None or path not in patch_dataset.cache:
+                    paths += [path]
+        return paths
+
+    def __getitem__(self, indices):
+        """Loads samples of batch
+
+        Args:
+            indices (list[int]): batch samples indices
+
+        Returns:
+            type: list
+        """
+        # Fetch all missing frames of batch concurrently
+        located = [self.dataset.locate(idx) for idx in indices]
+        frames = self.fetcher.fetch(self._frames_to_fetch(located))
+
+        # Assemble samples, serving fetched frames in place of patch datasets caches
+        patch_datasets = {dataset_idx: self.dataset.datasets[dataset_idx] for dataset_idx, _ in located}
+        caches = {dataset_idx: patch_dataset.cache for dataset_idx, patch_dataset in patch_datasets.items()}
+        try:
+            for dataset_idx, patch_dataset in patch_datasets.items():
+                patch_dataset.cache = PrefetchedFrames(frames=frames, cache=caches[dataset_idx])
+            samples = [patch_datasets[dataset_idx][sample_idx] for dataset_idx, sample_idx in located]
+        finally:
+            for dataset_idx, patch_dataset in patch_datasets.items():
+                patch_dataset.cache = caches[dataset_idx]
+        return samples
+
+    def __len__(self):
+        return len(self.dataset)
+
+    @property
+    def lengths(self):
+        return self.dataset.lengths
@@ -0,0 +1,48 @@
+import numpy as np
+from torch.utils.data import Dataset
+
+
+class FlatConcatDataset(Dataset):
+    """Concatenation of multiple datasets backed by a flat global index
+
+    Reducing a list of datasets with addition operator builds a left-deep chain
+    of nested ConcatDataset instances which lookup cost grows with the number
+    of concatenated datasets. We instead record for each sample the position
+    of its dataset and its index within this dataset into contiguous arrays
+    such that lookup is O(1) whatever the number of datasets.
+
+    Args:
+        datasets (iterable[Dataset]): datasets to concatenate
+    """
+    def __init__(self, datasets):
+        self.datasets = list(datasets)
+        self.lengths = np.array([len(dataset) for dataset in self.datasets], dtype=np.int64)
+        self.cumulative_sizes = np.cumsum(self.lengths)
+
+        # Map each sample to its (dataset, index within dataset) pair
+        offsets = self.cumulative_sizes - self.lengths
+        self._dataset_idx = np.repeat(np.arange(len(self.datasets), dtype=np.int32), self.lengths)
+        self._sample_idx = (np.arange(self.cumulative_sizes[-1] if len(self.datasets) else 0)
+                            - np.repeat(offsets, self.lengths)).astype(np.int32)
+
+    def locate(self, idx):
+        """Maps global sample index to dataset position and index within dataset
+
+        Args:
+            idx (int): global sample index
+
+        Returns:
+            type: tuple[int]
+        """
+        if idx < 0:
+            if -idx > len(self):
+                raise IndexError("absolute value of index should not exceed dataset length")
+            idx = len(self) + idx
+        return int(self._dataset_idx[idx]), int(self._sample_idx[idx])
+
+    def __getitem__(self, idx):
+        dataset_idx, sample_idx = self.locate(idx)
+        return self.datasets[dataset_idx][sample_idx]
+
+    def __len__(self):
+        return len(self._dataset_idx)
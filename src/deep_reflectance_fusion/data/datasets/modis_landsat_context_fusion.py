@@ -0,0 +1,130 @@
+import os
+import torch
+from src.prepare_data.preprocessing import PatchDataset
+from src.deep_reflectance_fusion.data import DATASETS
+from .modis_landsat_fusion import MODISLandsatReflectanceFusionDataset
+
+
+class PatchContextFusionDataset(PatchDataset):
+    """Extends PatchDataset by returning K last known landsat frames along with
+    their time deltas to current date, current modis frame and current landsat
+    frame as target, i.e.
+
+        Model input : (landsat_{t-1}, ..., landsat_{t-K}, Δt, modis_t)
+        Model target : (landsat_t)
+
+    Context frames are ordered from most recent to oldest. Time deltas are
+    expressed in days and divided by a time horizon such that they lie in a
+    range comparable to reflectance inputs. Since successive
+    samples windows overlap on K - 1 frames, a frame cache holding at least
+    K + 2 frames lets each frame be read once when time steps are traversed
+    in order.
+
+    Args:
+        root (str): path to directory where patches have been dumped
+        context_size (int): number of past landsat frames K
+        time_horizon (float): number of days time deltas are divided by (default: 365)
+        **kwargs: see PatchDataset
+    """
+    def __init__(self, root, context_size, time_horizon=365., **kwargs):
+        super().__init__(root=root, **kwargs)
+        self.context_size = context_size
+        self.time_horizon = time_horizon
+        self._dates = self.manifest.frame_dates(self.position)
+
+    def __getitem__(self, idx):
+        """Loads frame arrays
+
+        Args:
+            idx (int): dataset index - corresponds to time step
+
+        Returns:
+            type: tuple[torch.Tensor]
+        """
+        # Load past landsat frames first such that least recently used frame in
+        # cache is the one which drops out of next time step window
+        t = idx + self.context_size
+        steps = range(t - 1, t - self.context_size - 1, -1)
+        context = [self._apply_transform(self._load_frame(file_type='landsat', idx=step))
+                   for step in reversed(steps)]
+        context = torch.stack(context[::-1])
+
+        # Load frames from target time step
+        modis_frame, landsat_frame = super().__getitem__(t)
+
+        # Compute time deltas in days to target date and scale them by time horizon
+        time_deltas = [(self._dates[t] - self._dates[step]).astype(int) for step in steps]
+        time_deltas = torch.tensor(time_deltas, dtype=torch.float32) / self.time_horizon
+        return (context, time_deltas, modis_frame), landsat_frame
+
+    def frame_requests(self, idx):
+        t = idx + self.context_size
+        context_requests = [('landsat', step) for step in range(t - self.context_size, t)]
+        return context_requests + super().frame_requests(t)
+
+    def __len__(self):
+        length = max(0, super().__len__() - self.context_size)
+        return length
+
+
+@DATASETS.register('modis_landsat_context_fusion')
+class MODISLandsatContextFusionDataset(MODISLandsatReflectanceFusionDataset):
+    """Class for reflectance fusion of MODIS and Landsat frames task conditioned
+    on K past Landsat frames
+
+    Frame cache size is raised to at least K + 2 frames such that frames are
+    reused across overlapping context windows
+
+    Args:
+        root (str): path to directory where patches have been dumped
+        context_size (int): number of past landsat frames K
+        time_horizon (float): number of days time deltas are divided by (default: 365)
+        cache_size (int): number of frames held in the per-worker frame cache
+            shared by patches datasets (default: 0)
+        preload (str): if 'shared', preloads all frames into a frames pool in
+            shared memory read by all dataloading workers, if 'memmap' reads
+            frames from raw arrays files written by export_memmap.py (default: None)
+        memmap_root (str): directory where raw arrays files have been written
+            by export_memmap.py, if None uses root (default: None)
+        augmentation (dict): optional specifications of random flips, transposes
+            and rotations applied on training batches by `augmentation`
+    """
+    def __init__(self, root, context_size, time_horizon=365., cache_size=0, preload=None, memmap_root=None,
+                 augmentation=None):
+        self.context_size = context_size
+        self.time_horizon = time_horizon
+        super().__init__(root=root,
+                         cache_size=max(cache_size, context_size + 2),
+                         preload=preload,
+                         memmap_root=memmap_root,
+                         augmentation=augmentation)
+
+    def _load_datasets(self):
+        """Loads context datasets of each patch
+
+        Returns:
+            type: list[PatchContextFusionDataset]
+        """
+        datasets = [PatchContextFusionDataset(root=os.path.join(self.root, str(patch_directory)),
+                                              context_size=self.context_size,
+                                              time_horizon=self.time_horizon,
+                                              transform=self.transform,
+                                              cache=self.cache,
+                                              manifest=self.manifest,
+                                              position=position)
+                    for position, patch_directory in enumerate(self.manifest.names)]
+        return datasets
+
+    @classmethod
+    def build(cls, cfg):
+        # Context samples are collated as float frames with time deltas channels
+        unsupported = [key for key in ('raw', 'normalization') if cfg.get(key)]
+        if unsupported:
+            raise ValueError(f"Options {unsupported} are not supported by context fusion dataset")
+        return cls(root=cfg['root'],
+                   context_size=cfg['context_size'],
+                   time_horizon=cfg.get('time_horizon', 365.),
+                   cache_size=cfg.get('cache_size', 0),
+                   preload=cfg.get('preload'),
+                   memmap_root=cfg.get('memmap_root'),
+                   augmentation=cfg.get('augmentation'))
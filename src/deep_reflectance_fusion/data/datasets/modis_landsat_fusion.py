@@ -1,10 +1,9 @@
 import os
-import random
 from torch.utils.data import Dataset
-import torchvision.transforms.functional as F
 import torchvision.transforms as transforms
-from src.prepare_data.preprocessing import PatchDataset
+from src.prepare_data.preprocessing import PatchDataset, PatchManifest, FrameCache, FramePool, MemmapFrames
 from src.deep_reflectance_fusion.data import DATASETS
+from src.deep_reflectance_fusion.data.transforms import RawFusionBatchTransform, BatchAugmentation
 
 
 class PatchFusionDataset(PatchDataset):
@@ -13,6 +12,9 @@ class PatchFusionDataset(PatchDataset):
 
         Model input : (landsat_{t-1}, modis_t)
         Model target : (landsat_t)
+
+    Random flips augmentation is left to batch level augmentation stage, see
+    `BatchAugmentation`
     """
     def __getitem__(self, idx):
         """Loads frame arrays
@@ -27,24 +29,14 @@ class PatchFusionDataset(PatchDataset):
         modis_frame, landsat_frame = super().__getitem__(idx + 1)
 
         # Load landsat frame from current time step
-        last_landsat_path = self._landsat_path[idx]
-        last_landsat_frame = self._load_array(path=last_landsat_path)
+        last_landsat_frame = self._load_frame(file_type='landsat', idx=idx)
         last_landsat_frame = self._apply_transform(last_landsat_frame)
-        # last_landsat_frame = self.landsat_normalization(last_landsat_frame.float())
-        
-        # Apply random flip augmentation
-        if random.random() < -1:
-            modis_frame = F.hflip(modis_frame)
-            landsat_frame = F.hflip(landsat_frame)
-            last_landsat_frame = F.hflip(last_landsat_frame)
-
-        if random.random() < -1:
-            modis_frame = F.vflip(modis_frame)
-            landsat_frame = F.vflip(landsat_frame)
-            last_landsat_frame = F.vflip(last_landsat_frame)
 
         return (last_landsat_frame, modis_frame), landsat_frame
 
+    def frame_requests(self, idx):
+        return super().frame_requests(idx + 1) + [('landsat', idx)]
+
     def __len__(self):
         length = super().__len__() - 1
         return length
@@ -59,11 +51,36 @@ class MODISLandsatReflectanceFusionDataset(Dataset):
 
     Args:
         root (str): path to directory where patches have been dumped
+        cache_size (int): if > 0, number of frames held in the per-worker
+            frame cache shared by patches datasets (default: 0)
+        preload (str): if 'shared', preloads all frames into a frames pool in
+            shared memory read by all dataloading workers, if 'memmap' reads
+            frames from raw arrays files written by export_memmap.py (default: None)
+        memmap_root (str): directory where raw arrays files have been written
+            by export_memmap.py, if None uses root (default: None)
+        raw (bool): if True, frames are collated as raw int16 tensors and
+            converted to float on the whole batch by `batch_transform` (default: False)
+        normalization (dict, str): optional bandwise normalization of source frames
+            applied by `batch_transform`, only used if raw. If 'manifest', uses
+            frames statistics stored in patches manifest
+        augmentation (dict): optional specifications of random flips, transposes
+            and rotations applied on training batches by `augmentation`
     """
-    def __init__(self, root):
+    _preload_modes = {None, 'shared', 'memmap'}
+
+    def __init__(self, root, cache_size=0, preload=None, memmap_root=None, raw=False, normalization=None,
+                 augmentation=None):
+        assert preload in self._preload_modes, f"Unknown preload mode {preload}"
         self.root = root
+        self.memmap_root = memmap_root or root
+        self.raw = raw
         self.transform = transforms.ToTensor()
+        self.augmentation = BatchAugmentation.build(augmentation) if augmentation else None
+        self.cache = FrameCache(maxsize=cache_size) if cache_size else None
+        self.manifest = PatchManifest.from_root(root)
+        self.batch_transform = self._make_batch_transform(normalization) if raw else None
         self.datasets = self._load_datasets()
+        self.pool = self._preload_datasets(preload) if preload else None
 
     def _load_datasets(self):
         """Loads and concatenates datasets from multiple views of clouded optical,
@@ -83,11 +100,51 @@ class MODISLandsatReflectanceFusionDataset(Dataset):
         Returns:
             type: tuple[ProductDataset]
         """
-        # Load Patch datasets of each individual site
-        datasets = [PatchFusionDataset(root=os.path.join(self.root, patch_directory), transform=self.transform)
-                    for patch_directory in os.listdir(self.root)]
+        # Load Patch datasets of each individual site, all backed by the same manifest
+        datasets = [PatchFusionDataset(root=os.path.join(self.root, str(patch_directory)),
+                                       transform=self.transform,
+                                       cache=self.cache,
+                                       manifest=self.manifest,
+                                       position=position)
+                    for position, patch_directory in enumerate(self.manifest.names)]
         return datasets
 
+    def _make_batch_transform(self, normalization):
+        """Builds transform of raw batches, normalizing them with manifest
+        frames statistics if specified
+
+        Args:
+            normalization (dict, str)
+
+        Returns:
+            type: RawFusionBatchTransform
+        """
+        if normalization == 'manifest':
+            batch_transform = RawFusionBatchTransform.from_statistics(self.manifest.statistics)
+        else:
+            batch_transform = RawFusionBatchTransform.build(normalization)
+        return batch_transform
+
+    def _preload_datasets(self, preload):
+        """Loads frames of all patches datasets into a single shared memory
+        pool, or maps them from raw arrays files, and points datasets to it
+
+        Args:
+            preload (str): preloading mode in {'shared', 'memmap'}
+
+        Returns:
+            type: FramePool, MemmapFrames
+        """
+        if preload == 'memmap':
+            pool = MemmapFrames(self.memmap_root)
+            pool_offsets = pool.patch_offsets(self.manifest.names)
+        else:
+            pool, pool_offsets = FramePool.from_datasets(self.datasets)
+        for dataset, pool_offset in zip(self.datasets, pool_offsets):
+            dataset.pool = pool
+            dataset.pool_offset = pool_offset
+        return pool
+
     def __getitem__(self, idx):
         return self.datasets[idx]
 
@@ -96,4 +153,10 @@ class MODISLandsatReflectanceFusionDataset(Dataset):
 
     @classmethod
     def build(cls, cfg):
-        return cls(root=cfg['root'])
+        return cls(root=cfg['root'],
+                   cache_size=cfg.get('cache_size', 0),
+                   preload=cfg.get('preload'),
+                   memmap_root=cfg.get('memmap_root'),
+                   raw=cfg.get('raw', False),
+                   normalization=cfg.get('normalization'),
+                   augmentation=cfg.get('augmentation'))
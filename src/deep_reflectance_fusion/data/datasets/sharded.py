@@ -0,0 +1,164 @@
+import os
+import random
+import torch
+import torch.distributed as dist
+from torch.utils.data import IterableDataset, get_worker_info
+from src.prepare_data.preprocessing import ShardReader
+
+
+class ShardedFusionDataset(IterableDataset):
+    """Streaming counterpart of MODISLandsatReflectanceFusionDataset reading
+    patches time series from shards written by ShardWriter
+
+    Shards are read sequentially and each patch record is unfolded into fusion
+    samples ((landsat_{t-1}, modis_t), landsat_t) as returned by PatchFusionDataset.
+    Shards hold all patches of dataset, hence patches names of a subset must be
+    specified to stream this subset only, e.g. training patches of a split.
+
+    Samples are split deterministically across distributed ranks and dataloading
+    workers : with R ranks and W workers per rank, the stream of samples of all
+    shards is dealt in turn, worker w of rank r reading samples r + R * w,
+    r + R * w + R * W, etc. Leftover samples are dropped such that all ranks
+    read the same number of samples, and records holding no sample of a split
+    are not read by it. If shuffled, shards order is permuted at each epoch with
+    a seed shared by all ranks and workers such that splits stay disjoint, and
+    samples are drawn at random from a shuffle buffer.
+
+    Args:
+        root (str): directory where shards have been written
+        names (list[str]): if specified, names of patches to read from shards,
+            records of other patches are skipped (default: None)
+        shuffle (bool): if True, shuffles shards order and samples (default: False)
+        shuffle_buffer (int): number of samples held in shuffle buffer (default: 1024)
+        seed (int): random seed shared by all ranks and workers (default: 0)
+    """
+    def __init__(self, root, names=None, shuffle=False, shuffle_buffer=1024, seed=0):
+        self.root = root
+        self.names = set(names) if names is not None else None
+        self.shuffle = shuffle
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+        self.shards_paths = sorted(os.path.join(root, name) for name in os.listdir(root)
+                                   if name.endswith('.bin'))
+        self._n_samples = self._count_samples()
+
+    def set_epoch(self, epoch):
+        """Sets epoch to draw different shards order and shuffling at each epoch
+
+        Args:
+            epoch (int)
+        """
+        self.epoch = epoch
+
+    def _count_samples(self):
+        """Counts fusion samples of patches read from shards out of shards indices
+
+        Returns:
+            type: int
+        """
+        n_samples = 0
+        for shard_path in self.shards_paths:
+            for record in ShardReader(shard_path, names=self.names).index['records']:
+                n_samples += max(len(record['dates']) - 1, 0)
+        return n_samples
+
+    @staticmethod
+    def _get_world_size():
+        """Returns number of distributed ranks, 1 if not distributed
+
+        Returns:
+            type: int
+        """
+        if dist.is_available() and dist.is_initialized():
+            return dist.get_world_size()
+        return 1
+
+    def _get_split(self):
+        """Computes index of current split and total number of splits out of
+        distributed rank and dataloading worker
+
+        Returns:
+            type: tuple[int]
+        """
+        rank = dist.get_rank() if dist.is_available() and dist.is_initialized() else 0
+        world_size = self._get_world_size()
+        worker_info = get_worker_info()
+        worker_id, num_workers = (0, 1) if worker_info is None else (worker_info.id, worker_info.num_workers)
+        split = rank + world_size * worker_id
+        n_splits = world_size * num_workers
+        return split, n_splits
+
+    def _shards_order(self):
+        """Returns paths to shards in reading order of current epoch
+
+        Returns:
+            type: list[str]
+        """
+        shards_paths = list(self.shards_paths)
+        if self.shuffle:
+            random.Random(self.seed + self.epoch).shuffle(shards_paths)
+        return shards_paths
+
+    def _iter_samples(self, shards_paths):
+        """Reads shards sequentially and unfolds records into fusion samples,
+        only yielding samples of current split
+
+        Args:
+            shards_paths (list[str])
+
+        Yields:
+            type: tuple[torch.Tensor]
+        """
+        split, n_splits = self._get_split()
+
+        # Drop leftover samples such that all ranks read the same number of samples
+        world_size = self._get_world_size()
+        n_samples = self._n_samples // world_size * world_size
+
+        position = 0
+        for shard_path in shards_paths:
+            # Only read records holding at least one sample of current split
+            reader = ShardReader(shard_path, names=self.names)
+            records, positions = [], []
+            for record in reader.index['records']:
+                n_record_samples = max(len(record['dates']) - 1, 0)
+                first_position = position + (split - position) % n_splits
+                if first_position < min(position + n_record_samples, n_samples):
+                    records += [record]
+                    positions += [position]
+                position += n_record_samples
+            reader.index['records'] = records
+
+            for record, record_position in zip(reader, positions):
+                modis = torch.from_numpy(record['modis'].copy())
+                landsat = torch.from_numpy(record['landsat'].copy())
+                for t in range(1, len(landsat)):
+                    sample_position = record_position + t - 1
+                    if sample_position < n_samples and sample_position % n_splits == split:
+                        yield (landsat[t - 1], modis[t]), landsat[t]
+
+    def __iter__(self):
+        samples = self._iter_samples(self._shards_order())
+        if not self.shuffle or self.shuffle_buffer <= 1:
+            yield from samples
+            return
+
+        # Draw samples at random from shuffle buffer
+        split, _ = self._get_split()
+        rng = random.Random(self.seed + self.epoch * 65536 + split)
+        buffer = []
+        for sample in samples:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(sample)
+                continue
+            idx = rng.randrange(len(buffer))
+            buffer[idx], sample = sample, buffer[idx]
+            yield sample
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def __len__(self):
+        """Number of samples read by current rank, leftovers being dropped
+        """
+        return self._n_samples // self._get_world_size()
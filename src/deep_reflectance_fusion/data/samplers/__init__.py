@@ -0,0 +1,35 @@
+from .time_series import TimeSeriesBatchSampler
+from .patch_group import PatchGroupBatchSampler
+
+"""
+Mapping of batch samplers names to classes
+"""
+BATCH_SAMPLERS = {'time_series': TimeSeriesBatchSampler,
+                  'patch_group': PatchGroupBatchSampler}
+
+
+def build_batch_sampler(cfg, lengths, batch_size, shuffle=False, drop_last=False):
+    """Builds batch sampler over concatenated patches datasets
+
+    Args:
+        cfg (dict): batch sampler configuration with name of sampler and
+            optional sampler specific arguments
+        lengths (list[int]): length of each concatenated patch dataset
+        batch_size (int): number of samples per batch
+        shuffle (bool): if True, randomizes samples order
+        drop_last (bool): if True, drops last batch if smaller than batch size
+
+    Returns:
+        type: torch.utils.data.Sampler
+    """
+    kwargs = cfg.copy()
+    name = kwargs.pop('name')
+    batch_sampler = BATCH_SAMPLERS[name](lengths=lengths,
+                                         batch_size=batch_size,
+                                         shuffle=shuffle,
+                                         drop_last=drop_last,
+                                         **kwargs)
+    return batch_sampler
+
+
+__all__ = ['build_batch_sampler', 'TimeSeriesBatchSampler', 'PatchGroupBatchSampler']
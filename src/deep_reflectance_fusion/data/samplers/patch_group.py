@@ -0,0 +1,87 @@
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+
+
+class PatchGroupBatchSampler(Sampler):
+    """Batch sampler over concatenated patches time series datasets drawing
+    batches out of small groups of patches, several time steps at a time
+
+    Patches are shuffled and gathered into groups of `batch_size / steps_per_patch`
+    patches. Within a group, runs of `steps_per_patch` randomly drawn time steps
+    are taken from each patch in turn and laid out into batches. Each batch
+    hence only touches a handful of patch directories, and consecutive batches
+    keep touching the same ones until their time steps are exhausted, which
+    preserves page cache and HDF5 chunk cache locality.
+
+    `steps_per_patch` tunes the locality/randomness trade-off : 1 yields
+    batches of time steps from `batch_size` distinct patches, `batch_size`
+    yields batches of time steps of a single patch.
+
+    Args:
+        lengths (list[int]): length of each concatenated patch dataset
+        batch_size (int): number of samples per batch
+        shuffle (bool): if True, shuffles patches order and time steps within patches
+        drop_last (bool): if True, drops last batch if smaller than batch size
+        steps_per_patch (int): number of time steps of a patch drawn at once (default: 4)
+    """
+    def __init__(self, lengths, batch_size, shuffle=False, drop_last=False, steps_per_patch=4):
+        assert 1 <= steps_per_patch <= batch_size, "steps_per_patch must lie in [1, batch_size]"
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.steps_per_patch = steps_per_patch
+        self.group_size = -(-batch_size // steps_per_patch)
+        self._offsets = np.concatenate([[0], np.cumsum(self.lengths)[:-1]])
+
+    def _permutation(self, n):
+        """Returns random permutation if shuffled, identity else
+
+        Args:
+            n (int)
+
+        Returns:
+            type: np.ndarray
+        """
+        return torch.randperm(n).numpy() if self.shuffle else np.arange(n)
+
+    def _group_indices(self, group):
+        """Lays out time steps of group of patches taking runs of time steps
+        from each patch in turn
+
+        Args:
+            group (np.ndarray): patches of group
+
+        Returns:
+            type: np.ndarray
+        """
+        # Chunk time steps of each patch into runs
+        runs = []
+        for patch in group:
+            steps = self._offsets[patch] + self._permutation(self.lengths[patch])
+            runs += [[steps[i:i + self.steps_per_patch] for i in range(0, len(steps), self.steps_per_patch)]]
+
+        # Interleave runs of patches of group
+        n_rounds = max(map(len, runs), default=0)
+        indices = [patch_runs[i] for i in range(n_rounds) for patch_runs in runs if i < len(patch_runs)]
+        return np.concatenate(indices + [np.empty(0, dtype=np.int64)])
+
+    def __iter__(self):
+        # Gather shuffled patches into groups and lay out their time steps
+        order = self._permutation(len(self.lengths))
+        groups = [order[i:i + self.group_size] for i in range(0, len(order), self.group_size)]
+        indices = np.concatenate([self._group_indices(group) for group in groups] + [np.empty(0, dtype=np.int64)])
+
+        # Chunk into batches
+        for i in range(0, len(indices), self.batch_size):
+            batch = indices[i:i + self.batch_size]
+            if self.drop_last and len(batch) < self.batch_size:
+                break
+            yield batch.tolist()
+
+    def __len__(self):
+        n_samples = int(self.lengths.sum())
+        if self.drop_last:
+            return n_samples // self.batch_size
+        return (n_samples + self.batch_size - 1) // self.batch_size
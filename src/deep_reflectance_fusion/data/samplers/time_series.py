@@ -0,0 +1,63 @@
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+
+
+class TimeSeriesBatchSampler(Sampler):
+    """Batch sampler over concatenated patches time series datasets yielding
+    batches of consecutive time steps of the same patches
+
+    Dataloaders dispatch each batch to a single worker, hence consecutive
+    time steps of a patch are loaded by the same worker which can reuse frames
+    shared by successive samples, e.g. in PatchFusionDataset sample at time step
+    t and t+1 both load landsat frame at t+1
+
+    Patches time series are chunked into batches following patches order. If
+    shuffled, patches order and batches order are randomly permuted.
+
+    Args:
+        lengths (list[int]): length of each concatenated patch dataset
+        batch_size (int): number of samples per batch
+        shuffle (bool): if True, shuffles patches and batches orders
+        drop_last (bool): if True, drops last batch if smaller than batch size
+    """
+    def __init__(self, lengths, batch_size, shuffle=False, drop_last=False):
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self._offsets = np.concatenate([[0], np.cumsum(self.lengths)[:-1]])
+
+    def _patches_order(self):
+        """Returns order in which patches time series are traversed
+
+        Returns:
+            type: np.ndarray
+        """
+        if self.shuffle:
+            order = torch.randperm(len(self.lengths)).numpy()
+        else:
+            order = np.arange(len(self.lengths))
+        return order
+
+    def __iter__(self):
+        # Lay out samples indices patch after patch with time steps in order
+        order = self._patches_order()
+        indices = np.concatenate([np.arange(self._offsets[i], self._offsets[i] + self.lengths[i])
+                                  for i in order] + [np.empty(0, dtype=np.int64)])
+
+        # Chunk into batches
+        batches = [indices[i:i + self.batch_size] for i in range(0, len(indices), self.batch_size)]
+        if self.drop_last and len(batches) > 0 and len(batches[-1]) < self.batch_size:
+            batches = batches[:-1]
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches)).tolist()]
+        for batch in batches:
+            yield batch.tolist()
+
+    def __len__(self):
+        n_samples = int(self.lengths.sum())
+        if self.drop_last:
+            return n_samples // self.batch_size
+        return (n_samples + self.batch_size - 1) // self.batch_size
+
@@ -0,0 +1,156 @@
+import os
+import hashlib
+import numpy as np
+from src.prepare_data.preprocessing import PatchManifest
+from src.utils import load_json, save_json
+
+
+class SplitManifest:
+    """Site-level split of patches dataset into train/val/test subsets of
+    patches directories names, persisted as a json file
+
+    Split is drawn over patches names sorted alphabetically, hence only depends
+    on the random seed, the split ratios and the set of patches - not on the
+    order in which patches directories are listed. Split files are keyed by
+    seed and by a fingerprint of the patches dataset and split ratios, such
+    that reruns and evaluation tools load the same subsets without having to
+    build the dataset :
+    ```
+    split_cache/
+    └── split_seed73_3f2a...json
+    ```
+
+    Args:
+        subsets (dict[str, list[str]]): patches directories names by subset
+        seed (int): random seed used to draw split
+        fingerprint (str): fingerprint of patches dataset and split ratios
+    """
+    _subsets = ('train', 'val', 'test')
+    _filename = 'split_seed{seed}_{fingerprint}.json'
+
+    def __init__(self, subsets, seed=None, fingerprint=None):
+        self.subsets = subsets
+        self.seed = seed
+        self.fingerprint = fingerprint
+
+    @staticmethod
+    def make_fingerprint(manifest, split):
+        """Hashes patches names and time series lengths along with split ratios
+
+        Args:
+            manifest (PatchManifest): patches dataset manifest
+            split (list[float]): dataset split ratios in [0, 1] as [train, val]
+                or [train, val, test]
+
+        Returns:
+            type: str
+        """
+        order = np.argsort(manifest.names)
+        sha = hashlib.sha1()
+        for name, horizon in zip(manifest.names[order], manifest.patches['horizon'][order]):
+            sha.update(f"{name}:{horizon};".encode())
+        sha.update(repr([float(r) for r in split]).encode())
+        return sha.hexdigest()[:16]
+
+    @classmethod
+    def from_manifest(cls, manifest, split, seed=None):
+        """Draws split of patches listed in manifest
+
+        Args:
+            manifest (PatchManifest): patches dataset manifest
+            split (list[float]): dataset split ratios in [0, 1] as [train, val]
+                or [train, val, test]
+            seed (int): random seed
+
+        Returns:
+            type: SplitManifest
+        """
+        # Convert ratios to lengths - leftovers go to last subset
+        assert np.isclose(sum(split), 1), f"Split ratios {split} do not sum to 1"
+        names = sorted(manifest.names.tolist())
+        lengths = [int(r * len(names)) for r in split]
+        lengths[-1] += len(names) - sum(lengths)
+
+        # Permute sorted names and cut into subsets
+        permutation = np.random.RandomState(seed).permutation(len(names))
+        bounds = np.cumsum([0] + lengths)
+        subsets = {key: [names[i] for i in permutation[start:end]]
+                   for key, start, end in zip(cls._subsets, bounds[:-1], bounds[1:])}
+        return cls(subsets=subsets, seed=seed, fingerprint=cls.make_fingerprint(manifest, split))
+
+    @classmethod
+    def _path(cls, directory, manifest, split, seed=None):
+        fingerprint = cls.make_fingerprint(manifest, split)
+        return os.path.join(directory, cls._filename.format(seed=seed, fingerprint=fingerprint))
+
+    @classmethod
+    def get_or_create(cls, directory, manifest, split, seed=None):
+        """Loads split file matching seed and fingerprint from directory if it
+        exists, else draws split and saves it
+
+        Args:
+            directory (str): directory where split files are cached
+            manifest (PatchManifest): patches dataset manifest
+            split (list[float]): dataset split ratios
+            seed (int): random seed
+
+        Returns:
+            type: SplitManifest
+        """
+        path = cls._path(directory, manifest, split, seed)
+        if os.path.isfile(path):
+            return cls.load(path)
+        split_manifest = cls.from_manifest(manifest=manifest, split=split, seed=seed)
+        os.makedirs(directory, exist_ok=True)
+        split_manifest.save(path)
+        return split_manifest
+
+    @classmethod
+    def from_config(cls, cfg, seed=None, create=True):
+        """Loads split specified in dataset configuration, reading patches
+        manifest only
+
+        Args:
+            cfg (dict): dataset configuration with keys 'root', 'split' and 'split_cache'
+            seed (int): random seed
+            create (bool): if False, raises an error instead of drawing a new
+                split when no split file matches configuration (default: True)
+
+        Returns:
+            type: SplitManifest
+        """
+        assert cfg.get('split_cache'), "Dataset configuration does not specify a split cache directory"
+        manifest = PatchManifest.from_root(cfg['root'])
+        split = list(cfg['split'].values())
+        if not create:
+            path = cls._path(cfg['split_cache'], manifest, split, seed)
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"No persisted split at {path}, run experiment with split cache first")
+            return cls.load(path)
+        return cls.get_or_create(directory=cfg['split_cache'],
+                                 manifest=manifest,
+                                 split=split,
+                                 seed=seed)
+
+    @classmethod
+    def load(cls, path):
+        content = load_json(path)
+        return cls(subsets=content['subsets'], seed=content['seed'], fingerprint=content['fingerprint'])
+
+    def save(self, path):
+        save_json(path, {'seed': self.seed,
+                         'fingerprint': self.fingerprint,
+                         'subsets': self.subsets})
+
+    def indices(self, subset, manifest):
+        """Returns positions in manifest of patches of specified subset
+
+        Args:
+            subset (str): subset name in {'train', 'val', 'test'}
+            manifest (PatchManifest): patches dataset manifest
+
+        Returns:
+            type: list[int]
+        """
+        positions = {name: position for position, name in enumerate(manifest.names.tolist())}
+        return [positions[name] for name in self.subsets.get(subset, [])]
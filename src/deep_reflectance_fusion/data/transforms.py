@@ -0,0 +1,220 @@
+import torch
+
+
+class RawFusionBatchTransform:
+    """Batched counterpart of per sample frames processing for datasets served
+    as raw integer frames
+
+    Converts collated integer reflectance batch to floating point, stacks source
+    frames along channels and optionally normalizes them bandwise. Meant to be
+    applied once per batch in main process - ideally after batch has been moved
+    to device - such that workers only ship int16 frames.
+
+    Only source frames are normalized, target is left as raw reflectance such
+    that predictions, losses and metrics are computed in the same range
+    than with per sample processing.
+
+    Args:
+        landsat_mean (list[float]): optional bandwise mean of landsat frames
+        landsat_std (list[float]): optional bandwise standard deviation of landsat frames
+        modis_mean (list[float]): optional bandwise mean of modis frames
+        modis_std (list[float]): optional bandwise standard deviation of modis frames
+    """
+    def __init__(self, landsat_mean=None, landsat_std=None, modis_mean=None, modis_std=None):
+        self.landsat_mean = landsat_mean
+        self.landsat_std = landsat_std
+        self.modis_mean = modis_mean
+        self.modis_std = modis_std
+        self._affine = {'landsat': self._make_affine(landsat_mean, landsat_std),
+                        'modis': self._make_affine(modis_mean, modis_std)}
+        self._affine_by_device = dict()
+
+    @staticmethod
+    def _make_affine(mean, std):
+        """Folds bandwise normalization into (scale, shift) pair such that
+        (x - mean) / std = scale * x + shift
+
+        Args:
+            mean (list[float]): bandwise mean, zero if None
+            std (list[float]): bandwise standard deviation, one if None
+
+        Returns:
+            type: tuple[torch.Tensor], None if neither mean nor std are specified
+        """
+        if mean is None and std is None:
+            return None
+        n_bands = len(mean if mean is not None else std)
+        mean = torch.tensor(mean if mean is not None else [0.] * n_bands, dtype=torch.float64)
+        std = torch.tensor(std if std is not None else [1.] * n_bands, dtype=torch.float64)
+        scale, shift = 1 / std, -mean / std
+        return scale.float().view(1, -1, 1, 1), shift.float().view(1, -1, 1, 1)
+
+    def _normalize(self, frames, file_type):
+        """Normalizes bandwise (B, C, H, W) frames batch inplace with a single
+        fused multiply-add
+
+        Args:
+            frames (torch.Tensor): (B, C, H, W) floating point frames
+            file_type (str): type of frames in {'landsat', 'modis'}
+
+        Returns:
+            type: torch.Tensor
+        """
+        if self._affine[file_type] is None:
+            return frames
+
+        # Cache normalization tensors on device
+        key = (file_type, frames.device)
+        if key not in self._affine_by_device:
+            self._affine_by_device[key] = [x.to(frames.device) for x in self._affine[file_type]]
+        scale, shift = self._affine_by_device[key]
+        return torch.addcmul(shift, frames, scale, out=frames)
+
+    def __call__(self, batch):
+        """Formats raw batch as float (source, target) pair
+
+        Args:
+            batch (tuple): raw batch as ((landsat, modis), target) integer tensors
+
+        Returns:
+            type: tuple[torch.Tensor]
+        """
+        (landsat, modis), target = batch
+
+        # Convert and stack source frames into single preallocated tensor
+        batch_size, channels, height, width = landsat.shape
+        source = landsat.new_empty((batch_size, channels + modis.size(1), height, width),
+                                   dtype=torch.float32)
+        landsat_source, modis_source = source[:, :channels], source[:, channels:]
+        landsat_source.copy_(landsat)
+        modis_source.copy_(modis)
+
+        # Normalize source frames bandwise
+        self._normalize(landsat_source, 'landsat')
+        self._normalize(modis_source, 'modis')
+        target = target.float()
+        return source, target
+
+    @classmethod
+    def from_statistics(cls, statistics):
+        """Builds transform normalizing with frames statistics by file type as
+        stored in patches dataset manifest
+
+        Args:
+            statistics (dict[str, dict[str, np.ndarray]])
+
+        Returns:
+            type: RawFusionBatchTransform
+        """
+        assert statistics, "No frames statistics found, see compute_statistics.py"
+        return cls(landsat_mean=statistics['landsat']['mean'].tolist(),
+                   landsat_std=statistics['landsat']['std'].tolist(),
+                   modis_mean=statistics['modis']['mean'].tolist(),
+                   modis_std=statistics['modis']['std'].tolist())
+
+    @classmethod
+    def build(cls, cfg):
+        """Builds transform out of normalization specifications as
+        ```
+        landsat:
+          mean: [...]
+          std: [...]
+        modis:
+          mean: [...]
+          std: [...]
+        ```
+
+        Args:
+            cfg (dict): normalization specifications, can be None
+
+        Returns:
+            type: RawFusionBatchTransform
+        """
+        cfg = cfg or dict()
+        landsat_cfg = cfg.get('landsat') or dict()
+        modis_cfg = cfg.get('modis') or dict()
+        return cls(landsat_mean=landsat_cfg.get('mean'),
+                   landsat_std=landsat_cfg.get('std'),
+                   modis_mean=modis_cfg.get('mean'),
+                   modis_std=modis_cfg.get('std'))
+
+
+class BatchAugmentation:
+    """Random flips, transposes and 90° rotations applied on whole collated
+    batches, consistently across all tensors of a batch
+
+    Each sample is drawn an element of the dihedral group of the square by
+    composing random horizontal flip, vertical flip and transpose - 90° rotations
+    being composition of transpose and flip. Each transformation is applied at
+    once on the subset of samples it has been drawn for, such that source and
+    target frames of a sample stay aligned.
+
+    Args:
+        hflip (bool): if True, randomly flips samples horizontally (default: True)
+        vflip (bool): if True, randomly flips samples vertically (default: True)
+        transpose (bool): if True, randomly transposes samples, only applicable
+            to square frames (default: True)
+        p (float): probability to apply each transformation (default: 0.5)
+    """
+    def __init__(self, hflip=True, vflip=True, transpose=True, p=0.5):
+        self.hflip = hflip
+        self.vflip = vflip
+        self.transpose = transpose
+        self.p = p
+
+    def _draw(self, batch_size, device):
+        """Draws samples to apply each transformation on
+
+        Args:
+            batch_size (int)
+            device (torch.device)
+
+        Returns:
+            type: list[tuple[callable, torch.Tensor]]
+        """
+        transforms = []
+        if self.hflip:
+            transforms += [lambda x: x.flip(-1)]
+        if self.vflip:
+            transforms += [lambda x: x.flip(-2)]
+        if self.transpose:
+            transforms += [lambda x: x.transpose(-1, -2)]
+        draws = torch.rand(len(transforms), batch_size, device=device) < self.p
+        return [(transform, draw.nonzero().flatten()) for transform, draw in zip(transforms, draws)]
+
+    def __call__(self, *tensors):
+        """Augments inplace batch tensors sharing same batch size
+
+        Args:
+            *tensors (torch.Tensor): (B, C, H, W) tensors
+
+        Returns:
+            type: tuple[torch.Tensor]
+        """
+        batch_size = tensors[0].size(0)
+        if self.transpose:
+            assert all(x.size(-1) == x.size(-2) for x in tensors), "Transpose requires square frames"
+        for transform, idx in self._draw(batch_size, tensors[0].device):
+            if len(idx) == 0:
+                continue
+            for x in tensors:
+                x[idx] = transform(x[idx])
+        return tensors
+
+    @classmethod
+    def build(cls, cfg):
+        """Builds augmentation out of specifications as
+        ```
+        hflip: True
+        vflip: True
+        transpose: True
+        p: 0.5
+        ```
+
+        Args:
+            cfg (dict): augmentation specifications
+
+        Returns:
+            type: BatchAugmentation
+        """
+        return cls(**cfg)
@@ -1,2 +1,3 @@
 from .iqa import *
 from .classification import *
+from .batched_iqa import *
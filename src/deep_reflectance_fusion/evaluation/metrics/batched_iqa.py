@@ -0,0 +1,159 @@
+import math
+import torch
+import torch.nn.functional as F
+
+
+def _bandwise_max(ref, tgt):
+    """Computes maximum value of each band over both images
+
+    Args:
+        ref (torch.Tensor): (B, C, H, W)
+        tgt (torch.Tensor): (B, C, H, W)
+
+    Returns:
+        type: torch.Tensor - (B, C, 1, 1)
+    """
+    ref_max = ref.flatten(2).max(dim=2)[0]
+    tgt_max = tgt.flatten(2).max(dim=2)[0]
+    return torch.max(ref_max, tgt_max)[..., None, None]
+
+
+def batch_psnr(ref, tgt, data_range=1.):
+    """Computes bandwise peak signal to noise ratio of a batch of target images
+    wrt to a batch of reference images
+
+    Args:
+        ref (torch.Tensor): Reference images as (B, C, H, W)
+        tgt (torch.Tensor): Target images as (B, C, H, W)
+        data_range (float): data range of images (default: 1)
+
+    Returns:
+        type: torch.Tensor - (B, C)
+    """
+    mse = (ref - tgt).pow(2).mean(dim=(2, 3))
+    return 10 * torch.log10(data_range ** 2 / mse)
+
+
+def _uniform_kernel(window_size, dtype, device):
+    kernel = torch.full((window_size,), 1. / window_size, dtype=dtype, device=device)
+    return kernel
+
+
+def _gaussian_kernel(window_size, sigma, dtype, device):
+    coords = torch.arange(window_size, dtype=dtype, device=device) - (window_size - 1) / 2
+    kernel = torch.exp(-coords.pow(2) / (2 * sigma ** 2))
+    return kernel / kernel.sum()
+
+
+def batch_ssim(ref, tgt, window_size=7, gaussian=False, sigma=1.5, data_range=2.,
+               K1=0.01, K2=0.03):
+    """Computes bandwise mean structural similarity index of a batch of target
+    images wrt to a batch of reference images
+
+    "Image quality assessment: from error visibility to structural similarity",
+    Wang et. al 2004
+
+    Local moments of all bands are computed at once by convolving the stacked
+    images, squared images and images product with a separable window. Only
+    windows fully contained in images are kept, as done by skimage which crops
+    borders of the similarity map. Defaults match skimage structural_similarity
+    on float images, i.e. a 7x7 uniform window with sample covariance and a data
+    range of 2.
+
+    Args:
+        ref (torch.Tensor): Reference images as (B, C, H, W)
+        tgt (torch.Tensor): Target images as (B, C, H, W)
+        window_size (int): side-length of the sliding window, must be odd (default: 7)
+        gaussian (bool): if True, uses gaussian weighted window of width sigma
+            and population covariance instead of uniform window, window size
+            being derived from sigma as done by skimage, i.e. 11 for sigma 1.5
+            (default: False)
+        sigma (float): standard deviation of gaussian window (default: 1.5)
+        data_range (float): data range of images (default: 2)
+        K1 (float): luminance stabilization constant (default: 0.01)
+        K2 (float): contrast stabilization constant (default: 0.03)
+
+    Returns:
+        type: torch.Tensor - (B, C)
+    """
+    batch_size, channels, height, width = ref.shape
+    if gaussian:
+        # Truncate gaussian window at 3.5 sigma as skimage does
+        window_size = 2 * int(3.5 * sigma + 0.5) + 1
+        kernel = _gaussian_kernel(window_size, sigma, ref.dtype, ref.device)
+        cov_norm = 1.
+    else:
+        kernel = _uniform_kernel(window_size, ref.dtype, ref.device)
+        cov_norm = window_size ** 2 / (window_size ** 2 - 1)
+
+    # Stack images and their products as (5 * B * C, 1, H, W) and filter with separable window
+    moments = torch.stack([ref, tgt, ref * ref, tgt * tgt, ref * tgt])
+    moments = moments.view(-1, 1, height, width)
+    moments = F.conv2d(moments, kernel.view(1, 1, -1, 1))
+    moments = F.conv2d(moments, kernel.view(1, 1, 1, -1))
+    ux, uy, uxx, uyy, uxy = moments.view(5, batch_size, channels, *moments.shape[-2:])
+
+    # Compute local variances and covariance
+    vx = cov_norm * (uxx - ux * ux)
+    vy = cov_norm * (uyy - uy * uy)
+    vxy = cov_norm * (uxy - ux * uy)
+
+    # Compute similarity map and average over windows
+    C1 = (K1 * data_range) ** 2
+    C2 = (K2 * data_range) ** 2
+    numerator = (2 * ux * uy + C1) * (2 * vxy + C2)
+    denominator = (ux * ux + uy * uy + C1) * (vx + vy + C2)
+    ssim_map = numerator / denominator
+    return ssim_map.mean(dim=(2, 3))
+
+
+def batch_sam(ref, tgt):
+    """Computes pixelwise normalized Spectrale Angle Mapper of a batch of target
+    images wrt to a batch of reference images
+
+    "Discrimination among semi-arid landscape endmembers using the spectral
+    angle mapper (SAM) algorithm", Boardman et al. 1993
+
+    Args:
+        ref (torch.Tensor): Reference images as (B, C, H, W)
+        tgt (torch.Tensor): Target images as (B, C, H, W)
+
+    Returns:
+        type: torch.Tensor - (B, H, W)
+    """
+    # Compute pixelwise bands inner product
+    eps = torch.finfo(torch.float16).eps
+    kernel = (ref * tgt).sum(dim=1)
+
+    # Normalize inner products
+    square_norm_ref = ref.pow(2).sum(dim=1).clamp(min=eps)
+    square_norm_tgt = tgt.pow(2).sum(dim=1).clamp(min=eps)
+    normalized_kernel = kernel / torch.sqrt(square_norm_ref * square_norm_tgt)
+
+    # Convert to angles
+    normalized_angles = torch.acos(normalized_kernel.clamp(min=-1, max=1)) / math.pi
+    return normalized_angles
+
+
+def batch_iqa(ref, tgt, **ssim_kwargs):
+    """Computes bandwise PSNR and SSIM and pixelwise SAM of a batch of images,
+    on images device
+
+    As done in per-band evaluation, bands are clamped to positive values and
+    rescaled by the maximum value of the band over both images before computing
+    PSNR and SSIM.
+
+    Args:
+        ref (torch.Tensor): Reference images as (B, C, H, W)
+        tgt (torch.Tensor): Target images as (B, C, H, W)
+        ssim_kwargs (dict): optional batch_ssim parameters
+
+    Returns:
+        type: tuple[torch.Tensor] - (B, C), (B, C), (B, H, W)
+    """
+    ref, tgt = ref.clamp(min=0), tgt.clamp(min=0)
+    data_range = _bandwise_max(ref, tgt)
+    psnr = batch_psnr(ref / data_range, tgt / data_range)
+    ssim = batch_ssim(ref / data_range, tgt / data_range, **ssim_kwargs)
+    sam = batch_sam(ref, tgt)
+    return psnr, ssim, sam
@@ -1,38 +1,41 @@
 import torch
 
 
-def accuracy(predicted, groundtruth, thresh=0.5):
+def accuracy(predicted, groundtruth, thresh=0.5, item=True):
     """Accuracy on single label classification
     Args:
         predicted (torch.Tensor): batch of probability distributions on classes
         groundtruth (torch.Tensor): batch of probability distributions on classes
+        item (bool): if False, returns score as tensor without synchronizing device
     """
     predicted = predicted > thresh
     correct = torch.sum(predicted.float() == groundtruth).float()
     score = correct / groundtruth.numel()
-    return score.item()
+    return score.item() if item else score
 
 
-def precision(predicted, groundtruth, thresh=0.5):
+def precision(predicted, groundtruth, thresh=0.5, item=True):
     """Precision on single label classification
     Args:
         predicted (torch.Tensor): batch of probability distributions on classes
         groundtruth (torch.Tensor): batch of probability distributions on classes
+        item (bool): if False, returns score as tensor without synchronizing device
     """
     positives = predicted > thresh
     true_positives = torch.sum(positives[positives].float() == groundtruth[positives]).float()
     precision = true_positives.div(positives.sum())
-    return precision.item()
+    return precision.item() if item else precision
 
 
-def recall(predicted, groundtruth, thresh=0.5):
+def recall(predicted, groundtruth, thresh=0.5, item=True):
     """Recall on single label classification
     Args:
         predicted (torch.Tensor): batch of probability distributions on classes
         groundtruth (torch.Tensor): batch of probability distributions on classes
+        item (bool): if False, returns score as tensor without synchronizing device
     """
     predicted = predicted > thresh
     positives = groundtruth == 1
     true_positives = torch.sum(predicted[positives].float() == groundtruth[positives]).float()
     recall = true_positives.div(positives.sum())
-    return recall.item()
+    return recall.item() if item else recall
@@ -1,11 +1,14 @@
 import pytorch_lightning as pl
 import torch
-from torch.utils.data import random_split
+from torch.utils.data import DataLoader, BatchSampler, RandomSampler, SequentialSampler, Subset, random_split
 import numpy as np
 from collections import defaultdict
 
 from src.utils import setseed
+from src.deep_reflectance_fusion.data import FlatConcatDataset, BatchFetchDataset, ShardedFusionDataset, \
+    SplitManifest, build_batch_sampler
 from src.deep_reflectance_fusion.evaluation import metrics
+from src.deep_reflectance_fusion.experiments.utils import collate
 
 
 class Experiment(pl.LightningModule):
@@ -84,18 +87,22 @@ class Experiment(pl.LightningModule):
         lr_scheduler_kwargs (dict): paramters of lr scheduler defined in LightningModule.configure_optimizers
         criterion (nn.Module): differentiable training criterion (default: None)
         seed (int): random seed (default: None)
+        split_cache (str): if specified, directory where site-level split of
+            patches dataset is persisted as a split manifest (default: None)
     """
     def __init__(self, model, dataset, split, dataloader_kwargs, optimizer_kwargs,
-                 lr_scheduler_kwargs=None, criterion=None, seed=None):
+                 lr_scheduler_kwargs=None, criterion=None, seed=None, split_cache=None):
         super().__init__()
         self.model = model
+        self.dataset = dataset
         self.criterion = criterion
         self.dataloader_kwargs = dataloader_kwargs
         self.optimizer_kwargs = optimizer_kwargs
         self.lr_scheduler_kwargs = lr_scheduler_kwargs
         self._split_and_set_dataset(dataset=dataset,
                                     split=split,
-                                    seed=seed)
+                                    seed=seed,
+                                    split_cache=split_cache)
 
     @classmethod
     def build(cls, cfg, test=False):
@@ -190,8 +197,29 @@ class Experiment(pl.LightningModule):
         """
         return random_split(dataset, lengths)
 
+    def _split_from_manifest(self, dataset, split, split_cache, seed=None):
+        """Splits dataset following split manifest persisted in cache
+        directory, drawing and saving it if needed
+
+        Args:
+            dataset (torch.utils.data.Dataset): dataset backed by a patches manifest
+            split (list[float]): dataset split ratios in [0, 1] as [train, val]
+                or [train, val, test]
+            split_cache (str): directory where split manifests are persisted
+            seed (int): random seed
+
+        Returns:
+            type: list[Subset]
+        """
+        split_manifest = SplitManifest.get_or_create(directory=split_cache,
+                                                     manifest=dataset.manifest,
+                                                     split=split,
+                                                     seed=seed)
+        subsets = SplitManifest._subsets[:len(split)]
+        return [Subset(dataset, split_manifest.indices(subset, dataset.manifest)) for subset in subsets]
+
     @setseed('torch')
-    def _split_and_set_dataset(self, dataset, split, seed=None, *args, **kwargs):
+    def _split_and_set_dataset(self, dataset, split, seed=None, split_cache=None, *args, **kwargs):
         """Splits dataset into train/val or train/val/test and sets
         splitted datasets as attributes
 
@@ -200,15 +228,23 @@ class Experiment(pl.LightningModule):
             split (list[float]): dataset split ratios in [0, 1] as [train, val]
                 or [train, val, test]
             seed (int): random seed
+            split_cache (str): if specified, directory where split manifest is persisted
         """
-        # Convert specified ratios to lengths
-        lengths = self._convert_split_ratios_to_length(total_length=len(dataset),
-                                                       split=split,
-                                                       *args, **kwargs)
+        if split_cache:
+            # Load or draw site-level split persisted as split manifest
+            datasets = self._split_from_manifest(dataset=dataset,
+                                                 split=split,
+                                                 split_cache=split_cache,
+                                                 seed=seed)
+        else:
+            # Convert specified ratios to lengths
+            lengths = self._convert_split_ratios_to_length(total_length=len(dataset),
+                                                           split=split,
+                                                           *args, **kwargs)
 
-        # Split dataset
-        datasets = self._random_split(dataset=dataset,
-                                      lengths=lengths)
+            # Split dataset
+            datasets = self._random_split(dataset=dataset,
+                                          lengths=lengths)
 
         # Set datasets attributes
         self.train_set = datasets[0]
@@ -219,6 +255,10 @@ class Experiment(pl.LightningModule):
     def model(self):
         return self._model
 
+    @property
+    def dataset(self):
+        return self._dataset
+
     @property
     def criterion(self):
         return self._criterion
@@ -251,6 +291,10 @@ class Experiment(pl.LightningModule):
     def model(self, model):
         self._model = model
 
+    @dataset.setter
+    def dataset(self, dataset):
+        self._dataset = dataset
+
     @criterion.setter
     def criterion(self, criterion):
         self._criterion = criterion
@@ -294,13 +338,150 @@ class ImageTranslationExperiment(Experiment):
         criterion (nn.Module): differentiable training criterion (default: None)
         seed (int): random seed (default: None)
     """
-    def _compute_classification_metrics(self, output_real_sample, output_fake_sample):
+    def _make_dataloader(self, subset, shuffle=False):
+        """Concatenates patches datasets of subset and instantiates dataloader
+
+        If a batch sampler is specified in dataloader kwargs as
+        ```
+        sampler:
+          name: 'time_series'
+        ```
+        batches are drawn from this sampler instead of being built by the
+        dataloader out of batch size and shuffle arguments
+
+        If a number of collate buffers is specified, batches are written into
+        a ring of reusable preallocated buffers by the collate function
+
+        If a number of fetch threads is specified, frames of each batch are
+        fetched concurrently on a thread pool before samples are assembled
+
+        If shards are specified as
+        ```
+        shards:
+          root: 'data/shards/modis_landsat'
+          shuffle_buffer: 1024
+        ```
+        samples of the subset patches are streamed from shards written by
+        export_shards.py instead of being read from patches directories
+
+        Args:
+            subset (torch.utils.data.Subset): subset of patches datasets
+            shuffle (bool): if True, shuffles samples at every epoch
+
+        Returns:
+            type: DataLoader
+        """
+        # Setup loader kwargs - raw datasets are collated as integer frames and
+        # context datasets with time deltas as channels
+        loader_kwargs = self.dataloader_kwargs.copy()
+        sampler_cfg = loader_kwargs.pop('sampler', None)
+        collate_buffers = loader_kwargs.pop('collate_buffers', None)
+        fetch_threads = loader_kwargs.pop('fetch_threads', None)
+        shards_cfg = loader_kwargs.pop('shards', None)
+
+        if shards_cfg:
+            # Stream samples of subset patches only such that split is preserved
+            if sampler_cfg or fetch_threads or getattr(self.dataset, 'context_size', None):
+                raise ValueError("Shards streaming does not support batch samplers, fetch threads "
+                                 "and context fusion datasets")
+            names = [str(subset.dataset.manifest.names[i]) for i in subset.indices]
+            dataset = ShardedFusionDataset(names=names, shuffle=shuffle, **shards_cfg)
+
+            # Iterable datasets shuffle samples themselves
+            shuffle = False
+        else:
+            # Concatenate all patches datasets into single flat indexed dataset
+            dataset = FlatConcatDataset(subset)
+
+        if getattr(self.dataset, 'context_size', None):
+            if collate_buffers:
+                raise ValueError("Collate buffers are not supported by context fusion datasets")
+            collate_fn = collate.stack_context_frames
+        elif collate_buffers:
+            collate_fn = collate.BufferedStackInputFrames(n_buffers=collate_buffers,
+                                                          pin_memory=loader_kwargs.get('pin_memory', False),
+                                                          raw=self._is_raw)
+        else:
+            collate_fn = collate.stack_raw_frames if self._is_raw else collate.stack_input_frames
+        loader_kwargs.update({'dataset': dataset,
+                              'collate_fn': collate_fn})
+
+        # If specified, delegate batching to batch sampler
+        if sampler_cfg or fetch_threads:
+            batch_size = loader_kwargs.pop('batch_size', 1)
+            drop_last = loader_kwargs.pop('drop_last', False)
+            if sampler_cfg:
+                batch_sampler = build_batch_sampler(cfg=sampler_cfg,
+                                                    lengths=dataset.lengths,
+                                                    batch_size=batch_size,
+                                                    shuffle=shuffle,
+                                                    drop_last=drop_last)
+            else:
+                sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+                batch_sampler = BatchSampler(sampler, batch_size=batch_size, drop_last=drop_last)
+
+        if fetch_threads:
+            # Hand batches indices to dataset which fetches frames of whole batch concurrently
+            loader_kwargs.update({'dataset': BatchFetchDataset(dataset, num_threads=fetch_threads),
+                                  'sampler': batch_sampler,
+                                  'batch_size': None})
+        elif sampler_cfg:
+            loader_kwargs.update({'batch_sampler': batch_sampler})
+        else:
+            loader_kwargs.update({'shuffle': shuffle})
+        loader = DataLoader(**loader_kwargs)
+        return loader
+
+    def on_epoch_start(self):
+        """Implements LightningModule start of epoch operations
+        """
+        # Draw new shards order and shuffling of streamed training samples
+        dataset = getattr(self.trainer.train_dataloader, 'dataset', None)
+        if isinstance(dataset, ShardedFusionDataset):
+            dataset.set_epoch(self.current_epoch)
+
+    def inference_model(self):
+        """Returns standalone module reproducing experiment forward pass from
+        source to predicted target, e.g. to be exported for inference
+
+        Returns:
+            type: nn.Module
+        """
+        return self.model
+
+    @property
+    def _is_raw(self):
+        return getattr(self.dataset, 'raw', False)
+
+    def _format_batch(self, batch, augment=False):
+        """Formats loaded batch as (source, target) pair, applying dataset
+        batch transform if frames have been loaded as raw integer tensors
+
+        Args:
+            batch (tuple): batch as yielded by dataloader
+            augment (bool): if True, applies dataset batch augmentation if any
+
+        Returns:
+            type: tuple[torch.Tensor]
+        """
+        if self._is_raw:
+            batch = self.dataset.batch_transform(batch)
+        source, target = batch
+
+        # Apply consistent random augmentation to source and target
+        augmentation = getattr(self.dataset, 'augmentation', None)
+        if augment and augmentation:
+            source, target = augmentation(source, target)
+        return source, target
+
+    def _compute_classification_metrics(self, output_real_sample, output_fake_sample, item=True):
         """Computes metrics on discriminator classification power : fooling rate
             of generator, precision and recall
 
         Args:
             output_real_sample (torch.Tensor): discriminator prediction on real samples
             output_fake_sample (torch.Tensor): discriminator prediction on fake samples
+            item (bool): if False, returns metrics as tensors without synchronizing device
 
         Returns:
             type: tuple[float]
@@ -312,11 +493,30 @@ class ImageTranslationExperiment(Experiment):
         target = torch.cat([target_real_sample, target_fake_sample])
 
         # Compute generator and discriminator metrics
-        fooling_rate = metrics.accuracy(output_fake_sample, target_real_sample)
-        precision = metrics.precision(output, target)
-        recall = metrics.recall(output, target)
+        fooling_rate = metrics.accuracy(output_fake_sample, target_real_sample, item=item)
+        precision = metrics.precision(output, target, item=item)
+        recall = metrics.recall(output, target, item=item)
         return fooling_rate, precision, recall
 
+    def _make_classification_logs(self, output_real_sample, output_fake_sample):
+        """Computes discriminator training classification metrics as logs
+        dictionnary of tensors, meant to be submitted to `training_metrics`
+
+        Args:
+            output_real_sample (torch.Tensor): discriminator prediction on real samples
+            output_fake_sample (torch.Tensor): discriminator prediction on fake samples
+
+        Returns:
+            type: dict[str, torch.Tensor]
+        """
+        fooling_rate, precision, recall = self._compute_classification_metrics(output_real_sample,
+                                                                               output_fake_sample,
+                                                                               item=False)
+        logs = {'Metric/train_fooling_rate': fooling_rate,
+                'Metric/train_precision': precision,
+                'Metric/train_recall': recall}
+        return logs
+
     def _compute_iqa_metrics(self, estimated_target, target, reduction=None):
         """Computes full reference image quality assessment metrics : psnr, ssim
             and spectral angle mapper (see evaluation/metrics/iqa.py for details)
@@ -357,6 +557,50 @@ class ImageTranslationExperiment(Experiment):
         sam = metrics.sam(target, estimated_target).mean()
         return psnr, ssim, sam
 
+    @torch.no_grad()
+    def _compute_batched_iqa_metrics(self, estimated_target, target):
+        """Computes full reference image quality assessment metrics : psnr, ssim
+            and spectral angle mapper on whole batch at once and on batch device
+            (see evaluation/metrics/batched_iqa.py for details)
+
+        Matches values of `_compute_iqa_metrics` averaged over bands without
+        moving batch to host memory, hence without synchronizing device.
+
+        Args:
+            estimated_target (torch.Tensor): generated sample
+            target (torch.Tensor): target sample
+
+        Returns:
+            type: tuple[torch.Tensor]
+        """
+        psnr, ssim, sam = metrics.batch_iqa(target.detach(), estimated_target.detach())
+        return psnr.mean(), ssim.mean(), sam.mean()
+
+    def _make_iqa_logs(self, estimated_target, target):
+        """Computes training image quality metrics as logs dictionnary of
+        tensors, meant to be submitted to `training_metrics`
+
+        Args:
+            estimated_target (torch.Tensor): generated sample
+            target (torch.Tensor): target sample
+
+        Returns:
+            type: dict[str, torch.Tensor]
+        """
+        psnr, ssim, sam = self._compute_batched_iqa_metrics(estimated_target, target)
+        logs = {'Metric/train_psnr': psnr,
+                'Metric/train_ssim': ssim,
+                'Metric/train_sam': sam}
+        return logs
+
+    @property
+    def training_metrics(self):
+        return self._training_metrics
+
+    @training_metrics.setter
+    def training_metrics(self, training_metrics):
+        self._training_metrics = training_metrics
+
     # def _compute_iqa_metrics(self, estimated_target, target):
     #     """Computes full reference image quality assessment metrics : psnr, ssim
     #         and spectral angle mapper (see evaluation/metrics/iqa.py for details)
@@ -1,14 +1,11 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torch.utils.data import DataLoader
-from functools import reduce
-from operator import add
 
 from src.deep_reflectance_fusion import build_model, build_dataset
 from src.deep_reflectance_fusion.experiments import EXPERIMENTS
 from src.deep_reflectance_fusion.experiments.experiment import ImageTranslationExperiment
-from src.deep_reflectance_fusion.experiments.utils import collate, process_tensor_for_vis
+from src.deep_reflectance_fusion.experiments.utils import process_tensor_for_vis, TrainingMetrics, ResidualFusionModel
 
 
 @EXPERIMENTS.register('cgan_fusion_modis_landsat')
@@ -40,6 +37,12 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
         E_{z~inputs}[-logD(z)] = Avg(CrossEnt_{x:fakebatch}(1, D(x)))
 
 
+    By default, discriminator is updated on two batches out of three and the
+    generator on the remaining one. If `reuse_fake_sample`, both generator and
+    discriminator are updated on every batch and the sample generated at the
+    generator step is detached and reused by the discriminator step on the same
+    batch, such that generator forward pass runs once per batch.
+
     Args:
         generator (nn.Module)
         discriminator (nn.Module)
@@ -51,10 +54,15 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
         optimizer_kwargs (dict): parameters of optimizer defined in LightningModule.configure_optimizers
         lr_scheduler_kwargs (dict): paramters of lr scheduler defined in LightningModule.configure_optimizers
         seed (int): random seed (default: None)
+        split_cache (str): if specified, directory where dataset split is persisted (default: None)
+        reuse_fake_sample (bool): if True, updates generator and discriminator on
+            each batch reusing generated sample across both steps (default: False)
+        training_metrics (dict): optional cadence specifications of training metrics
+            computation, see `TrainingMetrics` (default: None)
     """
     def __init__(self, generator, discriminator, dataset, split, dataloader_kwargs,
                  optimizer_kwargs, lr_scheduler_kwargs=None, supervision_weight=None,
-                 seed=None):
+                 seed=None, split_cache=None, reuse_fake_sample=False, training_metrics=None):
         super().__init__(model=generator,
                          dataset=dataset,
                          split=split,
@@ -62,9 +70,13 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
                          optimizer_kwargs=optimizer_kwargs,
                          lr_scheduler_kwargs=lr_scheduler_kwargs,
                          criterion=nn.BCELoss(),
-                         seed=seed)
+                         seed=seed,
+                         split_cache=split_cache)
         self.supervision_weight = supervision_weight
         self.discriminator = discriminator
+        self.reuse_fake_sample = reuse_fake_sample
+        self._fake_sample_cache = None
+        self.training_metrics = TrainingMetrics.build(training_metrics or {})
 
     def forward(self, x):
         return self.generator(x)
@@ -72,41 +84,19 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
     def train_dataloader(self):
         """Implements LightningModule train loader building method
         """
-        # Concatenate all patches datasets into single dataset
-        train_set = reduce(add, iter(self.train_set))
-
-        # Instantiate loader
-        train_loader_kwargs = self.dataloader_kwargs.copy()
-        train_loader_kwargs.update({'dataset': train_set,
-                                    'shuffle': True,
-                                    'collate_fn': collate.stack_input_frames})
-        loader = DataLoader(**train_loader_kwargs)
+        loader = self._make_dataloader(self.train_set, shuffle=True)
         return loader
 
     def val_dataloader(self):
         """Implements LightningModule train loader building method
         """
-        # Concatenate all patches datasets into single dataset
-        val_set = reduce(add, iter(self.val_set))
-
-        # Instantiate loader
-        val_loader_kwargs = self.dataloader_kwargs.copy()
-        val_loader_kwargs.update({'dataset': val_set,
-                                  'collate_fn': collate.stack_input_frames})
-        loader = DataLoader(**val_loader_kwargs)
+        loader = self._make_dataloader(self.val_set)
         return loader
 
     def test_dataloader(self):
         """Implements LightningModule test loader building method
         """
-        # Concatenate all patches datasets into single dataset
-        test_set = reduce(add, iter(self.test_set))
-
-        # Instantiate loader with batch size = horizon s.t. full time series are loaded
-        test_loader_kwargs = self.dataloader_kwargs.copy()
-        test_loader_kwargs.update({'dataset': test_set,
-                                   'collate_fn': collate.stack_input_frames})
-        loader = DataLoader(**test_loader_kwargs)
+        loader = self._make_dataloader(self.test_set)
         return loader
 
     def configure_optimizers(self):
@@ -124,42 +114,75 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
                                                                    **self.lr_scheduler_kwargs['discriminator'])
 
         # Make lightning output dictionnary fashion
-        gen_optimizer_dict = {'optimizer': gen_optimizer, 'scheduler': gen_lr_scheduler, 'frequency': 1}
-        disc_optimizer_dict = {'optimizer': disc_optimizer, 'scheduler': disc_lr_scheduler, 'frequency': 2}
+        gen_optimizer_dict = {'optimizer': gen_optimizer, 'scheduler': gen_lr_scheduler}
+        disc_optimizer_dict = {'optimizer': disc_optimizer, 'scheduler': disc_lr_scheduler}
+
+        # Cycle optimizers over batches unless both step on each batch reusing fake samples
+        if not self.reuse_fake_sample:
+            gen_optimizer_dict.update(frequency=1)
+            disc_optimizer_dict.update(frequency=2)
         return gen_optimizer_dict, disc_optimizer_dict
 
-    def _step_generator(self, source, target):
+    def _unfold_training_batch(self, batch, batch_idx, optimizer_idx):
+        """Formats training batch and runs generator forward pass at generator
+        step. If `reuse_fake_sample`, augmented batch and detached generated
+        sample are cached at generator step and reused at discriminator step on
+        same batch.
+
+        Args:
+            batch (tuple[torch.Tensor]): source, target pairs batch
+            batch_idx (int)
+            optimizer_idx (int): {0: gen_optimizer, 1: disc_optimizer}
+
+        Returns:
+            type: tuple[torch.Tensor] - source, target and generated sample, None
+                if it must be generated by discriminator step
+        """
+        # Reuse batch and fake sample cached at generator step on same batch
+        cache, self._fake_sample_cache = self._fake_sample_cache, None
+        if optimizer_idx == 1 and cache is not None and cache[0] == batch_idx:
+            _, source, target, pred_target = cache
+            return source, target, pred_target
+
+        # Unfold batch and run forward pass at generator step
+        source, target = self._format_batch(batch, augment=True)
+        pred_target = self(source) if optimizer_idx == 0 else None
+        if self.reuse_fake_sample and optimizer_idx == 0:
+            self._fake_sample_cache = batch_idx, source, target, pred_target.detach()
+        return source, target, pred_target
+
+    def _step_generator(self, source, target, pred_target=None):
         """Runs generator forward pass and loss computation
 
         Args:
             source (torch.Tensor): (batch_size, C, H, W) tensor
             target (torch.Tensor): (batch_size, C, H, W) tensor
+            pred_target (torch.Tensor): optional generated sample, computed if not provided
 
         Returns:
             type: dict
         """
         # Forward pass on source domain data
-        pred_target = self(source)
+        if pred_target is None:
+            pred_target = self(source)
         output_fake_sample = self.discriminator(pred_target, source)
 
         # Compute generator fooling power
         target_real_sample = torch.ones_like(output_fake_sample)
         gen_loss = self.criterion(output_fake_sample, target_real_sample)
 
-        # Compute image quality metrics
-        psnr, ssim, sam = self._compute_iqa_metrics(pred_target, target, reduction='mean')
-
         # Compute L1 regularization term
         mae = F.smooth_l1_loss(pred_target, target)
-        return gen_loss, mae, psnr, ssim, sam
+        return gen_loss, mae
 
-    def _step_discriminator(self, source, target):
-        """Runs discriminator forward pass, loss computation and classification
-        metrics computation
+    def _step_discriminator(self, source, target, pred_target=None):
+        """Runs discriminator forward pass and loss computation, returns
+        discriminator outputs for classification metrics computation
 
         Args:
             source (torch.Tensor): (batch_size, C, H, W) tensor
             target (torch.Tensor): (batch_size, C, H, W) tensor
+            pred_target (torch.Tensor): optional generated sample, computed if not provided
 
         Returns:
             type: dict
@@ -172,17 +195,16 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
         loss_real_sample = self.criterion(output_real_sample, target_real_sample)
 
         # Generate fake sample + forward pass, we detach fake samples to not backprop though generator
-        pred_target = self(source)
+        if pred_target is None:
+            with torch.no_grad():
+                pred_target = self(source)
         output_fake_sample = self.discriminator(pred_target.detach(), source)
 
         # Compute discriminative power on fake samples
         target_fake_sample = torch.zeros_like(output_fake_sample)
         loss_fake_sample = self.criterion(output_fake_sample, target_fake_sample)
         disc_loss = loss_real_sample + loss_fake_sample
-
-        # Compute classification training metrics
-        fooling_rate, precision, recall = self._compute_classification_metrics(output_real_sample, output_fake_sample)
-        return disc_loss, fooling_rate, precision, recall
+        return disc_loss, output_real_sample, output_fake_sample
 
     def training_step(self, batch, batch_idx, optimizer_idx):
         """Implements LightningModule training logic
@@ -196,25 +218,25 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
             type: dict
         """
         # Unfold batch
-        source, target = batch
+        source, target, pred_target = self._unfold_training_batch(batch, batch_idx, optimizer_idx)
 
         # Run either generator or discriminator training step
         if optimizer_idx == 0:
-            gen_loss, mae, psnr, ssim, sam = self._step_generator(source, target)
+            gen_loss, mae = self._step_generator(source, target, pred_target)
             logs = {'Loss/train_generator': gen_loss,
-                    'Loss/train_mae': mae,
-                    'Metric/train_psnr': psnr,
-                    'Metric/train_ssim': ssim,
-                    'Metric/train_sam': sam}
+                    'Loss/train_mae': mae}
             loss = gen_loss + self.supervision_weight * mae
+            self.training_metrics.submit('iqa', self._make_iqa_logs, pred_target, target)
 
         if optimizer_idx == 1:
-            disc_loss, fooling_rate, precision, recall = self._step_discriminator(source, target)
-            logs = {'Loss/train_discriminator': disc_loss,
-                    'Metric/train_fooling_rate': fooling_rate,
-                    'Metric/train_precision': precision,
-                    'Metric/train_recall': recall}
+            disc_loss, output_real_sample, output_fake_sample = self._step_discriminator(source, target, pred_target)
+            logs = {'Loss/train_discriminator': disc_loss}
             loss = disc_loss
+            self.training_metrics.submit('classification', self._make_classification_logs,
+                                         output_real_sample, output_fake_sample)
+
+        # Log training metrics computed on cadence
+        logs.update(self.training_metrics.collect())
 
         # Make lightning fashion output dictionnary
         output = {'loss': loss,
@@ -250,15 +272,20 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
             type: dict
         """
         # Unfold batch
-        source, target = batch
+        source, target = self._format_batch(batch)
 
         # Store into logger images for visualization
         if not hasattr(self.logger, '_logging_images'):
-            self.logger._logging_images = source, target
+            self.logger._logging_images = source.clone(), target.clone()
+
+        # Run single generator forward pass shared by generator and discriminator steps
+        pred_target = self(source)
+        gen_loss, mae = self._step_generator(source, target, pred_target)
+        disc_loss, output_real_sample, output_fake_sample = self._step_discriminator(source, target, pred_target)
 
-        # Run forward pass on generator and discriminator
-        gen_loss, mae, psnr, ssim, sam = self._step_generator(source, target)
-        disc_loss, fooling_rate, precision, recall = self._step_discriminator(source, target)
+        # Compute image quality and classification metrics
+        psnr, ssim, sam = self._compute_batched_iqa_metrics(pred_target, target)
+        fooling_rate, precision, recall = self._compute_classification_metrics(output_real_sample, output_fake_sample)
 
         # Encapsulate scores in torch tensor
         output = torch.Tensor([gen_loss, mae, psnr, ssim, sam, disc_loss, fooling_rate, precision, recall])
@@ -305,7 +332,7 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
             type: dict
         """
         # Unfold batch
-        source, target = batch
+        source, target = self._format_batch(batch)
 
         # Run forward pass
         pred_target = self(source)
@@ -353,6 +380,10 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
     def supervision_weight(self):
         return self._supervision_weight
 
+    @property
+    def reuse_fake_sample(self):
+        return self._reuse_fake_sample
+
     @discriminator.setter
     def discriminator(self, discriminator):
         self._discriminator = discriminator
@@ -361,6 +392,10 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
     def supervision_weight(self, supervision_weight):
         self._supervision_weight = supervision_weight
 
+    @reuse_fake_sample.setter
+    def reuse_fake_sample(self, reuse_fake_sample):
+        self._reuse_fake_sample = reuse_fake_sample
+
     @classmethod
     def _make_build_kwargs(self, cfg, test=False):
         """Build keyed arguments dictionnary out of configurations to be passed
@@ -380,9 +415,12 @@ class cGANFusionMODISLandsat(ImageTranslationExperiment):
                         'optimizer_kwargs': cfg['optimizer'],
                         'lr_scheduler_kwargs': cfg['lr_scheduler'],
                         'dataloader_kwargs': cfg['dataset']['dataloader'],
-                        'seed': cfg['experiment']['seed']}
+                        'seed': cfg['experiment']['seed'],
+                        'split_cache': cfg['dataset'].get('split_cache')}
         if not test:
-            build_kwargs.update({'supervision_weight': cfg['experiment']['supervision_weight']})
+            build_kwargs.update({'supervision_weight': cfg['experiment']['supervision_weight'],
+                                 'reuse_fake_sample': cfg['experiment'].get('reuse_fake_sample', False),
+                                 'training_metrics': cfg['experiment'].get('training_metrics')})
         return build_kwargs
 
 
@@ -406,12 +444,23 @@ class ResidualcGANFusionMODISLandsat(cGANFusionMODISLandsat):
         output = landsat + residual
         return output
 
+    def inference_model(self):
+        return ResidualFusionModel(self.model, n_channels=4)
+
+    @classmethod
+    def _make_build_kwargs(cls, cfg, test=False):
+        # Skip connection adds source Landsat to predicted residual, hence source must remain raw reflectance
+        if cfg['dataset'].get('normalization'):
+            raise ValueError("Source frames normalization is not supported by residual experiments")
+        return super()._make_build_kwargs(cfg, test)
+
 
 @EXPERIMENTS.register('ssim_cgan_fusion_modis_landsat')
 class SSIMcGANFusionMODISLandsat(cGANFusionMODISLandsat):
     def __init__(self, generator, discriminator, dataset, split, dataloader_kwargs,
                  optimizer_kwargs, lr_scheduler_kwargs=None, supervision_weight_l1=None,
-                 supervision_weight_ssim=None, seed=None):
+                 supervision_weight_ssim=None, seed=None, split_cache=None, reuse_fake_sample=False,
+                 training_metrics=None):
         super().__init__(generator=generator,
                          discriminator=discriminator,
                          dataset=dataset,
@@ -420,37 +469,39 @@ class SSIMcGANFusionMODISLandsat(cGANFusionMODISLandsat):
                          optimizer_kwargs=optimizer_kwargs,
                          lr_scheduler_kwargs=lr_scheduler_kwargs,
                          supervision_weight=None,
-                         seed=seed)
+                         seed=seed,
+                         split_cache=split_cache,
+                         reuse_fake_sample=reuse_fake_sample,
+                         training_metrics=training_metrics)
         self.supervision_weight_l1 = supervision_weight_l1
         self.supervision_weight_ssim = supervision_weight_ssim
         from src.deep_reflectance_fusion.losses import SSIM
         self.ssim_criterion = SSIM()
 
-    def _step_generator(self, source, target):
+    def _step_generator(self, source, target, pred_target=None):
         """Runs generator forward pass and loss computation
 
         Args:
             source (torch.Tensor): (batch_size, C, H, W) tensor
             target (torch.Tensor): (batch_size, C, H, W) tensor
+            pred_target (torch.Tensor): optional generated sample, computed if not provided
 
         Returns:
             type: dict
         """
         # Forward pass on source domain data
-        pred_target = self(source)
+        if pred_target is None:
+            pred_target = self(source)
         output_fake_sample = self.discriminator(pred_target, source)
 
         # Compute generator fooling power
         target_real_sample = torch.ones_like(output_fake_sample)
         gen_loss = self.criterion(output_fake_sample, target_real_sample)
 
-        # Compute image quality metrics
-        psnr, ssim, sam = self._compute_iqa_metrics(pred_target, target, reduction='mean')
-
         # Compute L1 regularization term
         mae = F.smooth_l1_loss(pred_target, target)
         ssim_loss = 1 - self.ssim_criterion(pred_target, target)
-        return gen_loss, mae, ssim_loss, psnr, ssim, sam
+        return gen_loss, mae, ssim_loss
 
     def training_step(self, batch, batch_idx, optimizer_idx):
         """Implements LightningModule training logic
@@ -464,26 +515,26 @@ class SSIMcGANFusionMODISLandsat(cGANFusionMODISLandsat):
             type: dict
         """
         # Unfold batch
-        source, target = batch
+        source, target, pred_target = self._unfold_training_batch(batch, batch_idx, optimizer_idx)
 
         # Run either generator or discriminator training step
         if optimizer_idx == 0:
-            gen_loss, mae, ssim_loss, psnr, ssim, sam = self._step_generator(source, target)
+            gen_loss, mae, ssim_loss = self._step_generator(source, target, pred_target)
             logs = {'Loss/train_generator': gen_loss,
                     'Loss/train_mae': mae,
-                    'Loss/train_ssim': ssim_loss,
-                    'Metric/train_psnr': psnr,
-                    'Metric/train_ssim': ssim,
-                    'Metric/train_sam': sam}
+                    'Loss/train_ssim': ssim_loss}
             loss = gen_loss + self.supervision_weight_l1 * mae + self.supervision_weight_ssim * ssim_loss
+            self.training_metrics.submit('iqa', self._make_iqa_logs, pred_target, target)
 
         if optimizer_idx == 1:
-            disc_loss, fooling_rate, precision, recall = self._step_discriminator(source, target)
-            logs = {'Loss/train_discriminator': disc_loss,
-                    'Metric/train_fooling_rate': fooling_rate,
-                    'Metric/train_precision': precision,
-                    'Metric/train_recall': recall}
+            disc_loss, output_real_sample, output_fake_sample = self._step_discriminator(source, target, pred_target)
+            logs = {'Loss/train_discriminator': disc_loss}
             loss = disc_loss
+            self.training_metrics.submit('classification', self._make_classification_logs,
+                                         output_real_sample, output_fake_sample)
+
+        # Log training metrics computed on cadence
+        logs.update(self.training_metrics.collect())
 
         # Make lightning fashion output dictionnary
         output = {'loss': loss,
@@ -502,15 +553,20 @@ class SSIMcGANFusionMODISLandsat(cGANFusionMODISLandsat):
             type: dict
         """
         # Unfold batch
-        source, target = batch
+        source, target = self._format_batch(batch)
 
         # Store into logger images for visualization
         if not hasattr(self.logger, '_logging_images'):
-            self.logger._logging_images = source, target
+            self.logger._logging_images = source.clone(), target.clone()
+
+        # Run single generator forward pass shared by generator and discriminator steps
+        pred_target = self(source)
+        gen_loss, mae, ssim_loss = self._step_generator(source, target, pred_target)
+        disc_loss, output_real_sample, output_fake_sample = self._step_discriminator(source, target, pred_target)
 
-        # Run forward pass on generator and discriminator
-        gen_loss, mae, ssim_loss, psnr, ssim, sam = self._step_generator(source, target)
-        disc_loss, fooling_rate, precision, recall = self._step_discriminator(source, target)
+        # Compute image quality and classification metrics
+        psnr, ssim, sam = self._compute_batched_iqa_metrics(pred_target, target)
+        fooling_rate, precision, recall = self._compute_classification_metrics(output_real_sample, output_fake_sample)
 
         # Encapsulate scores in torch tensor
         output = torch.Tensor([gen_loss, mae, ssim_loss, psnr, ssim, sam, disc_loss, fooling_rate, precision, recall])
@@ -582,8 +638,11 @@ class SSIMcGANFusionMODISLandsat(cGANFusionMODISLandsat):
                         'optimizer_kwargs': cfg['optimizer'],
                         'lr_scheduler_kwargs': cfg['lr_scheduler'],
                         'dataloader_kwargs': cfg['dataset']['dataloader'],
-                        'seed': cfg['experiment']['seed']}
+                        'seed': cfg['experiment']['seed'],
+                        'split_cache': cfg['dataset'].get('split_cache')}
         if not test:
             build_kwargs.update({'supervision_weight_l1': cfg['experiment']['supervision_weight_l1'],
-                                 'supervision_weight_ssim': cfg['experiment']['supervision_weight_ssim']})
+                                 'supervision_weight_ssim': cfg['experiment']['supervision_weight_ssim'],
+                                 'reuse_fake_sample': cfg['experiment'].get('reuse_fake_sample', False),
+                                 'training_metrics': cfg['experiment'].get('training_metrics')})
         return build_kwargs
@@ -1,14 +1,11 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torch.utils.data import DataLoader
-from functools import reduce
-from operator import add
 
 from src.deep_reflectance_fusion import build_model, build_dataset
 from src.deep_reflectance_fusion.experiments import EXPERIMENTS
 from src.deep_reflectance_fusion.experiments.experiment import ImageTranslationExperiment
-from src.deep_reflectance_fusion.experiments.utils import collate, process_tensor_for_vis
+from src.deep_reflectance_fusion.experiments.utils import process_tensor_for_vis, TrainingMetrics, ResidualFusionModel
 
 
 @EXPERIMENTS.register('early_fusion_modis_landsat')
@@ -43,9 +40,13 @@ class EarlyFusionMODISLandsat(ImageTranslationExperiment):
         optimizer_kwargs (dict): parameters of optimizer defined in LightningModule.configure_optimizers
         lr_scheduler_kwargs (dict): paramters of lr scheduler defined in LightningModule.configure_optimizers
         seed (int): random seed (default: None)
+        split_cache (str): if specified, directory where dataset split is persisted (default: None)
+        training_metrics (dict): optional cadence specifications of training metrics
+            computation, see `TrainingMetrics` (default: None)
     """
     def __init__(self, model, dataset, split, dataloader_kwargs,
-                 optimizer_kwargs, lr_scheduler_kwargs=None, seed=None):
+                 optimizer_kwargs, lr_scheduler_kwargs=None, seed=None, split_cache=None,
+                 training_metrics=None):
         super().__init__(model=model,
                          dataset=dataset,
                          split=split,
@@ -53,7 +54,9 @@ class EarlyFusionMODISLandsat(ImageTranslationExperiment):
                          optimizer_kwargs=optimizer_kwargs,
                          lr_scheduler_kwargs=lr_scheduler_kwargs,
                          criterion=nn.SmoothL1Loss(),
-                         seed=seed)
+                         seed=seed,
+                         split_cache=split_cache)
+        self.training_metrics = TrainingMetrics.build(training_metrics or {})
 
     def forward(self, x):
         return self.model(x)
@@ -61,41 +64,19 @@ class EarlyFusionMODISLandsat(ImageTranslationExperiment):
     def train_dataloader(self):
         """Implements LightningModule train loader building method
         """
-        # Concatenate all patches datasets into single dataset
-        train_set = reduce(add, iter(self.train_set))
-
-        # Instantiate loader
-        train_loader_kwargs = self.dataloader_kwargs.copy()
-        train_loader_kwargs.update({'dataset': train_set,
-                                    'shuffle': True,
-                                    'collate_fn': collate.stack_input_frames})
-        loader = DataLoader(**train_loader_kwargs)
+        loader = self._make_dataloader(self.train_set, shuffle=True)
         return loader
 
     def val_dataloader(self):
         """Implements LightningModule train loader building method
         """
-        # Concatenate all patches datasets into single dataset
-        val_set = reduce(add, iter(self.val_set))
-
-        # Instantiate loader
-        val_loader_kwargs = self.dataloader_kwargs.copy()
-        val_loader_kwargs.update({'dataset': val_set,
-                                  'collate_fn': collate.stack_input_frames})
-        loader = DataLoader(**val_loader_kwargs)
+        loader = self._make_dataloader(self.val_set)
         return loader
 
     def test_dataloader(self):
         """Implements LightningModule test loader building method
         """
-        # Concatenate all patches datasets into single dataset
-        test_set = reduce(add, iter(self.test_set))
-
-        # Instantiate loader with batch size = horizon s.t. full time series are loaded
-        test_loader_kwargs = self.dataloader_kwargs.copy()
-        test_loader_kwargs.update({'dataset': test_set,
-                                   'collate_fn': collate.stack_input_frames})
-        loader = DataLoader(**test_loader_kwargs)
+        loader = self._make_dataloader(self.test_set)
         return loader
 
     def configure_optimizers(self):
@@ -123,20 +104,18 @@ class EarlyFusionMODISLandsat(ImageTranslationExperiment):
             type: dict
         """
         # Unfold batch
-        source, target = batch
+        source, target = self._format_batch(batch, augment=True)
 
         # Run forward pass + compute MAE loss
         pred_target = self(source)
         loss = self.criterion(pred_target, target)
 
-        # Compute image quality metrics
-        psnr, ssim, sam = self._compute_iqa_metrics(pred_target, target, reduction='mean')
+        # Compute image quality metrics on cadence
+        self.training_metrics.submit('iqa', self._make_iqa_logs, pred_target, target)
 
         # Make lightning fashion output dictionnary
-        logs = {'Loss/train_mae': loss,
-                'Metric/train_psnr': psnr,
-                'Metric/train_ssim': ssim,
-                'Metric/train_sam': sam}
+        logs = {'Loss/train_mae': loss}
+        logs.update(self.training_metrics.collect())
 
         output = {'loss': loss,
                   'progress_bar': logs,
@@ -154,7 +133,7 @@ class EarlyFusionMODISLandsat(ImageTranslationExperiment):
         if self.current_epoch == 0:
             # Log input and groundtruth once only at first epoch
             self.logger.log_images(process_tensor_for_vis(source[:, [0, 2, 3]], 33, 98), tag='Source - Landsat (B4-B2-B3)', step=self.current_epoch)
-            self.logger.log_images(process_tensor_for_vis(source[:, [4, 6, 7]], 0, 98), tag='Source - MODIS (B1-B3-B4)', step=self.current_epoch)
+            self.logger.log_images(process_tensor_for_vis(source[:, [-4, -2, -1]], 0, 98), tag='Source - MODIS (B1-B3-B4)', step=self.current_epoch)
             self.logger.log_images(process_tensor_for_vis(target[:, [0, 2, 3]], 33, 98), tag='Target - Landsat (B4-B2-B3)', step=self.current_epoch)
 
         # Log generated image at current epoch
@@ -171,16 +150,16 @@ class EarlyFusionMODISLandsat(ImageTranslationExperiment):
             type: dict
         """
         # Unfold batch
-        source, target = batch
+        source, target = self._format_batch(batch)
 
         # Store into logger images for visualization
         if not hasattr(self.logger, '_logging_images'):
-            self.logger._logging_images = source, target
+            self.logger._logging_images = source.clone(), target.clone()
 
         # Run forward pass
         pred_target = self(source)
         loss = self.criterion(pred_target, target)
-        psnr, ssim, sam = self._compute_iqa_metrics(pred_target, target, reduction='mean')
+        psnr, ssim, sam = self._compute_batched_iqa_metrics(pred_target, target)
 
         # Encapsulate scores in torch tensor
         output = torch.Tensor([loss, psnr, ssim, sam])
@@ -221,7 +200,7 @@ class EarlyFusionMODISLandsat(ImageTranslationExperiment):
             type: dict
         """
         # Unfold batch
-        source, target = batch
+        source, target = self._format_batch(batch)
 
         # Run forward pass
         pred_target = self(source)
@@ -275,7 +254,9 @@ class EarlyFusionMODISLandsat(ImageTranslationExperiment):
                         'optimizer_kwargs': cfg['optimizer'],
                         'lr_scheduler_kwargs': cfg['lr_scheduler'],
                         'dataloader_kwargs': cfg['dataset']['dataloader'],
-                        'seed': cfg['experiment']['seed']}
+                        'seed': cfg['experiment']['seed'],
+                        'split_cache': cfg['dataset'].get('split_cache'),
+                        'training_metrics': cfg['experiment'].get('training_metrics')}
         return build_kwargs
 
 
@@ -298,3 +279,13 @@ class ResidualEarlyFusionMODISLandsat(EarlyFusionMODISLandsat):
         residual = self.model(x)
         output = landsat + residual
         return output
+
+    def inference_model(self):
+        return ResidualFusionModel(self.model, n_channels=4)
+
+    @classmethod
+    def _make_build_kwargs(cls, cfg, test=False):
+        # Skip connection adds source Landsat to predicted residual, hence source must remain raw reflectance
+        if cfg['dataset'].get('normalization'):
+            raise ValueError("Source frames normalization is not supported by residual experiments")
+        return super()._make_build_kwargs(cfg, test)
@@ -1,4 +1,6 @@
 from .loggers import Logger
 from .vis import process_tensor_for_vis
+from .metrics import TrainingMetrics
+from .inference import ResidualFusionModel
 
-__all__ = ['Logger', 'process_tensor_for_vis']
+__all__ = ['Logger', 'process_tensor_for_vis', 'TrainingMetrics', 'ResidualFusionModel']
@@ -1,4 +1,5 @@
 import torch
+from torch.utils.data import get_worker_info
 
 """
 Default batch formatting when using pytorch dataloading modules is done as :
@@ -22,3 +23,163 @@ def stack_input_frames(batch):
     data = torch.stack(data).float()
     target = torch.stack(target).float()
     return data, target
+
+
+def stack_raw_frames(batch):
+    """Stacks frames of each type keeping their integer dtype, leaving
+    channels stacking and float conversion to batch transform
+
+    Args:
+        batch (list): batch as [((frame_1, frame_2), targets)]
+
+    Returns:
+        type: tuple - ((frames_1, frames_2), targets)
+    """
+    data, target = zip(*batch)
+    data = tuple(map(torch.stack, zip(*data)))
+    target = torch.stack(target)
+    return data, target
+
+
+def stack_context_frames(batch):
+    """Stacks context frames, time deltas and current frame as a single array
+    where time deltas are broadcasted as constant channels
+
+    Frames are expected as float tensors, raw integer frames and collate
+    buffers are not supported
+
+    Args:
+        batch (list): batch as [((context, time_deltas, frame), targets)] where
+            context is (K, C, H, W) and time_deltas (K,)
+
+    Returns:
+        type: tuple[torch.Tensor] - (B, K * (C + 1) + C, H, W) inputs and targets
+    """
+    data, target = zip(*batch)
+    context, time_deltas, frame = map(torch.stack, zip(*data))
+    batch_size, context_size, channels, height, width = context.shape
+    time_deltas = time_deltas.view(batch_size, context_size, 1, 1).expand(-1, -1, height, width)
+    data = torch.cat([context.view(batch_size, -1, height, width).float(),
+                      time_deltas.float(),
+                      frame.float()], dim=1)
+    target = torch.stack(target).float()
+    return data, target
+
+
+class BufferedStackInputFrames:
+    """Collate function equivalent to `stack_input_frames` (or `stack_raw_frames`
+    if raw) which writes samples straight into batch tensors instead of
+    stacking intermediate concatenated tensors
+
+    When called in main process, batch tensors are drawn from a ring of reusable
+    buffers, optionally pinned, allocated once for the largest batch shape met.
+    Yielded batches are hence only valid until `n_buffers` other batches have
+    been collated and must be copied if they are to be kept longer.
+
+    When called in a dataloading worker, batch tensors are allocated in shared
+    memory at each call since they are handed over to main process.
+
+    Args:
+        n_buffers (int): number of buffers in ring (default: 2)
+        pin_memory (bool): if True, allocates buffers in pinned memory (default: False)
+        raw (bool): if True, keeps frames types separated and integer (default: False)
+    """
+    def __init__(self, n_buffers=2, pin_memory=False, raw=False):
+        self.n_buffers = n_buffers
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.raw = raw
+        self._buffers = [None] * n_buffers
+        self._cursor = 0
+
+    def _batch_shapes(self, batch):
+        """Computes shapes and dtypes of batch tensors out of first sample
+
+        Args:
+            batch (list): batch as [((frame_1, frame_2), targets)]
+
+        Returns:
+            type: list[tuple[tuple[int], torch.dtype]]
+        """
+        batch_size = len(batch)
+        frames, target = batch[0]
+        if self.raw:
+            specs = [((batch_size,) + frame.shape, frame.dtype) for frame in frames + (target,)]
+        else:
+            channels = sum(frame.size(0) for frame in frames)
+            height, width = target.shape[-2:]
+            specs = [((batch_size, channels, height, width), torch.float32),
+                     ((batch_size,) + target.shape, torch.float32)]
+        return specs
+
+    def _allocate(self, specs, shared=False):
+        """Allocates batch tensors following specified shapes and dtypes
+
+        Args:
+            specs (list[tuple[tuple[int], torch.dtype]])
+            shared (bool): if True, allocates tensors in shared memory
+
+        Returns:
+            type: list[torch.Tensor]
+        """
+        tensors = [torch.empty(shape, dtype=dtype, pin_memory=self.pin_memory and not shared)
+                   for shape, dtype in specs]
+        if shared:
+            tensors = [tensor.share_memory_() for tensor in tensors]
+        return tensors
+
+    def _get_buffers(self, specs):
+        """Draws next buffers from ring, reallocating them if too small for batch
+
+        Args:
+            specs (list[tuple[tuple[int], torch.dtype]])
+
+        Returns:
+            type: list[torch.Tensor]
+        """
+        buffers = self._buffers[self._cursor]
+        fits = buffers is not None and all(buffer.shape[1:] == shape[1:] and buffer.dtype == dtype
+                                           and buffer.size(0) >= shape[0]
+                                           for buffer, (shape, dtype) in zip(buffers, specs))
+        if not fits:
+            buffers = self._allocate(specs)
+            self._buffers[self._cursor] = buffers
+        self._cursor = (self._cursor + 1) % self.n_buffers
+
+        # Narrow buffers down to batch size
+        buffers = [buffer[:shape[0]] for buffer, (shape, _) in zip(buffers, specs)]
+        return buffers
+
+    def __call__(self, batch):
+        """Collates batch into preallocated tensors
+
+        Args:
+            batch (list): batch as [((frame_1, frame_2), targets)]
+
+        Returns:
+            type: tuple
+        """
+        # Get batch tensors - workers can't reuse buffers handed over to main process
+        specs = self._batch_shapes(batch)
+        if get_worker_info() is None:
+            tensors = self._get_buffers(specs)
+        else:
+            tensors = self._allocate(specs, shared=True)
+
+        # Write samples into batch tensors
+        for i, (frames, target) in enumerate(batch):
+            if self.raw:
+                for tensor, frame in zip(tensors, frames + (target,)):
+                    tensor[i].copy_(frame)
+            else:
+                data, target_tensor = tensors
+                channel = 0
+                for frame in frames:
+                    data[i, channel:channel + frame.size(0)].copy_(frame)
+                    channel += frame.size(0)
+                target_tensor[i].copy_(target)
+
+        if self.raw:
+            *data, target = tensors
+            return tuple(data), target
+        data, target = tensors
+        return data, target
@@ -0,0 +1,27 @@
+import torch
+import torch.nn as nn
+
+
+class ResidualFusionModel(nn.Module):
+    """Wraps model predicting residual between target and source Landsat
+    reflectance into a standalone model predicting target reflectance, i.e.
+    reproducing residual experiments forward pass for inference and export
+
+    Args:
+        model (nn.Module): model predicting residual
+        n_channels (int): number of leading input channels holding source
+            Landsat reflectance (default: 4)
+    """
+    def __init__(self, model, n_channels=4):
+        super().__init__()
+        self.model = model
+        self.n_channels = n_channels
+
+        # Follow training or evaluation mode of wrapped model
+        self.train(model.training)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        landsat = x[:, :self.n_channels]
+        residual = self.model(x)
+        output = landsat + residual
+        return output
@@ -0,0 +1,132 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import torch
+
+
+class TrainingMetrics:
+    """Computes training metrics on a cadence and on a random subset of batch
+    samples, optionally off training critical path
+
+    Metrics functions are submitted at each training step along with the tensors
+    they are computed from, e.g.
+    ```
+    training_metrics.submit('iqa', compute_iqa_logs, pred_target, target)
+    logs.update(training_metrics.collect())
+    ```
+    Each submitted function is only run every `every_n_steps` submissions, on
+    detached copies of `n_samples` randomly drawn samples. It returns a
+    dictionnary of scalar tensors which are kept on device. Collected values
+    are averaged and converted to floats every `log_interval` calls to
+    `collect` with a single device synchronization.
+
+    If `background`, functions run on a single background thread such that
+    metrics computation overlaps with backward pass. Only completed
+    computations are then collected, pending ones are collected later.
+
+    Args:
+        every_n_steps (int): run each metrics function every n submissions (default: 1)
+        n_samples (int): if specified, number of batch samples metrics are computed on (default: None)
+        background (bool): if True, runs metrics functions on a background thread (default: False)
+        log_interval (int): number of collect calls between each metrics logging (default: 1)
+    """
+    def __init__(self, every_n_steps=1, n_samples=None, background=False, log_interval=1):
+        self.every_n_steps = every_n_steps
+        self.n_samples = n_samples
+        self.background = background
+        self.log_interval = log_interval
+        self._counts = defaultdict(int)
+        self._results = []
+        self._n_collect = 0
+        self._executor = None
+        self._pid = None
+
+    @property
+    def executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._pid = os.getpid()
+        return self._executor
+
+    def _sample(self, tensors):
+        """Draws same random subset of samples from each tensor, as detached copies
+
+        Args:
+            tensors (tuple[torch.Tensor]): (B, ...) tensors
+
+        Returns:
+            type: tuple[torch.Tensor]
+        """
+        batch_size = tensors[0].size(0)
+        if self.n_samples is None or self.n_samples >= batch_size:
+            return tuple(tensor.detach().clone() for tensor in tensors)
+        indices = torch.randperm(batch_size, device=tensors[0].device)[:self.n_samples]
+        return tuple(tensor.detach()[indices] for tensor in tensors)
+
+    @staticmethod
+    def _run(fn, tensors):
+        with torch.no_grad():
+            return fn(*tensors)
+
+    def submit(self, name, fn, *tensors):
+        """Runs metrics function on detached copy of tensors subset if it is
+        its turn according to cadence
+
+        Args:
+            name (str): name of metrics function, cadence is tracked by name
+            fn (callable): function mapping tensors to dictionnary of scalar tensors
+            *tensors (torch.Tensor): (B, ...) tensors metrics are computed from
+        """
+        count = self._counts[name]
+        self._counts[name] += 1
+        if count % self.every_n_steps != 0:
+            return
+        tensors = self._sample(tensors)
+        if self.background:
+            self._results += [self.executor.submit(self._run, fn, tensors)]
+        else:
+            self._results += [self._run(fn, tensors)]
+
+    def collect(self):
+        """Averages completed metrics computations every `log_interval` calls
+
+        Returns:
+            type: dict[str, float]
+        """
+        self._n_collect += 1
+        if self._n_collect % self.log_interval != 0:
+            return dict()
+
+        # Retrieve completed computations, keep pending ones for later
+        completed, pending = [], []
+        for result in self._results:
+            if not self.background:
+                completed += [result]
+            elif result.done():
+                completed += [result.result()]
+            else:
+                pending += [result]
+        self._results = pending
+        if not completed:
+            return dict()
+
+        # Convert all values with a single synchronization and average by key
+        keys = [key for logs in completed for key in logs.keys()]
+        values = torch.stack([value.float().view(()) for logs in completed for value in logs.values()])
+        logs = defaultdict(list)
+        for key, value in zip(keys, values.tolist()):
+            logs[key] += [value]
+        return {key: sum(value) / len(value) for key, value in logs.items()}
+
+    def __getstate__(self):
+        # Thread pools can't be pickled, each process builds its own
+        state = self.__dict__.copy()
+        state.update({'_executor': None, '_pid': None, '_results': []})
+        return state
+
+    @classmethod
+    def build(cls, cfg):
+        return cls(every_n_steps=cfg.get('every_n_steps', 1),
+                   n_samples=cfg.get('n_samples'),
+                   background=cfg.get('background', False),
+                   log_interval=cfg.get('log_interval', 1))
@@ -20,24 +20,6 @@ def heat_1d_kernel(kernel_size, sigma):
     return heat_1d_tensor
 
 
-def heat_2d_kernel(kernel_size, channels):
-    """Creates square bidimensional heat kernel tensor with specified number of
-    channels
-
-    Args:
-        kernel_size (int): tensor size
-        sigma (float): gaussian standard deviation
-
-    Returns:
-        type: torch.Tensor
-
-    """
-    _1d_window = heat_1d_kernel(kernel_size, 1.5).unsqueeze(1)
-    _2d_window = _1d_window.mm(_1d_window.t()).float().unsqueeze(0).unsqueeze(0)
-    kernel = _2d_window.expand(channels, 1, kernel_size, kernel_size).contiguous()
-    return kernel
-
-
 class SSIM(nn.Module):
     """Differential module implementing Structural-Similarity index computation
 
@@ -46,50 +28,111 @@ class SSIM(nn.Module):
 
     Largely based on the work of https://github.com/Po-Hsun-Su/pytorch-ssim
 
+    Gaussian window being separable, local moments are computed with two
+    unidimensional convolutions instead of a bidimensional one. Both images,
+    their squares and their product are stacked along batch dimension such that
+    all five moments of all channels are filtered by the same two convolution
+    calls. The unidimensional kernel is cached by device and dtype.
+
+    If more than one scale is specified, computes multi-scale SSIM instead
+
+    "Multiscale structural similarity for image quality assessment",
+    Wang et. al 2003
+
+    where contrast-structure terms of each scale and SSIM of coarsest scale are
+    combined by weighted geometric mean. Both images are downsampled together
+    by a single average pooling call between scales.
+
     Args:
         kernel_size (int): convolutive kernel size
         C1 (float): weak denominator stabilizing constant (default: 0.01 ** 2)
         C2 (float): weak denominator stabilizing constant (default: 0.03 ** 2)
+        scales (int): number of scales, computes multi-scale SSIM if > 1 (default: 1)
+        weights (list[float]): weights of scales from finest to coarsest, defaults
+            to weights from Wang et. al 2003 truncated to number of scales
     """
-    def __init__(self, kernel_size=11, C1=0.01**2, C2=0.03**2):
+    _ms_ssim_weights = (0.0448, 0.2856, 0.3001, 0.2363, 0.1333)
+
+    def __init__(self, kernel_size=11, C1=0.01**2, C2=0.03**2, scales=1, weights=None):
         super(SSIM, self).__init__()
         self.kernel_size = kernel_size
-        self.channels = 1
-        self.kernel = heat_2d_kernel(kernel_size, self.channels)
         self.C1 = C1
         self.C2 = C2
+        self.scales = scales
+        self.weights = weights or self._ms_ssim_weights[:scales]
+        assert len(self.weights) == scales, f"Specified {len(self.weights)} weights for {scales} scales"
+        self._kernels = dict()
+
+    def _get_kernel(self, img):
+        """Returns unidimensional heat kernel on image device and dtype
+
+        Args:
+            img (torch.Tensor)
+
+        Returns:
+            type: torch.Tensor
+        """
+        key = (img.device, img.dtype)
+        if key not in self._kernels:
+            self._kernels[key] = heat_1d_kernel(self.kernel_size, 1.5).to(device=img.device, dtype=img.dtype)
+        return self._kernels[key]
 
     def _compute_ssim(self, img1, img2, kernel):
-        """Computes mean SSIM between two batches of images given convolution kernel
+        """Computes SSIM and contrast-structure maps between two batches of
+        images given unidimensional convolution kernel
 
         Args:
             img1 (torch.Tensor): (B, C, H, W)
             img2 (torch.Tensor): (B, C, H, W)
-            kernel (torch.Tensor): convolutive kernel used for moments computation
+            kernel (torch.Tensor): unidimensional convolutive kernel used for moments computation
 
         Returns:
-            type: torch.Tensor
+            type: tuple[torch.Tensor]
 
         """
-        # Retrieve number of channels and padding values
-        channels = img1.size(1)
+        # Stack images and products as (5 * B * C, 1, H, W) and filter with separable kernel
+        batch_size, channels, height, width = img1.shape
         padding = self.kernel_size // 2
+        moments = torch.stack([img1, img2, img1 * img1, img2 * img2, img1 * img2])
+        moments = moments.view(-1, 1, height, width)
+        moments = F.conv2d(input=moments, weight=kernel.view(1, 1, -1, 1), padding=(padding, 0))
+        moments = F.conv2d(input=moments, weight=kernel.view(1, 1, 1, -1), padding=(0, padding))
+        mu1, mu2, mu11, mu22, mu12 = moments.view(5, batch_size, channels, height, width)
 
-        # Compute means tensors
-        mu1 = F.conv2d(input=img1, weight=kernel, padding=padding, groups=channels)
-        mu2 = F.conv2d(input=img2, weight=kernel, padding=padding, groups=channels)
+        # Compute means and std tensors
         mu1_sq = mu1.pow(2)
         mu2_sq = mu2.pow(2)
         mu1_mu2 = mu1.mul(mu2)
+        sigma1_sq = mu11.sub(mu1_sq)
+        sigma2_sq = mu22.sub(mu2_sq)
+        sigma12 = mu12.sub(mu1_mu2)
+
+        # Compute contrast-structure and ssim maps
+        cs_map = (2 * sigma12 + self.C2) / (sigma1_sq + sigma2_sq + self.C2)
+        ssim_map = ((2 * mu1_mu2 + self.C1) / (mu1_sq + mu2_sq + self.C1)) * cs_map
+        return ssim_map, cs_map
 
-        # Compute std tensors
-        sigma1_sq = F.conv2d(input=img1 * img1, weight=kernel, padding=padding, groups=channels).sub(mu1_sq)
-        sigma2_sq = F.conv2d(input=img2 * img2, weight=kernel, padding=padding, groups=channels).sub(mu2_sq)
-        sigma12 = F.conv2d(input=img1 * img2, weight=kernel, padding=padding, groups=channels).sub(mu1_mu2)
+    def _compute_ms_ssim(self, img1, img2, kernel):
+        """Computes mean multi-scale SSIM between two batches of images
 
-        # Compute ssim map and return average value
-        ssim_map = ((2 * mu1_mu2 + self.C1) * (2 * sigma12 + self.C2)) / ((mu1_sq + mu2_sq + self.C1) * (sigma1_sq + sigma2_sq + self.C2))
-        return ssim_map.mean()
+        Args:
+            img1 (torch.Tensor): (B, C, H, W)
+            img2 (torch.Tensor): (B, C, H, W)
+            kernel (torch.Tensor): unidimensional convolutive kernel used for moments computation
+
+        Returns:
+            type: torch.Tensor
+        """
+        batch_size = img1.size(0)
+        ms_ssim = 1
+        for scale, weight in enumerate(self.weights):
+            ssim_map, cs_map = self._compute_ssim(img1, img2, kernel)
+            if scale == self.scales - 1:
+                ms_ssim = ms_ssim * ssim_map.mean(dim=(1, 2, 3)).clamp(min=0).pow(weight)
+            else:
+                ms_ssim = ms_ssim * cs_map.mean(dim=(1, 2, 3)).clamp(min=0).pow(weight)
+                img1, img2 = F.avg_pool2d(torch.cat([img1, img2]), kernel_size=2).split(batch_size)
+        return ms_ssim.mean()
 
     def forward(self, img1, img2):
         """Computes mean SSIM between two batches of images
@@ -102,16 +145,10 @@ class SSIM(nn.Module):
             type: torch.Tensor
 
         """
-        # If needed, recompute convolutive kernel
-        channels = img1.size(1)
-        if channels == self.channels and self.kernel.data.type() == img1.data.type():
-            kernel = self.kernel
+        kernel = self._get_kernel(img1)
+        if self.scales > 1:
+            ssim = self._compute_ms_ssim(img1, img2, kernel)
         else:
-            kernel = heat_2d_kernel(self.kernel_size, channels)
-            kernel = kernel.to(img1.device).type_as(img1)
-            self.kernel = kernel
-            self.channels = channels
-
-        # Compute mean ssim
-        ssim = self._compute_ssim(img1, img2, kernel)
+            ssim_map, _ = self._compute_ssim(img1, img2, kernel)
+            ssim = ssim_map.mean()
         return ssim
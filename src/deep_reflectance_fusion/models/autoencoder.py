@@ -40,6 +40,14 @@ class AutoEncoder(ConvNet):
                                    padding=1,
                                    **out_kwargs)
 
+    def _compute_output_size(self):
+        """Computes model output size
+
+        Returns:
+            type: tuple[int]
+        """
+        return self.output_layer.output_size(self.decoder.output_size)
+
     def forward(self, x):
         latent = self.encoder(x)
         x = self.decoder(latent)
@@ -79,6 +87,14 @@ class Encoder(ConvNet):
                         **self._conv_kwargs[i]) for i in range(len(n_filters) - 1)]
         self.encoding_layers = nn.Sequential(*encoding_seq)
 
+    def _compute_output_size(self):
+        """Computes model output size
+
+        Returns:
+            type: tuple[int]
+        """
+        return self._sequential_output_size(self.encoding_layers, self.input_size)
+
     def forward(self, x):
         output = self.encoding_layers(x)
         return output
@@ -108,6 +124,14 @@ class Decoder(ConvNet):
                         **self._conv_kwargs[i]) for i in range(len(n_filters) - 1)]
         self.decoding_layers = nn.Sequential(*decoding_seq)
 
+    def _compute_output_size(self):
+        """Computes model output size
+
+        Returns:
+            type: tuple[int]
+        """
+        return self._sequential_output_size(self.decoding_layers, self.input_size)
+
     def forward(self, x):
         output = self.decoding_layers(x)
         return output
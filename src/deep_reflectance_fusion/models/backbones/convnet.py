@@ -6,6 +6,9 @@ class ConvNet(torch.nn.Module, ABC):
 
     _base_kwargs = {}
 
+    # Size properties may run python-only shape inference, hence are ignored when scripting
+    __jit_unused_properties__ = ['input_size', 'output_size']
+
     def __init__(self, input_size):
         """General class describing networks with convolutional layers
         Args:
@@ -49,8 +52,28 @@ class ConvNet(torch.nn.Module, ABC):
         """
         raise NotImplementedError
 
+    @staticmethod
+    def _sequential_output_size(layers, input_size):
+        """Infers output size of sequence of layers by propagating input size
+        through each layer, recursing into nested sequences
+
+        Args:
+            layers (nn.Sequential): sequence of layers exposing an `output_size` method
+            input_size (tuple[int]): (C, H, W)
+
+        Returns:
+            type: tuple[int]
+        """
+        for layer in layers:
+            if isinstance(layer, torch.nn.Sequential):
+                input_size = ConvNet._sequential_output_size(layer, input_size)
+            else:
+                input_size = layer.output_size(input_size)
+        return tuple(input_size)
+
     def _compute_output_size(self):
-        """Computes model output size
+        """Computes model output size - falls back on a forward pass of a
+        dummy input, models should override it with analytical inference
 
         Returns:
             type: tuple[int]
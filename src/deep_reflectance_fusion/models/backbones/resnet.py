@@ -37,6 +37,16 @@ class ResidualFeatureExtractor(ConvNet):
         # Encapsulate layers as sequential
         self.layers = nn.Sequential(*residual_layers_seq)
 
+    def _compute_output_size(self):
+        """Computes model output size, None if input size is not specified
+
+        Returns:
+            type: tuple[int]
+        """
+        if self.input_size is None:
+            return None
+        return self._sequential_output_size(self.layers, self.input_size)
+
     def forward(self, x):
         return self.layers(x)
 
@@ -76,7 +86,8 @@ class ResNet(ConvNet):
                                   bias=False,
                                   **input_kwargs)
 
-        self.residual_layers = ResidualFeatureExtractor(n_filters=n_filters,
+        self.residual_layers = ResidualFeatureExtractor(input_size=self.input_layer.output_size(input_size),
+                                                        n_filters=n_filters,
                                                         n_blocks=n_blocks,
                                                         conv_kwargs=conv_kwargs)
 
@@ -86,6 +97,14 @@ class ResNet(ConvNet):
                                    padding=1,
                                    **out_kwargs)
 
+    def _compute_output_size(self):
+        """Computes model output size
+
+        Returns:
+            type: tuple[int]
+        """
+        return self.output_layer.output_size(self.residual_layers.output_size)
+
     def forward(self, x):
         x = self.input_layer(x)
         x = self.residual_layers(x)
@@ -1,3 +1,8 @@
 from .blocks import Conv2d, ConvTranspose2d, ResBlock
+from .checkpoint import checkpoint_blocks
+from .fusion import fuse_for_inference
+from .export import export_torchscript, check_parity
+from .quantization import quantize_weights_int8, quantize_static_int8
 
-__all__ = ['Conv2d', 'ConvTranspose2d', 'ResBlock']
+__all__ = ['Conv2d', 'ConvTranspose2d', 'ResBlock', 'checkpoint_blocks', 'fuse_for_inference',
+           'export_torchscript', 'check_parity', 'quantize_weights_int8', 'quantize_static_int8']
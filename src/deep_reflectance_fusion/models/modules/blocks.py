@@ -28,8 +28,8 @@ class Conv2d(nn.Module):
                               padding=padding,
                               dilation=dilation,
                               bias=bias)
-        self.bn = nn.BatchNorm2d(out_channels, eps=1e-5, momentum=0.1, affine=True) if bn else None
-        self.dropout = nn.Dropout(p=dropout, inplace=True) if dropout > 0 else None
+        self.bn = nn.BatchNorm2d(out_channels, eps=1e-5, momentum=0.1, affine=True) if bn else nn.Identity()
+        self.dropout = nn.Dropout(p=dropout, inplace=True) if dropout > 0 else nn.Identity()
         if relu:
             if leak > 0:
                 self.relu = nn.LeakyReLU(negative_slope=leak, inplace=True)
@@ -40,7 +40,7 @@ class Conv2d(nn.Module):
             else:
                 raise ValueError("Unknown argument specified for ReLU activation")
         else:
-            self.relu = None
+            self.relu = nn.Identity()
 
         # Weights initializer
         nn.init.xavier_normal_(self.conv.weight)
@@ -49,26 +49,27 @@ class Conv2d(nn.Module):
 
     def forward(self, x):
         x = self.conv(x)
-        if self.bn:
-            x = self.bn(x)
-        if self.dropout:
-            x = self.dropout(x)
-        if self.relu:
-            x = self.relu(x)
+        x = self.bn(x)
+        x = self.dropout(x)
+        x = self.relu(x)
         return x
 
     def output_size(self, input_size):
         """Computes output size
         Args:
             input_size (tuple): (C_in, H_in, W_in)
+
+        Returns:
+            type: tuple[int]
         """
         _, H_in, W_in = input_size
         C_out = self.conv.out_channels
-        kernel_size = self.conv.kernel_size[0]
-        padding = self.conv.padding[0]
-        stride = self.conv.stride[0]
-        H_out = int(np.floor((H_in - kernel_size + 2 * padding) / stride + 1))
-        W_out = int(np.floor((W_in - kernel_size + 2 * padding) / stride + 1))
+        kernel_size = self.conv.kernel_size
+        padding = self.conv.padding
+        stride = self.conv.stride
+        dilation = self.conv.dilation
+        H_out = int(np.floor((H_in + 2 * padding[0] - dilation[0] * (kernel_size[0] - 1) - 1) / stride[0] + 1))
+        W_out = int(np.floor((W_in + 2 * padding[1] - dilation[1] * (kernel_size[1] - 1) - 1) / stride[1] + 1))
         return (C_out, H_out, W_out)
 
 
@@ -100,8 +101,8 @@ class ConvTranspose2d(nn.Module):
                                        output_padding=output_padding,
                                        dilation=dilation,
                                        bias=bias)
-        self.bn = nn.BatchNorm2d(out_channels, eps=1e-5, momentum=0.1, affine=True) if bn else None
-        self.dropout = nn.Dropout(p=dropout, inplace=True) if dropout > 0 else None
+        self.bn = nn.BatchNorm2d(out_channels, eps=1e-5, momentum=0.1, affine=True) if bn else nn.Identity()
+        self.dropout = nn.Dropout(p=dropout, inplace=True) if dropout > 0 else nn.Identity()
         if relu:
             if leak > 0:
                 self.relu = nn.LeakyReLU(negative_slope=leak, inplace=True)
@@ -112,7 +113,7 @@ class ConvTranspose2d(nn.Module):
             else:
                 raise ValueError("Unknown argument specified for ReLU activation")
         else:
-            self.relu = None
+            self.relu = nn.Identity()
 
         # Weights initializer
         nn.init.xavier_normal_(self.conv.weight)
@@ -121,20 +122,29 @@ class ConvTranspose2d(nn.Module):
 
     def forward(self, x):
         x = self.conv(x)
-        if self.bn:
-            x = self.bn(x)
-        if self.dropout:
-            x = self.dropout(x)
-        if self.relu:
-            x = self.relu(x)
+        x = self.bn(x)
+        x = self.dropout(x)
+        x = self.relu(x)
         return x
 
     def output_size(self, input_size):
         """Computes output size
         Args:
             input_size (tuple): (C, H_in, W_in)
+
+        Returns:
+            type: tuple[int]
         """
-        raise NotImplementedError
+        _, H_in, W_in = input_size
+        C_out = self.conv.out_channels
+        kernel_size = self.conv.kernel_size
+        padding = self.conv.padding
+        output_padding = self.conv.output_padding
+        stride = self.conv.stride
+        dilation = self.conv.dilation
+        H_out = (H_in - 1) * stride[0] - 2 * padding[0] + dilation[0] * (kernel_size[0] - 1) + output_padding[0] + 1
+        W_out = (W_in - 1) * stride[1] - 2 * padding[1] + dilation[1] * (kernel_size[1] - 1) + output_padding[1] + 1
+        return (C_out, H_out, W_out)
 
 
 class ResBlock(nn.Module):
@@ -156,7 +166,7 @@ class ResBlock(nn.Module):
                             padding=padding, bias=bias, relu=True, leak=leak, bn=True)
         self.conv2 = Conv2d(out_channels, out_channels, kernel_size=3, stride=1,
                             padding=1, bias=bias, relu=False, bn=True)
-        self.adjust_identity = None
+        self.adjust_identity = nn.Identity()
         if stride > 1 or in_channels != out_channels:
             self.adjust_identity = Conv2d(in_channels, out_channels, kernel_size=1, stride=stride,
                                           bias=False, dilation=1, relu=False, bn=True)
@@ -167,10 +177,19 @@ class ResBlock(nn.Module):
         buffer = self.conv1(x)
         residual = self.conv2(buffer)
 
-        if self.adjust_identity is not None:
-            x = self.adjust_identity(x)
+        x = self.adjust_identity(x)
 
         residual = residual.mul(self.scaling)
         x = x.add(residual)
         x = self.relu(x)
         return x
+
+    def output_size(self, input_size):
+        """Computes output size
+        Args:
+            input_size (tuple): (C_in, H_in, W_in)
+
+        Returns:
+            type: tuple[int]
+        """
+        return self.conv2.output_size(self.conv1.output_size(input_size))
@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+import torch
+import torch.nn as nn
+from torch.utils.checkpoint import checkpoint
+
+
+@contextmanager
+def untracked_batch_norm_stats(modules):
+    """Disables running statistics update of batch normalization layers of
+    modules within context
+
+    In training mode, batch normalization layers which do not track running
+    statistics still normalize with batch statistics, hence outputs are unchanged.
+
+    Args:
+        modules (list[nn.Module]): modules whose batch normalization layers are untracked
+    """
+    batch_norms = [m for module in modules for m in module.modules()
+                   if isinstance(m, nn.modules.batchnorm._BatchNorm) and m.track_running_stats]
+    try:
+        for m in batch_norms:
+            m.track_running_stats = False
+        yield
+    finally:
+        for m in batch_norms:
+            m.track_running_stats = True
+
+
+def checkpoint_blocks(function, modules, *inputs):
+    """Runs function with activation checkpointing : intermediate activations
+    are not stored during forward pass and are recomputed during backward pass
+
+    Forward pass is recomputed in training mode, which would update batch
+    normalization running statistics twice. Running statistics of batch
+    normalization layers of modules are hence not updated during recomputation
+    such that results are identical to a regular forward pass.
+
+    Reentrant checkpointing only backpropagates to modules parameters if one of
+    the inputs requires gradient, which is not the case of the network input. A
+    dummy tensor requiring gradient is hence passed along inputs such that
+    blocks are checkpointed whatever their inputs.
+
+    Args:
+        function (callable): function mapping inputs to tensor or tuple of tensors
+        modules (list[nn.Module]): modules called by function
+        *inputs (torch.Tensor): function inputs
+
+    Returns:
+        type: torch.Tensor, tuple[torch.Tensor]
+    """
+    def run_function(dummy, *inputs):
+        # Gradient is only enabled when recomputing forward pass during backward
+        if torch.is_grad_enabled():
+            with untracked_batch_norm_stats(modules):
+                return function(*inputs)
+        return function(*inputs)
+    dummy = torch.empty(0, device=inputs[0].device, requires_grad=True)
+    return checkpoint(run_function, dummy, *inputs)
@@ -0,0 +1,45 @@
+import logging
+import torch
+
+
+def export_torchscript(model, example, trace=False):
+    """Scripts or traces model, then freezes it when supported by torch version
+    (torch >= 1.8), i.e. inlines parameters and submodules as constants and
+    folds them in graph
+
+    Args:
+        model (nn.Module): model to export in evaluation mode
+        example (torch.Tensor): example input used for tracing
+        trace (bool): if True, traces model instead of scripting it
+
+    Returns:
+        type: torch.jit.ScriptModule
+    """
+    with torch.no_grad():
+        exported = torch.jit.trace(model, example) if trace else torch.jit.script(model)
+    if hasattr(torch.jit, 'freeze'):
+        exported = torch.jit.freeze(exported)
+    else:
+        logging.warning(f"Exported model is not frozen, unsupported by torch {torch.__version__}")
+    return exported
+
+
+def check_parity(model, exported, example, atol):
+    """Checks exported model output matches eager model output
+
+    Args:
+        model (nn.Module): eager model
+        exported (torch.jit.ScriptModule): exported model
+        example (torch.Tensor): input to compare outputs on
+        atol (float): absolute tolerance
+
+    Returns:
+        type: float - maximum absolute error
+    """
+    with torch.no_grad():
+        output = model(example)
+        exported_output = exported(example)
+    max_error = (output - exported_output).abs().max().item()
+    if max_error > atol:
+        raise RuntimeError(f"Exported model output deviates from eager output by {max_error} > {atol}")
+    return max_error
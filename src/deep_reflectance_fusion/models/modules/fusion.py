@@ -0,0 +1,61 @@
+import torch
+import torch.nn as nn
+from .blocks import Conv2d, ConvTranspose2d
+
+
+@torch.no_grad()
+def fold_batch_norm(conv, bn, transposed=False):
+    """Folds evaluation mode batch normalization into weights and bias of
+    preceding convolution, in place
+
+    Batch normalization computes `gamma * (x - mean) / sqrt(var + eps) + beta`,
+    hence folded weights are scaled by `gamma / sqrt(var + eps)` along output
+    channels dimension and folded bias is `(bias - mean) * scale + beta`.
+
+    Args:
+        conv (nn.Conv2d, nn.ConvTranspose2d): convolutional layer
+        bn (nn.BatchNorm2d): batch normalization layer applied on convolution output
+        transposed (bool): if True, output channels are the second dimension
+            of convolution weights (default: False)
+    """
+    scale = torch.rsqrt(bn.running_var + bn.eps)
+    shift = -bn.running_mean * scale
+    if bn.affine:
+        scale = scale * bn.weight
+        shift = shift * bn.weight + bn.bias
+
+    # Scale weights along output channels dimension
+    shape = (1, -1, 1, 1) if transposed else (-1, 1, 1, 1)
+    conv.weight.mul_(scale.view(shape))
+
+    # Fold shift into bias, creating it if convolution has none
+    if conv.bias is None:
+        conv.bias = nn.Parameter(shift.clone())
+    else:
+        conv.bias.mul_(scale).add_(shift)
+
+
+def fuse_for_inference(model):
+    """Prepares model built out of convolutional blocks for inference : batch
+    normalization layers are folded into preceding convolutions and dropout
+    layers, which are no-ops in evaluation mode, are dropped
+
+    Fused model is set in evaluation mode and is meant for inference only.
+    Batch normalization layers which do not track running statistics normalize
+    with batch statistics and are left unchanged.
+
+    Args:
+        model (nn.Module): model to fuse in place
+
+    Returns:
+        type: nn.Module
+    """
+    model.eval()
+    for module in model.modules():
+        if not isinstance(module, (Conv2d, ConvTranspose2d)):
+            continue
+        if isinstance(module.bn, nn.BatchNorm2d) and module.bn.track_running_stats:
+            fold_batch_norm(module.conv, module.bn, transposed=isinstance(module, ConvTranspose2d))
+            module.bn = nn.Identity()
+        module.dropout = nn.Identity()
+    return model
@@ -0,0 +1,131 @@
+import copy
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.quantization import QuantWrapper, fuse_modules, prepare, convert, get_default_qconfig
+from .blocks import Conv2d, ConvTranspose2d
+from .fusion import fuse_for_inference
+
+
+class WeightOnlyInt8Conv(nn.Module):
+    """Convolutional layer storing weights as int8 with symmetric per output
+    channel scales, dequantized on the fly - activations remain in floating point
+
+    Args:
+        conv (nn.Conv2d, nn.ConvTranspose2d): convolutional layer to quantize
+    """
+    def __init__(self, conv):
+        super().__init__()
+        self.transposed = isinstance(conv, nn.ConvTranspose2d)
+        self.stride = conv.stride
+        self.padding = conv.padding
+        self.output_padding = conv.output_padding
+        self.dilation = conv.dilation
+        self.groups = conv.groups
+        self.bias = conv.bias
+
+        # Compute symmetric scale of each output channel
+        weight = conv.weight.detach()
+        out_dim = 1 if self.transposed else 0
+        scale = weight.abs().transpose(0, out_dim).flatten(1).max(dim=1)[0]
+        scale = scale.clamp(min=torch.finfo(weight.dtype).eps) / 127
+        shape = [1, -1, 1, 1] if self.transposed else [-1, 1, 1, 1]
+        scale = scale.view(shape)
+
+        # Quantize weights
+        weight_int8 = torch.round(weight / scale).clamp(min=-127, max=127).to(torch.int8)
+        self.register_buffer('weight_int8', weight_int8)
+        self.register_buffer('scale', scale)
+
+    def forward(self, x):
+        weight = self.weight_int8.to(x.dtype) * self.scale
+        if self.transposed:
+            return F.conv_transpose2d(x, weight, self.bias, self.stride, self.padding,
+                                      self.output_padding, self.groups, self.dilation)
+        return F.conv2d(x, weight, self.bias, self.stride, self.padding, self.dilation, self.groups)
+
+
+def quantize_weights_int8(model):
+    """Weight-only int8 quantization of model built out of convolutional blocks :
+    batch normalization is folded into convolutions which weights are then
+    stored as int8
+
+    Divides weights memory footprint by 4 while activations are computed in
+    floating point, hence latency is not reduced.
+
+    Args:
+        model (nn.Module): floating point model, left unchanged
+
+    Returns:
+        type: nn.Module
+    """
+    model = fuse_for_inference(copy.deepcopy(model))
+    for module in model.modules():
+        if isinstance(module, (Conv2d, ConvTranspose2d)):
+            module.conv = WeightOnlyInt8Conv(module.conv)
+    return model
+
+
+def wrap_quantizable_convs(model, qconfig):
+    """Wraps convolutions of Conv2d blocks between quantization and
+    dequantization stubs, in place, fusing them with their activation if it is
+    a plain ReLU
+
+    Transposed convolutions, PReLU and LeakyReLU activations and skip
+    connections concatenation lack int8 kernels in eager mode quantization of
+    older torch versions and are hence left in floating point.
+
+    Args:
+        model (nn.Module): model which batch normalization have been folded
+        qconfig (torch.quantization.QConfig): quantization configuration of wrapped convolutions
+    """
+    for module in model.modules():
+        if not isinstance(module, Conv2d):
+            continue
+        if isinstance(module.relu, nn.ReLU):
+            wrapper = QuantWrapper(nn.Sequential(module.conv, nn.ReLU()))
+            fuse_modules(wrapper.module, [['0', '1']], inplace=True)
+            module.relu = nn.Identity()
+        else:
+            wrapper = QuantWrapper(module.conv)
+        wrapper.qconfig = qconfig
+        module.conv = wrapper
+
+
+def quantize_static_int8(model, calibration_inputs, backend='fbgemm'):
+    """Static post-training int8 quantization of model : batch normalization is
+    folded into convolutions, activations ranges are calibrated on inputs and
+    weights and activations are quantized to int8
+
+    Relies on eager mode quantization such that it runs on all supported torch
+    versions : each convolution, fused with its ReLU activation, quantizes its
+    input and dequantizes its output while other operations are left in
+    floating point, see `wrap_quantizable_convs`.
+
+    Hence this does not speed up the shipped Unet generators : their decoding
+    transposed convolutions, PReLU activations and skip concatenations stay in
+    floating point and each quantized convolution pays a quantize/dequantize
+    round trip, making the int8 generator slower than fp32 on CPU. It is kept
+    to measure accuracy loss from int8 activations and weights.
+
+    Args:
+        model (nn.Module): floating point model, left unchanged
+        calibration_inputs (list[torch.Tensor]): batches of inputs used to
+            calibrate activations ranges
+        backend (str): quantized engine, 'fbgemm' for x86 and 'qnnpack' for ARM
+            (default: 'fbgemm')
+
+    Returns:
+        type: nn.Module
+    """
+    torch.backends.quantized.engine = backend
+    model = fuse_for_inference(copy.deepcopy(model))
+    wrap_quantizable_convs(model, qconfig=get_default_qconfig(backend))
+
+    # Insert observers, calibrate activations ranges and convert to quantized model
+    prepare(model, inplace=True)
+    with torch.no_grad():
+        for x in calibration_inputs:
+            model(x)
+    convert(model, inplace=True)
+    return model
@@ -37,6 +37,17 @@ class PatchGAN(ConvNet):
         # Make sigmoid layer
         self.sigmoid = nn.Sigmoid()
 
+    def _compute_output_size(self):
+        """Computes model output size, i.e. number of flattened patches
+        predictions - input size is expected to account for both sample and
+        conditionning channels
+
+        Returns:
+            type: tuple[int]
+        """
+        C, H, W = self._sequential_output_size(self.conv_layers, self.input_size)
+        return (C * H * W,)
+
     def forward(self, x, source):
         """Runs forward pass on input tensor x conditionned on source tensor.
 
@@ -1,7 +1,9 @@
+from functools import partial
+from typing import List
 import torch
 import torch.nn as nn
 from .backbones import ConvNet
-from .modules import Conv2d, ConvTranspose2d
+from .modules import Conv2d, ConvTranspose2d, checkpoint_blocks
 from ..models import MODELS
 
 
@@ -21,20 +23,26 @@ class Unet(ConvNet):
         dec_kwargs (dict, list[dict]): kwargs of decoding path, if dict same for
             each convolutional layer
         out_kwargs (dict): kwargs of output layer
+        checkpoint_every (int): if specified, encoding and decoding blocks are
+            run with activation checkpointing by groups of k blocks, trading
+            recomputation for memory (default: None)
 
     """
     def __init__(self, input_size, enc_filters, dec_filters, out_channels,
-                 enc_kwargs=None, dec_kwargs=None, out_kwargs=None):
+                 enc_kwargs=None, dec_kwargs=None, out_kwargs=None, checkpoint_every=None):
         super().__init__(input_size=input_size)
         out_kwargs = {} if out_kwargs is None else out_kwargs
 
         self.encoder = Encoder(input_size=input_size,
                                n_filters=enc_filters,
-                               conv_kwargs=enc_kwargs)
+                               conv_kwargs=enc_kwargs,
+                               checkpoint_every=checkpoint_every)
 
         self.decoder = Decoder(input_size=self.encoder.output_size,
                                n_filters=dec_filters,
-                               conv_kwargs=dec_kwargs)
+                               conv_kwargs=dec_kwargs,
+                               checkpoint_every=checkpoint_every,
+                               skip_sizes=self.encoder._compute_features_sizes()[-2::-1])
 
         self.output_layer = Conv2d(in_channels=dec_filters[-1],
                                    out_channels=out_channels,
@@ -42,6 +50,14 @@ class Unet(ConvNet):
                                    padding=1,
                                    **out_kwargs)
 
+    def _compute_output_size(self):
+        """Computes model output size
+
+        Returns:
+            type: tuple[int]
+        """
+        return self.output_layer.output_size(self.decoder.output_size)
+
     def forward(self, x):
         latent_features = self.encoder(x)
         output = self.decoder(latent_features)
@@ -67,12 +83,15 @@ class Encoder(ConvNet):
             layer
         conv_kwargs (dict, list[dict]): kwargs of decoding path, if dict same for
             each convolutional layer
+        checkpoint_every (int): if specified, runs blocks with activation
+            checkpointing by groups of k blocks (default: None)
     """
     _base_kwargs = {'kernel_size': 4, 'stride': 2, 'padding': 1, 'relu': 'learn', 'bn': True}
 
-    def __init__(self, input_size, n_filters, conv_kwargs=None):
+    def __init__(self, input_size, n_filters, conv_kwargs=None, checkpoint_every=None):
         super().__init__(input_size=input_size)
         self._conv_kwargs = self._init_kwargs_path(conv_kwargs, n_filters)
+        self.checkpoint_every = checkpoint_every
 
         # Extract inputs nb of channels to define first convolutional layer
         C, H, W = self.input_size
@@ -89,16 +108,55 @@ class Encoder(ConvNet):
         Returns:
             type: tuple[int]
         """
-        x = torch.rand(2, *self.input_size)
-        with torch.no_grad():
-            output = self(x)
-        return output[-1].shape[1:]
+        return self._sequential_output_size(self.encoding_layers, self.input_size)
 
-    def forward(self, x):
+    def _compute_features_sizes(self):
+        """Computes sizes of features yielded by each convolutional block
+
+        Returns:
+            type: list[tuple[int]]
+        """
+        features_sizes = [self.input_size]
+        for layer in self.encoding_layers:
+            features_sizes += [layer.output_size(features_sizes[-1])]
+        return features_sizes[1:]
+
+    def _forward_blocks(self, start, stop, x):
+        """Runs encoding blocks from start to stop index
+
+        Returns:
+            type: tuple[torch.Tensor]
+        """
         features = []
-        for i, layer in enumerate(self.encoding_layers):
+        for layer in self.encoding_layers[start:stop]:
             x = layer(x)
             features += [x]
+        return tuple(features)
+
+    @torch.jit.unused
+    def _checkpointed_forward(self, x: torch.Tensor) -> List[torch.Tensor]:
+        """Runs encoding blocks by groups of `checkpoint_every` blocks with
+        activation checkpointing
+
+        Returns:
+            type: list[torch.Tensor]
+        """
+        features = []
+        n_layers = len(self.encoding_layers)
+        for start in range(0, n_layers, self.checkpoint_every):
+            stop = min(start + self.checkpoint_every, n_layers)
+            forward_blocks = partial(self._forward_blocks, start, stop)
+            features += checkpoint_blocks(forward_blocks, self.encoding_layers[start:stop], x)
+            x = features[-1]
+        return features
+
+    def forward(self, x):
+        if self.checkpoint_every is not None and self.training and torch.is_grad_enabled():
+            return self._checkpointed_forward(x)
+        features = []
+        for layer in self.encoding_layers:
+            x = layer(x)
+            features.append(x)
         return features
 
 
@@ -114,12 +172,18 @@ class Decoder(ConvNet):
             layer
         conv_kwargs (dict, list[dict]): kwargs of decoding path, if dict same for
             each convolutional layer
+        checkpoint_every (int): if specified, runs blocks with activation
+            checkpointing by groups of k blocks (default: None)
+        skip_sizes (list[tuple[int]]): if specified, sizes of skip features
+            from deepest to shallowest, checked against decoded features sizes
+            such that incompatible input sizes fail at build time (default: None)
     """
     _base_kwargs = {'kernel_size': 4, 'stride': 2, 'relu': 'learn', 'bn': True, 'padding': 1}
 
-    def __init__(self, input_size, n_filters, conv_kwargs=None):
+    def __init__(self, input_size, n_filters, conv_kwargs=None, checkpoint_every=None, skip_sizes=None):
         super().__init__(input_size=input_size)
         self._conv_kwargs = self._init_kwargs_path(conv_kwargs, n_filters)
+        self.checkpoint_every = checkpoint_every
 
         # Build decoding layers doubling inputs nb of filters to account for skip connections
         decoding_seq = [ConvTranspose2d(in_channels=self.input_size[0], out_channels=n_filters[0],
@@ -128,10 +192,82 @@ class Decoder(ConvNet):
                          **self._conv_kwargs[i + 1]) for i in range(len(n_filters) - 1)]
         self.decoding_layers = nn.Sequential(*decoding_seq)
 
-    def forward(self, features):
-        x = features.pop()
+        if skip_sizes is not None:
+            self._check_skip_sizes(skip_sizes)
+
+    def _check_skip_sizes(self, skip_sizes):
+        """Checks features decoded by each block but the last one match size of
+        skip features they are stacked with
+
+        Args:
+            skip_sizes (list[tuple[int]]): (C, H, W) sizes of skip features from
+                deepest to shallowest
+        """
+        assert len(skip_sizes) == len(self.decoding_layers) - 1, \
+            f"Decoder expects {len(self.decoding_layers) - 1} skip features, got {len(skip_sizes)}"
+        output_size = self.input_size
+        for i, (layer, skip_size) in enumerate(zip(self.decoding_layers, skip_sizes)):
+            output_size = tuple(layer.output_size(output_size))
+            assert output_size == tuple(skip_size), \
+                f"Decoding block {i} output size {output_size} does not match skip features size " \
+                f"{tuple(skip_size)}, check input size is compatible with encoder strides"
+            output_size = (2 * output_size[0], *output_size[1:])
+
+    def _compute_output_size(self):
+        """Computes model output size, assuming skip connections stack a tensor
+        of same dimensions after each block but the last one
+
+        Returns:
+            type: tuple[int]
+        """
+        output_size = self.input_size
         for i, layer in enumerate(self.decoding_layers):
+            C, H, W = layer.output_size(output_size)
+            output_size = (2 * C, H, W) if i < len(self.decoding_layers) - 1 else (C, H, W)
+        return output_size
+
+    def _forward_blocks(self, start, stop, x, *skips):
+        """Runs decoding blocks from start to stop index, concatenating skip
+        features in order after each block
+
+        Returns:
+            type: torch.Tensor
+        """
+        skips = list(skips)
+        for layer in self.decoding_layers[start:stop]:
+            x = layer(x)
+            if len(skips) > 0:
+                x = torch.cat([x, skips.pop(0)], dim=1)
+        return x
+
+    @torch.jit.unused
+    def _checkpointed_forward(self, features: List[torch.Tensor]) -> torch.Tensor:
+        """Runs decoding blocks by groups of `checkpoint_every` blocks with
+        activation checkpointing
+
+        Returns:
+            type: torch.Tensor
+        """
+        x = features[-1]
+        skips = features[-2::-1]
+        n_layers = len(self.decoding_layers)
+        for start in range(0, n_layers, self.checkpoint_every):
+            stop = min(start + self.checkpoint_every, n_layers)
+            forward_blocks = partial(self._forward_blocks, start, stop)
+            x = checkpoint_blocks(forward_blocks, self.decoding_layers[start:stop], x, *skips[start:stop])
+        return x
+
+    def forward(self, features: List[torch.Tensor]) -> torch.Tensor:
+        if self.checkpoint_every is not None and self.training and torch.is_grad_enabled():
+            return self._checkpointed_forward(features)
+
+        # Skip features are indexed from deepest to shallowest, features list is left unchanged
+        x = features[-1]
+        n_skips = len(features) - 1
+        i = 0
+        for layer in self.decoding_layers:
             x = layer(x)
-            if len(features) > 0:
-                x = torch.cat([x, features.pop()], dim=1)
+            if i < n_skips:
+                x = torch.cat([x, features[n_skips - 1 - i]], dim=1)
+            i += 1
         return x
@@ -21,19 +21,20 @@ from progress.bar import Bar
 base_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../../../")
 sys.path.append(base_dir)
 
-from src.prepare_data.preprocessing.patch_extraction import PatchDataset, PatchExport
+from src.prepare_data.preprocessing.patch_extraction import PatchDataset, PatchExport, PatchManifest
 
 
 def main(args):
-    # Get list of path to patches directories
-    patches_directories = [os.path.join(args['--patch_dir'], x) for x in os.listdir(args['--patch_dir'])]
-    bar = Bar(f"Preparing patches for ESTARFM", max=len(patches_directories))
+    # Load manifest of patches directories
+    manifest = PatchManifest.from_root(args['--patch_dir'])
+    bar = Bar(f"Preparing patches for ESTARFM", max=len(manifest))
 
     # Setup export utility
     export = ESTARFMPatchExport(output_dir=args['--o'])
 
-    for patch_dir in patches_directories:
-        patch_dataset = PatchDataset(root=patch_dir)
+    for position, name in enumerate(manifest.names):
+        patch_dir = os.path.join(args['--patch_dir'], str(name))
+        patch_dataset = PatchDataset(root=patch_dir, manifest=manifest, position=position)
         export_patch_to_rasters_by_band(patch_dataset, export, args['--estarfm_out'])
         bar.next()
 
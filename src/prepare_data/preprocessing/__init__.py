@@ -1,3 +1,5 @@
-from .patch_extraction import PatchDataset
+from .patch_extraction import PatchDataset, PatchManifest, FrameCache, FramePool, ShardReader, \
+    FrameFetcher, PrefetchedFrames, MemmapFrames
 
-__all__ = ['PatchDataset']
+__all__ = ['PatchDataset', 'PatchManifest', 'FrameCache', 'FramePool', 'ShardReader',
+           'FrameFetcher', 'PrefetchedFrames', 'MemmapFrames']
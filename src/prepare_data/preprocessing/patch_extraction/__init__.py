@@ -1,3 +1,12 @@
 from .export import PatchExport, PatchDataset
+from .manifest import PatchManifest
+from .cache import FrameCache
+from .pool import FramePool
+from .statistics import BandStatistics
+from .shards import ShardWriter, ShardReader
+from .fetch import FrameFetcher, PrefetchedFrames
+from .memmap import MemmapFrames
 
-__all__ = ['PatchExport', 'PatchDataset']
+__all__ = ['PatchExport', 'PatchDataset', 'PatchManifest', 'FrameCache', 'FramePool', 'BandStatistics',
+           'ShardWriter', 'ShardReader', 'FrameFetcher', 'PrefetchedFrames',
+           'MemmapFrames']
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+
+class FrameCache:
+    """Size-bounded least-recently-used cache of loaded frames arrays keyed by
+    path to frame file
+
+    When a dataset holding a cache is sent to dataloading workers, each worker
+    process gets its own copy of the cache, hence frames are cached per-worker
+
+    Args:
+        maxsize (int): maximum number of frames held in cache
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._frames = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """Looks up frame in cache and marks it as most recently used
+
+        Args:
+            path (str): path to frame file
+
+        Returns:
+            type: np.ndarray, None if not cached
+        """
+        frame = self._frames.get(path)
+        if frame is None:
+            self.misses += 1
+        else:
+            self._frames.move_to_end(path)
+            self.hits += 1
+        return frame
+
+    def put(self, path, frame):
+        """Records frame in cache, evicting least recently used frames if needed
+
+        Args:
+            path (str): path to frame file
+            frame (np.ndarray)
+        """
+        self._frames[path] = frame
+        self._frames.move_to_end(path)
+        while len(self._frames) > self.maxsize:
+            self._frames.popitem(last=False)
+
+    def clear(self):
+        self._frames.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, path):
+        return path in self._frames
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        self._maxsize = maxsize
@@ -0,0 +1,87 @@
+"""
+Description : Computes bandwise statistics of patches dataset frames by
+    (1) Loading patches dataset manifest
+    (2) Streaming over frames of each file type in parallel chunks
+    (3) Merging chunks mean, std, percentiles and valid pixels counts
+    (4) Saving statistics into patches dataset manifest
+
+Usage: compute_statistics.py --root=<patches_directory> [--njobs=<number_of_jobs>] [--valid_min=<min_valid_value>] [--valid_max=<max_valid_value>]
+
+Options:
+  --root=<patches_directory>         Directory where patches have been dumped at patch extraction step
+  --njobs=<number_of_jobs>           Number of parallel jobs [default: 1]
+  --valid_min=<min_valid_value>      Minimum value of valid pixels [default: 0]
+  --valid_max=<max_valid_value>      Maximum value of valid pixels [default: 10000]
+"""
+import os
+import sys
+from docopt import docopt
+import logging
+from multiprocessing import Pool
+import h5py
+import numpy as np
+from progress.bar import Bar
+
+base_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../../../")
+sys.path.append(base_dir)
+
+from src.prepare_data.preprocessing.patch_extraction import PatchManifest, BandStatistics
+
+
+def main(args):
+    # Load patches manifest and gather frames paths by file type
+    root = args['--root']
+    manifest = PatchManifest.from_root(root)
+    valid_range = (int(args['--valid_min']), int(args['--valid_max']))
+    n_jobs = int(args['--njobs'])
+    logging.info(f"Loaded manifest of {len(manifest)} patches")
+
+    for file_type in PatchManifest._file_types:
+        paths = [os.path.join(root, str(manifest.names[patch]), manifest.get_path(path_id))
+                 for patch, path_id in zip(manifest.frames['patch'], manifest.frames[file_type])]
+
+        # Compute and merge statistics of chunks of frames in parallel
+        chunks = np.array_split(np.arange(len(paths)), max(1, 4 * n_jobs))
+        jobs_args = [([paths[i] for i in chunk], valid_range) for chunk in chunks if len(chunk)]
+        bar = Bar(f"Computing {file_type} statistics", max=len(jobs_args))
+        statistics = None
+        with Pool(processes=n_jobs) as pool:
+            for chunk_statistics in pool.imap_unordered(compute_frames_statistics, jobs_args):
+                statistics = chunk_statistics if statistics is None else statistics.merge(chunk_statistics)
+                bar.next()
+        manifest.statistics[file_type] = statistics.to_dict()
+        logging.info(f"{file_type} : mean = {statistics.mean} | std = {statistics.std}")
+
+    # Save statistics into manifest
+    manifest.save(path=os.path.join(root, PatchManifest._manifest_name))
+
+
+def compute_frames_statistics(job_args):
+    """Streams over frames and accumulates their bandwise statistics
+
+    Args:
+        job_args (tuple): list of paths to frames and range of valid pixels values
+
+    Returns:
+        type: BandStatistics
+    """
+    paths, valid_range = job_args
+    statistics = None
+    for path in paths:
+        with h5py.File(path, 'r') as f:
+            frame = f['data'][:]
+        statistics = statistics or BandStatistics(n_bands=frame.shape[0], valid_range=valid_range)
+        statistics.update(frame)
+    return statistics
+
+
+if __name__ == "__main__":
+    # Read input args
+    args = docopt(__doc__)
+
+    # Setup logging
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f'arguments: {args}')
+
+    # Run computation
+    main(args)
@@ -1,7 +1,9 @@
 import os
 import h5py
+import numpy as np
 from torch.utils.data import Dataset
 from src.utils import load_json, save_json
+from .manifest import PatchManifest
 
 
 class PatchExport:
@@ -11,15 +13,17 @@ class PatchExport:
     Sets up an output directories structured as :
     ```
     output_dir/
-    └── patch_directory/
-        ├── modis/
-        ├── landsat/
-        └── index.json
+    ├── patch_directory/
+    │   ├── modis/
+    │   ├── landsat/
+    │   └── index.json
+    └── manifest.npz
     ```
     where:
         - `modis/`: patches time serie extracted from modis scenes for given patch location
         - `landsat/`: patches time serie extracted from modis scenes for given patch location
         - `index.json`: mapping to patches respective path for each time step
+        - `manifest.npz`: consolidated manifest of all patches directories indices
 
     Args:
         output_dir (str): output directory
@@ -29,6 +33,7 @@ class PatchExport:
     _landsat_dirname = 'landsat'
     _patch_dirname = 'patch_{idx:03d}'
     _index_name = 'index.json'
+    _manifest_name = 'manifest.npz'
 
     def __init__(self, output_dir):
         self.output_dir = output_dir
@@ -154,6 +159,14 @@ class PatchExport:
         index_path = self._get_index_path(patch_idx)
         save_json(path=index_path, jsonFile=index)
 
+    def dump_manifest(self):
+        """Consolidates indices of all patches directories into a single
+        manifest saved under export directory
+        """
+        manifest = PatchManifest.from_directory(self.output_dir)
+        manifest_path = os.path.join(self.output_dir, self._manifest_name)
+        manifest.save(path=manifest_path)
+
     @property
     def output_dir(self):
         return self._output_dir
@@ -169,22 +182,27 @@ class PatchDataset(Dataset):
     Args:
         root (str): path to directory where patches have been dumped
         transform (callable): np.ndarray -> np.ndarray optional transform for patches
+        cache (FrameCache): optional cache of loaded frames, can be shared
+            among datasets
+        pool (FramePool): optional pool of preloaded frames, can be shared
+            among datasets
+        pool_offset (int): row of dataset first frame in pool
+        manifest (PatchManifest): optional manifest describing patch, if None
+            built from patch directory index
+        position (int): position of patch in manifest
     """
 
-    def __init__(self, root, transform=None):
+    def __init__(self, root, transform=None, cache=None, pool=None, pool_offset=0,
+                 manifest=None, position=0):
         self.root = root
         self.transform = transform
-        index_path = os.path.join(root, 'index.json')
-        self.index = load_json(index_path)
-        self._modis_path = self._get_paths('modis')
-        self._landsat_path = self._get_paths('landsat')
-        ####
-        # from torchvision import transforms
-        # self.landsat_normalization = transforms.Normalize(mean=(914, 3179, 500, 851),
-        #                                                   std=(640, 987, 311, 427))
-        # self.modis_normalization = transforms.Normalize(mean=(989, 3290, 523, 931),
-        #                                                 std=(1473, 1541, 1443, 1442))
-        ####
+        self.cache = cache
+        self.pool = pool
+        self.pool_offset = pool_offset
+        self.manifest = manifest if manifest is not None else PatchManifest.from_patch_directory(root)
+        self.position = position
+        self._modis_path = self.manifest.frame_paths(position=position, file_type='modis', root=root)
+        self._landsat_path = self.manifest.frame_paths(position=position, file_type='landsat', root=root)
 
     def _apply_transform(self, frame):
         """If defined, applies transformation to loaded frame, else return as is
@@ -203,33 +221,79 @@ class PatchDataset(Dataset):
     def _load_array(self, path):
         """h5py loading protocol, if null path returns None
 
+        If dataset has a cache, looks frame up in cache before reading file
+
         Args:
             path (str): path to array to load
 
         Returns:
             type: np.ndarray
         """
-        if path:
-            with h5py.File(path, 'r') as f:
-                array = f['data'][:]
+        if not path:
+            return None
+        if self.cache is not None:
+            array = self.cache.get(path)
+            if array is not None:
+                return array
+        with h5py.File(path, 'r') as f:
+            array = f['data'][:]
+        if self.cache is not None:
+            self.cache.put(path, array)
+        return array
+
+    def _load_frame(self, file_type, idx):
+        """Loads frame array of specified type at specified time step, reading
+        it from frames pool if dataset has been preloaded
+
+        Args:
+            file_type (str): type of frame to load in {'modis', 'landsat'}
+            idx (int): time step
+
+        Returns:
+            type: np.ndarray
+        """
+        if self.pool is not None:
+            array = self.pool.get(file_type, self.pool_offset + idx)
         else:
-            array = None
+            array = self._load_array(path=self._get_path(file_type, idx))
         return array
 
-    def _get_paths(self, file_type):
-        """Initializes path to all files for dataloading
+    def _get_path(self, file_type, idx):
+        """Returns path to frame of specified type at specified time step
 
         Args:
-            file_type (str): specifies type of file to load paths for in {'modis', 'landsat'}
+            file_type (str): type of frame in {'modis', 'landsat'}
+            idx (int): time step
 
         Returns:
-            type: dict[int: str]
+            type: str
         """
-        path = dict()
-        for key, file in self.index['files'].items():
-            filepath = os.path.join(self.root, file[file_type])
-            path.update({int(key) - 1: filepath})
-        return path
+        paths = self._modis_path if file_type == 'modis' else self._landsat_path
+        return paths[idx]
+
+    def frame_requests(self, idx):
+        """Lists frames loaded by `__getitem__` at specified index, allows
+        fetching them ahead of time
+
+        Args:
+            idx (int): dataset index
+
+        Returns:
+            type: list[tuple[str, int]] - (file_type, time step) pairs
+        """
+        return [('modis', idx), ('landsat', idx)]
+
+    def load_time_serie(self, file_type):
+        """Loads all frames of specified type stacked along time
+
+        Args:
+            file_type (str): type of frame to load in {'modis', 'landsat'}
+
+        Returns:
+            type: np.ndarray - (T, C, H, W)
+        """
+        frames = [self._load_frame(file_type=file_type, idx=t) for t in range(len(self._modis_path))]
+        return np.stack(frames)
 
     def __getitem__(self, idx):
         """Loads frame arrays
@@ -240,23 +304,22 @@ class PatchDataset(Dataset):
         Returns:
             type: tuple[np.ndarray]
         """
-        # Query path to frame and annotation at specified index
-        modis_path = self._modis_path[idx]
-        landsat_path = self._landsat_path[idx]
-
-        # Load numpy arrays from h5 files
-        modis_frame = self._load_array(path=modis_path)
-        landsat_frame = self._load_array(path=landsat_path)
+        # Load numpy arrays of frames at specified index
+        modis_frame = self._load_frame(file_type='modis', idx=idx)
+        landsat_frame = self._load_frame(file_type='landsat', idx=idx)
 
         # If defined, apply transformation to arrays
         modis_frame = self._apply_transform(modis_frame)
         landsat_frame = self._apply_transform(landsat_frame)
-
-        ########
-        # modis_frame = self.modis_normalization(modis_frame.float())
-        # landsat_frame = self.landsat_normalization(landsat_frame.float())
-        ########
         return modis_frame, landsat_frame
 
     def __len__(self):
         return len(self._modis_path)
+
+    @property
+    def index(self):
+        """Patch directory `index.json` content, only parsed when needed
+        """
+        if not hasattr(self, '_index'):
+            self._index = load_json(os.path.join(self.root, 'index.json'))
+        return self._index
@@ -0,0 +1,44 @@
+"""
+Description : Exports frames of patches dataset into raw binary files read through memory maps by
+    (1) Loading patches dataset manifest
+    (2) Appending frames of each file type one after the other into a single raw binary file
+    (3) Saving offsets table of frames as frames_index.npz
+
+Usage: export_memmap.py --root=<patches_directory> [--o=<output_directory>]
+
+Options:
+  --root=<patches_directory>         Directory where patches have been dumped at patch extraction step
+  --o=<output_directory>             Output directory, if not specified frames files are written in root
+"""
+import os
+import sys
+from docopt import docopt
+import logging
+
+base_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../../../")
+sys.path.append(base_dir)
+
+from src.prepare_data.preprocessing.patch_extraction import PatchManifest, MemmapFrames
+
+
+def main(args):
+    # Load patches manifest
+    root = args['--root']
+    manifest = PatchManifest.from_root(root)
+    logging.info(f"Loaded manifest of {len(manifest)} patches and {len(manifest.frames)} frames")
+
+    # Write frames into raw binary files
+    frames = MemmapFrames.write(root=root, manifest=manifest, output_dir=args['--o'])
+    logging.info(f"Exported {len(frames)} frames per file type to {frames.root}")
+
+
+if __name__ == "__main__":
+    # Read input args
+    args = docopt(__doc__)
+
+    # Setup logging
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f'arguments: {args}')
+
+    # Run export
+    main(args)
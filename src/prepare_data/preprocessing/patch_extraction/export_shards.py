@@ -0,0 +1,67 @@
+"""
+Description : Exports patches dataset into large sequential binary shards by
+    (1) Loading patches dataset manifest
+    (2) Loading full time serie of each patch
+    (3) Appending time series as records into shards of bounded size
+
+    Shards hold all patches of dataset, training loaders only stream records of
+    patches of their split subset, see `shards` dataloader option
+
+Usage: export_shards.py --root=<patches_directory> --o=<output_directory> [--shard_size=<shard_size>] [--seed=<seed>]
+
+Options:
+  --root=<patches_directory>         Directory where patches have been dumped at patch extraction step
+  --o=<output_directory>             Output directory
+  --shard_size=<shard_size>          Maximum size of shards in MB [default: 1024]
+  --seed=<seed>                      If specified, random seed to shuffle patches order across shards
+"""
+import os
+import sys
+from docopt import docopt
+import logging
+import numpy as np
+from progress.bar import Bar
+
+base_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../../../")
+sys.path.append(base_dir)
+
+from src.prepare_data.preprocessing.patch_extraction import PatchDataset, PatchManifest, ShardWriter
+
+
+def main(args):
+    # Load patches manifest
+    root = args['--root']
+    manifest = PatchManifest.from_root(root)
+    logging.info(f"Loaded manifest of {len(manifest)} patches")
+
+    # Shuffle patches order once such that shards mix patches
+    order = np.arange(len(manifest))
+    if args['--seed'] is not None:
+        order = np.random.RandomState(int(args['--seed'])).permutation(order)
+
+    bar = Bar("Exporting patches to shards", max=len(manifest))
+    with ShardWriter(output_dir=args['--o'], max_shard_size=int(args['--shard_size']) * 2 ** 20) as writer:
+        for position in order:
+            # Load patch frames time series
+            name = str(manifest.names[position])
+            patch_dataset = PatchDataset(root=os.path.join(root, name), manifest=manifest, position=position)
+            dates = manifest.frame_dates(position).astype(str)
+
+            # Append as record to shard
+            writer.write(name=name,
+                         dates=dates,
+                         modis_frames=patch_dataset.load_time_serie('modis'),
+                         landsat_frames=patch_dataset.load_time_serie('landsat'))
+            bar.next()
+
+
+if __name__ == "__main__":
+    # Read input args
+    args = docopt(__doc__)
+
+    # Setup logging
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f'arguments: {args}')
+
+    # Run export
+    main(args)
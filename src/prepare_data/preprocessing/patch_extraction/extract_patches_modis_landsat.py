@@ -4,6 +4,7 @@ Description : Builds co-registered Landsat and MODIS patches dataset by
     (2) Resampling MODIS to same resolution and bounds than Landsat
     (3) Chipping valid co-registered patches from rasters
     (4) Saving pairs of patches into structured directory
+    (5) Saving consolidated manifest of all patches
 
 Usage: extract_patches_modis_landsat.py --o=<output_directory> --modis_root=<modis_scenes_directory>  --landsat_root=<landsat_scenes_directory> --scenes_specs=<scenes_to_load>
 
@@ -82,6 +83,10 @@ def main(args):
                                    export=export)
             bar.next()
 
+    # Consolidate patches indices into single manifest
+    export.dump_manifest()
+    logging.info("Dumped patches manifest")
+
 
 def extract_and_dump_patch(landsat_raster, modis_raster, window, patch_idx, date, export):
     """Handles joined patch extraction and dumping given patch window and export protocol
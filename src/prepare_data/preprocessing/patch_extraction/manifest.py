@@ -0,0 +1,297 @@
+import os
+import numpy as np
+from src.utils import load_json
+
+
+class PatchManifest:
+    """Compact columnar description of patches dumped following PatchExport protocol
+
+    Instead of holding each patch `index.json` as nested python dictionnaries,
+    the manifest stores patches and frames informations into a handful of
+    numpy arrays :
+
+        - `patches`: one record per patch directory as (name, patch_idx, bounds, start, horizon)
+            where `start` is the row of the patch first frame in `frames`
+        - `frames`: one record per time step as (patch, step, date, modis, landsat)
+            where `patch` is the position of the patch in `patches` and `modis`,
+            `landsat` are identifiers of frames relative paths
+        - `paths`: relative paths to frames files packed into a single bytes buffer
+        - `paths_offsets`: position of each path in packed buffer
+        - `statistics`: optional bandwise statistics of frames by file type,
+            see `BandStatistics`
+
+    Frames of a patch hence occupy contiguous rows of `frames`. Since these
+    arrays are not made of python objects, dataloading workers forked from the
+    main process read them without triggering copy-on-write of the memory pages.
+
+    Args:
+        patches (np.ndarray): patches structured array
+        frames (np.ndarray): frames structured array
+        paths (np.ndarray): (n_bytes,) packed paths buffer
+        paths_offsets (np.ndarray): (n_paths + 1,) offsets of paths in buffer
+        statistics (dict[str, dict[str, np.ndarray]]): optional frames statistics by file type
+    """
+    _file_types = ('modis', 'landsat')
+    _index_name = 'index.json'
+    _manifest_name = 'manifest.npz'
+    _statistics_key = 'statistics_{file_type}_{name}'
+
+    def __init__(self, patches, frames, paths, paths_offsets, statistics=None):
+        self.patches = patches
+        self.frames = frames
+        self.paths = paths
+        self.paths_offsets = paths_offsets
+        self.statistics = statistics or dict()
+
+    @staticmethod
+    def _patches_dtype(name_length):
+        return np.dtype([('name', f'U{name_length}'),
+                         ('patch_idx', np.int32),
+                         ('bounds', np.int32, (4,)),
+                         ('start', np.int64),
+                         ('horizon', np.int32)])
+
+    @staticmethod
+    def _frames_dtype():
+        return np.dtype([('patch', np.int32),
+                         ('step', np.int32),
+                         ('date', 'datetime64[D]'),
+                         ('modis', np.int64),
+                         ('landsat', np.int64)])
+
+    @classmethod
+    def from_indices(cls, names, indices):
+        """Builds manifest out of patches directories names and their parsed
+        `index.json` files
+
+        Args:
+            names (list[str]): patches directories names
+            indices (list[dict]): corresponding patches indices
+
+        Returns:
+            type: PatchManifest
+        """
+        patches = np.zeros(len(names), dtype=cls._patches_dtype(max(map(len, names), default=1)))
+        frames, paths = [], []
+        for position, (name, index) in enumerate(zip(names, indices)):
+            files = sorted(index['files'].items(), key=lambda x: int(x[0]))
+            patches[position] = (name,
+                                 index['features']['patch_idx'],
+                                 index['features']['patch_bounds'],
+                                 len(frames),
+                                 len(files))
+            for step, (_, file) in enumerate(files):
+                frames += [(position, step, file['date'], len(paths), len(paths) + 1)]
+                paths += [file[file_type] for file_type in cls._file_types]
+        frames = np.array(frames, dtype=cls._frames_dtype())
+
+        # Pack relative paths into single bytes buffer
+        encoded_paths = [path.encode() for path in paths]
+        paths_offsets = np.cumsum([0] + list(map(len, encoded_paths))).astype(np.int64)
+        paths = np.frombuffer(b''.join(encoded_paths), dtype=np.uint8).copy()
+        return cls(patches=patches, frames=frames, paths=paths, paths_offsets=paths_offsets)
+
+    @classmethod
+    def from_directory(cls, root):
+        """Builds manifest by parsing `index.json` of each patch directory under root
+
+        Args:
+            root (str): directory where patches have been dumped
+
+        Returns:
+            type: PatchManifest
+        """
+        names = cls._list_patch_directories(root)
+        indices = [load_json(os.path.join(root, name, cls._index_name)) for name in names]
+        return cls.from_indices(names=names, indices=indices)
+
+    @classmethod
+    def from_patch_directory(cls, patch_directory):
+        """Builds manifest of a single patch directory
+
+        Args:
+            patch_directory (str): patch directory path
+
+        Returns:
+            type: PatchManifest
+        """
+        index = load_json(os.path.join(patch_directory, cls._index_name))
+        name = os.path.basename(os.path.normpath(patch_directory))
+        return cls.from_indices(names=[name], indices=[index])
+
+    @classmethod
+    def from_root(cls, root):
+        """Loads consolidated manifest dumped under root directory if up to date,
+        else rebuilds it by parsing each patch directory index and dumps it such
+        that next loadings do not scan patches directories again
+
+        Frames statistics of a stale manifest are carried over to the rebuilt one.
+
+        Args:
+            root (str): directory where patches have been dumped
+
+        Returns:
+            type: PatchManifest
+        """
+        manifest_path = os.path.join(root, cls._manifest_name)
+        statistics = None
+        if os.path.isfile(manifest_path):
+            manifest = cls.load(manifest_path)
+            if not manifest.is_stale(root=root, manifest_path=manifest_path):
+                return manifest
+            statistics = manifest.statistics
+        manifest = cls.from_directory(root)
+        manifest.statistics = statistics or dict()
+        try:
+            manifest.save(manifest_path)
+        except OSError:
+            # Patches may be stored on read-only storage
+            pass
+        return manifest
+
+    def is_stale(self, root, manifest_path):
+        """Manifest is stale if root directory has been modified after manifest
+        dump, i.e. if patches directories have been added, removed or renamed
+
+        Only root directory modification time is inspected such that check
+        costs a single metadata call whatever the number of patches, hence in
+        place modifications of patches indices are not detected and require
+        dumping manifest again.
+
+        Args:
+            root (str): directory where patches have been dumped
+            manifest_path (str): path to dumped manifest
+
+        Returns:
+            type: bool
+        """
+        return os.path.getmtime(root) > os.path.getmtime(manifest_path)
+
+    @classmethod
+    def _list_patch_directories(cls, root):
+        """Lists names of directories under root holding a patch index
+
+        Args:
+            root (str)
+
+        Returns:
+            type: list[str]
+        """
+        names = [name for name in os.listdir(root)
+                 if os.path.isfile(os.path.join(root, name, cls._index_name))]
+        return names
+
+    @classmethod
+    def load(cls, path):
+        """Loads manifest dumped as .npz file
+
+        Args:
+            path (str)
+
+        Returns:
+            type: PatchManifest
+        """
+        with np.load(path) as arrays:
+            # Gather frames statistics arrays by file type
+            statistics = dict()
+            for file_type in cls._file_types:
+                prefix = cls._statistics_key.format(file_type=file_type, name='')
+                file_type_statistics = {key[len(prefix):]: arrays[key]
+                                        for key in arrays.files if key.startswith(prefix)}
+                if file_type_statistics:
+                    statistics[file_type] = file_type_statistics
+
+            manifest = cls(patches=arrays['patches'],
+                           frames=arrays['frames'],
+                           paths=arrays['paths'],
+                           paths_offsets=arrays['paths_offsets'],
+                           statistics=statistics)
+        return manifest
+
+    def save(self, path):
+        """Dumps manifest arrays as .npz file
+
+        Args:
+            path (str)
+        """
+        statistics = {self._statistics_key.format(file_type=file_type, name=name): array
+                      for file_type, file_type_statistics in self.statistics.items()
+                      for name, array in file_type_statistics.items()}
+        with open(path, 'wb') as f:
+            np.savez(f,
+                     patches=self.patches,
+                     frames=self.frames,
+                     paths=self.paths,
+                     paths_offsets=self.paths_offsets,
+                     **statistics)
+
+    def get_path(self, path_id):
+        """Decodes relative path from packed buffer
+
+        Args:
+            path_id (int): path identifier
+
+        Returns:
+            type: str
+        """
+        start, end = self.paths_offsets[path_id], self.paths_offsets[path_id + 1]
+        return self.paths[start:end].tobytes().decode()
+
+    def frame_paths(self, position, file_type, root):
+        """Sequence of paths to frames of specified type for patch at specified position
+
+        Args:
+            position (int): position of patch in manifest
+            file_type (str): type of frame in {'modis', 'landsat'}
+            root (str): patch directory
+
+        Returns:
+            type: FramePaths
+        """
+        return FramePaths(manifest=self, position=position, file_type=file_type, root=root)
+
+    def frame_dates(self, position):
+        """Dates of frames of patch at specified position
+
+        Args:
+            position (int): position of patch in manifest
+
+        Returns:
+            type: np.ndarray - (horizon,) datetime64[D] array
+        """
+        start, horizon = self.patches['start'][position], self.patches['horizon'][position]
+        return self.frames['date'][start:start + horizon]
+
+    def __len__(self):
+        return len(self.patches)
+
+    @property
+    def names(self):
+        return self.patches['name']
+
+
+class FramePaths:
+    """Read-only sequence of paths to frames of a patch decoded on access from
+    manifest packed paths buffer
+
+    Args:
+        manifest (PatchManifest)
+        position (int): position of patch in manifest
+        file_type (str): type of frame in {'modis', 'landsat'}
+        root (str): patch directory
+    """
+    def __init__(self, manifest, position, file_type, root):
+        self.manifest = manifest
+        self.file_type = file_type
+        self.root = root
+        self._start = int(manifest.patches['start'][position])
+        self._horizon = int(manifest.patches['horizon'][position])
+
+    def __getitem__(self, idx):
+        if not 0 <= idx < self._horizon:
+            raise IndexError(f"Time step {idx} out of range")
+        path_id = self.manifest.frames[self.file_type][self._start + idx]
+        return os.path.join(self.root, self.manifest.get_path(path_id))
+
+    def __len__(self):
+        return self._horizon
@@ -0,0 +1,125 @@
+import os
+import h5py
+import numpy as np
+
+
+class MemmapFrames:
+    """Frames of a patches dataset stored as one raw binary file per file type,
+    read through memory maps
+
+    Frames are laid out following patches manifest frames rows at writing time,
+    hence frame at time step t of a patch is stored at row `start + t` where
+    `start` is the row of the patch first frame recorded by patch name. Since
+    frames may have different shapes, an offset table records position and
+    shape of each frame in file :
+    ```
+    root/
+    ├── frames_modis.bin
+    ├── frames_landsat.bin
+    └── frames_index.npz
+    ```
+
+    Frames are served as views on memory maps such that repeated reads are
+    served by the OS page cache with no decoding nor copy. Maps are opened
+    lazily, in copy-on-write mode to provide writable views to torch.
+
+    Args:
+        root (str): directory where frames files have been written
+    """
+    _file_types = ('modis', 'landsat')
+    _frames_name = 'frames_{file_type}.bin'
+    _index_name = 'frames_index.npz'
+
+    def __init__(self, root):
+        self.root = root
+        with np.load(os.path.join(root, self._index_name)) as index:
+            self.dtype = np.dtype(str(index['dtype']))
+            self.offsets = {file_type: index[f'{file_type}_offsets'] for file_type in self._file_types}
+            self.shapes = {file_type: index[f'{file_type}_shapes'] for file_type in self._file_types}
+            self.starts = dict(zip(index['names'].tolist(), index['starts'].tolist()))
+        self._maps = None
+
+    @classmethod
+    def write(cls, root, manifest, output_dir=None):
+        """Writes frames of patches dataset into raw binary files following
+        manifest frames order
+
+        Args:
+            root (str): directory where patches have been dumped
+            manifest (PatchManifest): patches dataset manifest
+            output_dir (str): directory where frames files are written (default: root)
+
+        Returns:
+            type: MemmapFrames
+        """
+        output_dir = output_dir or root
+        os.makedirs(output_dir, exist_ok=True)
+        index, dtype = dict(), None
+        for file_type in cls._file_types:
+            shapes, offsets = [], [0]
+            frames_path = os.path.join(output_dir, cls._frames_name.format(file_type=file_type))
+            with open(frames_path, 'wb') as f:
+                for patch, path_id in zip(manifest.frames['patch'], manifest.frames[file_type]):
+                    path = os.path.join(root, str(manifest.names[patch]), manifest.get_path(path_id))
+                    with h5py.File(path, 'r') as h5:
+                        frame = h5['data'][:]
+                    dtype = dtype or frame.dtype
+                    f.write(np.ascontiguousarray(frame, dtype=dtype).tobytes())
+                    shapes += [frame.shape]
+                    offsets += [offsets[-1] + frame.size]
+            index[f'{file_type}_offsets'] = np.asarray(offsets, dtype=np.int64)
+            index[f'{file_type}_shapes'] = np.asarray(shapes, dtype=np.int64).reshape(-1, 3)
+        np.savez(os.path.join(output_dir, cls._index_name),
+                 dtype=np.dtype(dtype).str,
+                 names=manifest.names,
+                 starts=manifest.patches['start'],
+                 **index)
+        return cls(output_dir)
+
+    @property
+    def maps(self):
+        if self._maps is None:
+            self._maps = dict()
+            for file_type in self._file_types:
+                frames_path = os.path.join(self.root, self._frames_name.format(file_type=file_type))
+                self._maps[file_type] = np.memmap(frames_path, dtype=self.dtype, mode='c',
+                                                  shape=(int(self.offsets[file_type][-1]),))
+        return self._maps
+
+    def get(self, file_type, row):
+        """Returns view on frame stored at specified row
+
+        Args:
+            file_type (str): type of frame in {'modis', 'landsat'}
+            row (int): row of frame in manifest frames
+
+        Returns:
+            type: np.ndarray
+        """
+        start, end = self.offsets[file_type][row], self.offsets[file_type][row + 1]
+        frame = self.maps[file_type][start:end].reshape(tuple(self.shapes[file_type][row]))
+        return frame
+
+    def patch_offsets(self, names):
+        """Returns row of first frame of specified patches
+
+        Args:
+            names (list[str]): patches directories names
+
+        Returns:
+            type: list[int]
+        """
+        return [self.starts[str(name)] for name in names]
+
+    def __len__(self):
+        return len(self.shapes[self._file_types[0]])
+
+    def __getstate__(self):
+        # Memory maps are reopened by each process rather than pickled
+        state = self.__dict__.copy()
+        state['_maps'] = None
+        return state
+
+    @classmethod
+    def exists(cls, root):
+        return os.path.isfile(os.path.join(root, cls._index_name))
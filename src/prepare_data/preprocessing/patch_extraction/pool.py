@@ -0,0 +1,91 @@
+import h5py
+import numpy as np
+import torch
+
+
+class FramePool:
+    """Pool of frames preloaded into a single flat tensor placed in shared memory
+
+    Frames of each file type are addressed by row, where rows of a patch
+    dataset time serie are contiguous, i.e. frame at time step t of a patch
+    whose first frame is stored at row `offset` is stored at row `offset + t`
+
+    Since the buffer lives in shared memory, dataloading workers read frames
+    from the same memory pages without copying them
+
+    Args:
+        buffer (torch.Tensor): flat tensor holding all frames
+        offsets (dict[str, np.ndarray]): (n_frames + 1,) position of each frame
+            in buffer by file type
+        shapes (dict[str, np.ndarray]): (n_frames, C, H, W) shape of each frame
+            by file type
+    """
+    _file_types = ('modis', 'landsat')
+
+    def __init__(self, buffer, offsets, shapes):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.shapes = shapes
+
+    @classmethod
+    def from_datasets(cls, datasets):
+        """Preloads all frames of list of patch datasets into shared memory pool
+
+        Frame shapes are first read from files metadata to allocate the pool
+        buffer, frames are then read straight into it
+
+        Args:
+            datasets (list[PatchDataset]): datasets to preload
+
+        Returns:
+            type: FramePool, list[int] - pool and row of first frame of each dataset in pool
+        """
+        # Gather frames paths by file type following datasets order
+        horizons = [len(dataset._modis_path) for dataset in datasets]
+        paths = {file_type: [dataset._get_path(file_type, t) for dataset, horizon in zip(datasets, horizons) for t in range(horizon)]
+                 for file_type in cls._file_types}
+        pool_offsets = np.cumsum([0] + horizons[:-1]).tolist()
+
+        # Read frames shapes and compute their position in buffer
+        shapes, offsets, dtype = dict(), dict(), None
+        position = 0
+        for file_type in cls._file_types:
+            file_type_shapes = []
+            for path in paths[file_type]:
+                with h5py.File(path, 'r') as f:
+                    file_type_shapes += [f['data'].shape]
+                    dtype = dtype or f['data'].dtype
+            shapes[file_type] = np.asarray(file_type_shapes, dtype=np.int64).reshape(-1, 3)
+            sizes = np.prod(shapes[file_type], axis=1)
+            offsets[file_type] = position + np.concatenate([[0], np.cumsum(sizes)])
+            position = offsets[file_type][-1]
+
+        # Allocate shared buffer and read frames into it
+        buffer = torch.from_numpy(np.empty(position, dtype=dtype)).share_memory_()
+        pool = cls(buffer=buffer, offsets=offsets, shapes=shapes)
+        for file_type in cls._file_types:
+            for row, path in enumerate(paths[file_type]):
+                with h5py.File(path, 'r') as f:
+                    f['data'].read_direct(pool.get(file_type, row))
+        return pool, pool_offsets
+
+    def get(self, file_type, row):
+        """Returns view on frame stored at specified row
+
+        Args:
+            file_type (str): type of frame in {'modis', 'landsat'}
+            row (int): row of frame in pool
+
+        Returns:
+            type: np.ndarray
+        """
+        start, end = self.offsets[file_type][row], self.offsets[file_type][row + 1]
+        frame = self.buffer[start:end].numpy().reshape(tuple(self.shapes[file_type][row]))
+        return frame
+
+    def __len__(self):
+        return len(self.shapes[self._file_types[0]])
+
+    @property
+    def nbytes(self):
+        return self.buffer.numel() * self.buffer.element_size()
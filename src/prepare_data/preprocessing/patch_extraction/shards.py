@@ -0,0 +1,118 @@
+import os
+import numpy as np
+from src.utils import load_json, save_json
+
+
+class ShardWriter:
+    """Writes patches time series into large sequential binary shards
+
+    Each record holds the full time serie of a patch, as raw bytes of its
+    modis frames followed by its landsat frames. Records are appended to the
+    current shard until it exceeds maximum shard size. Each shard comes with
+    an index listing its records offsets, shapes and dates :
+    ```
+    output_dir/
+    ├── shard_00000.bin
+    ├── shard_00000.json
+    ├── shard_00001.bin
+    └── shard_00001.json
+    ```
+
+    Args:
+        output_dir (str): output directory
+        max_shard_size (int): maximum number of bytes per shard, a shard is
+            closed as soon as it exceeds this size (default: 1GB)
+    """
+    _shard_name = 'shard_{idx:05d}'
+    _file_types = ('modis', 'landsat')
+
+    def __init__(self, output_dir, max_shard_size=2 ** 30):
+        self.output_dir = output_dir
+        self.max_shard_size = max_shard_size
+        self._shard_idx = 0
+        self._file = None
+        self._index = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open_shard(self):
+        shard_path = os.path.join(self.output_dir, self._shard_name.format(idx=self._shard_idx) + '.bin')
+        self._file = open(shard_path, 'wb')
+        self._index = {'records': []}
+
+    def _close_shard(self):
+        if self._file is None:
+            return
+        self._file.close()
+        index_path = os.path.join(self.output_dir, self._shard_name.format(idx=self._shard_idx) + '.json')
+        save_json(path=index_path, jsonFile=self._index)
+        self._file, self._index = None, None
+        self._shard_idx += 1
+
+    def write(self, name, dates, modis_frames, landsat_frames):
+        """Appends patch time serie record to current shard
+
+        Args:
+            name (str): patch directory name
+            dates (list[str]): dates of time steps formatted as yyyy-mm-dd
+            modis_frames (np.ndarray): (T, C, H, W) modis frames
+            landsat_frames (np.ndarray): (T, C, H, W) landsat frames
+        """
+        if self._file is None:
+            self._open_shard()
+
+        # Record position and layout of frames in shard
+        record = {'name': name,
+                  'dates': list(map(str, dates)),
+                  'offset': self._file.tell()}
+        for file_type, frames in zip(self._file_types, (modis_frames, landsat_frames)):
+            record[file_type] = {'shape': list(frames.shape), 'dtype': frames.dtype.str}
+            self._file.write(np.ascontiguousarray(frames).tobytes())
+        self._index['records'] += [record]
+
+        # Move on to next shard if current one is full
+        if self._file.tell() >= self.max_shard_size:
+            self._close_shard()
+
+    def close(self):
+        self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ShardReader:
+    """Sequential reader of shards written by ShardWriter
+
+    Args:
+        shard_path (str): path to shard .bin file
+        names (set[str]): if specified, only records of these patches are read
+    """
+    _file_types = ('modis', 'landsat')
+
+    def __init__(self, shard_path, names=None):
+        self.shard_path = shard_path
+        self.index = load_json(os.path.splitext(shard_path)[0] + '.json')
+        if names is not None:
+            self.index['records'] = [record for record in self.index['records'] if record['name'] in names]
+
+    def __iter__(self):
+        """Reads records sequentially
+
+        Yields:
+            type: dict - with keys 'name', 'dates', 'modis', 'landsat'
+        """
+        with open(self.shard_path, 'rb') as f:
+            for record in self.index['records']:
+                f.seek(record['offset'])
+                output = {'name': record['name'], 'dates': record['dates']}
+                for file_type in self._file_types:
+                    shape, dtype = record[file_type]['shape'], np.dtype(record[file_type]['dtype'])
+                    buffer = f.read(int(np.prod(shape)) * dtype.itemsize)
+                    output[file_type] = np.frombuffer(buffer, dtype=dtype).reshape(shape)
+                yield output
+
+    def __len__(self):
+        return len(self.index['records'])
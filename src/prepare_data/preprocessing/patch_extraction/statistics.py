@@ -0,0 +1,129 @@
+import numpy as np
+
+
+class BandStatistics:
+    """Streaming bandwise statistics accumulator over int16 reflectance frames
+
+    Pixels are considered valid if their value lies within valid range. Over
+    valid pixels, are accumulated :
+
+        - `count`, `mean`, `m2`: running count, mean and sum of squared deviations
+            to the mean following Welford's algorithm, such that accumulators
+            updated in parallel over distinct frames can be merged with Chan's
+            formula
+        - `histogram`: exact histogram of int16 values from which percentiles
+            are read
+
+    Args:
+        n_bands (int): number of bands of frames
+        valid_range (tuple[int]): (min, max) range of valid pixels values (default: (0, 10000))
+    """
+    _n_values = 2 ** 16
+    _offset = 2 ** 15
+
+    def __init__(self, n_bands, valid_range=(0, 10000)):
+        self.n_bands = n_bands
+        self.valid_range = tuple(valid_range)
+        self.count = np.zeros(n_bands, dtype=np.int64)
+        self.mean = np.zeros(n_bands, dtype=np.float64)
+        self.m2 = np.zeros(n_bands, dtype=np.float64)
+        self.total_count = np.zeros(n_bands, dtype=np.int64)
+        self.histogram = np.zeros((n_bands, self._n_values), dtype=np.int64)
+
+    def _merge_moments(self, count, mean, m2):
+        """Merges running moments with moments of another set of pixels following
+        Chan's parallel algorithm
+
+        Args:
+            count (np.ndarray): (n_bands,) number of pixels
+            mean (np.ndarray): (n_bands,) mean of pixels
+            m2 (np.ndarray): (n_bands,) sum of squared deviations to mean
+        """
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(total > 0, self.mean + delta * count / total, 0.)
+            self.m2 = np.where(total > 0, self.m2 + m2 + delta ** 2 * self.count * count / total, 0.)
+        self.count = total
+
+    def update(self, frame):
+        """Updates statistics with frame pixels
+
+        Args:
+            frame (np.ndarray): (n_bands, H, W) int16 frame
+        """
+        bands = frame.reshape(self.n_bands, -1)
+        low, high = self.valid_range
+        self.total_count += bands.shape[1]
+
+        count, mean, m2 = [], [], []
+        for band_idx, band in enumerate(bands):
+            # Select valid pixels and record their histogram
+            band = band[(band >= low) & (band <= high)]
+            values = band.astype(np.int64) + self._offset
+            self.histogram[band_idx] += np.bincount(values, minlength=self._n_values)
+
+            # Compute frame moments
+            band = band.astype(np.float64)
+            count += [band.size]
+            mean += [band.mean() if band.size else 0.]
+            m2 += [((band - mean[-1]) ** 2).sum()]
+        self._merge_moments(np.array(count), np.array(mean), np.array(m2))
+
+    def merge(self, other):
+        """Merges statistics accumulated over other frames in place
+
+        Args:
+            other (BandStatistics)
+
+        Returns:
+            type: BandStatistics
+        """
+        assert self.valid_range == other.valid_range, "Can't merge statistics with different valid ranges"
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.total_count += other.total_count
+        self.histogram += other.histogram
+        return self
+
+    def percentiles(self, q):
+        """Computes bandwise percentiles of valid pixels from histogram, NaN
+        for bands without any valid pixel
+
+        Args:
+            q (list[float]): percentiles to compute in [0, 100]
+
+        Returns:
+            type: np.ndarray - (n_bands, len(q))
+        """
+        cumcounts = np.cumsum(self.histogram, axis=1)
+        ranks = np.outer(self.count, np.asarray(q, dtype=np.float64) / 100)
+        ranks = np.clip(np.ceil(ranks), 1, None)
+        values = np.stack([np.searchsorted(band_cumcounts, band_ranks)
+                           for band_cumcounts, band_ranks in zip(cumcounts, ranks)])
+        values = (values - self._offset).astype(np.float64)
+        values[self.count == 0] = np.nan
+        return values
+
+    @property
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(np.where(self.count > 0, self.m2 / self.count, 0.))
+        return std
+
+    def to_dict(self, q=(1, 2, 5, 25, 50, 75, 95, 98, 99)):
+        """Summarizes statistics as dictionnary of arrays
+
+        Args:
+            q (list[float]): percentiles to report
+
+        Returns:
+            type: dict[str, np.ndarray]
+        """
+        output = {'mean': self.mean,
+                  'std': self.std,
+                  'valid_count': self.count,
+                  'total_count': self.total_count,
+                  'valid_range': np.asarray(self.valid_range),
+                  'q': np.asarray(q, dtype=np.float64),
+                  'percentiles': self.percentiles(q)}
+        return output
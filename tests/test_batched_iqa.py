@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import torch
+from skimage.metrics import structural_similarity
+from src.deep_reflectance_fusion.evaluation import metrics
+
+
+@pytest.fixture
+def images():
+    # Random reflectance-like batch and noisy estimate, with some negative values clamped by metrics
+    generator = torch.Generator().manual_seed(0)
+    target = torch.rand(3, 4, 32, 32, generator=generator, dtype=torch.float64)
+    estimated_target = target + 0.1 * torch.randn(3, 4, 32, 32, generator=generator, dtype=torch.float64)
+    return estimated_target, target
+
+
+def per_band_iqa(estimated_target, target):
+    """Computes metrics band by band with skimage as done by experiments evaluation
+
+    Data range of float images is set explicitly to skimage former default of 2,
+    recent skimage versions require it to be specified
+    """
+    batch_size, channels, height, width = target.shape
+    estimated_target = estimated_target.clamp(min=0).numpy()
+    target = target.clamp(min=0).numpy()
+    psnr, ssim = [], []
+    for src, tgt in zip(estimated_target.reshape(-1, height, width), target.reshape(-1, height, width)):
+        data_range = np.max([src, tgt])
+        psnr += [metrics.psnr(tgt / data_range, src / data_range)]
+        ssim += [structural_similarity(tgt / data_range, src / data_range, data_range=2)]
+    psnr = np.asarray(psnr).reshape(batch_size, channels)
+    ssim = np.asarray(ssim).reshape(batch_size, channels)
+    sam = metrics.sam(target.transpose(0, 2, 3, 1), estimated_target.transpose(0, 2, 3, 1))
+    return psnr, ssim, sam
+
+
+def test_batch_iqa_matches_per_band_metrics(images):
+    estimated_target, target = images
+    psnr, ssim, sam = metrics.batch_iqa(target, estimated_target)
+    expected_psnr, expected_ssim, expected_sam = per_band_iqa(estimated_target, target)
+    np.testing.assert_allclose(psnr.numpy(), expected_psnr, rtol=1e-6)
+    np.testing.assert_allclose(ssim.numpy(), expected_ssim, rtol=1e-6)
+    np.testing.assert_allclose(sam.numpy(), expected_sam, atol=1e-6)
+
+
+def test_batch_iqa_float32_close_to_per_band_metrics(images):
+    estimated_target, target = images
+    psnr, ssim, sam = metrics.batch_iqa(target.float(), estimated_target.float())
+    expected_psnr, expected_ssim, expected_sam = per_band_iqa(estimated_target, target)
+    np.testing.assert_allclose(psnr.numpy(), expected_psnr, rtol=1e-4)
+    np.testing.assert_allclose(ssim.numpy(), expected_ssim, atol=1e-4)
+    np.testing.assert_allclose(sam.mean().item(), expected_sam.mean(), atol=1e-4)
+
+
+def test_gaussian_batch_ssim_matches_skimage(images):
+    estimated_target, target = images
+    ssim = metrics.batch_ssim(target, estimated_target, gaussian=True, sigma=1.5, data_range=1.)
+    expected_ssim = [structural_similarity(tgt, src, gaussian_weights=True, sigma=1.5,
+                                           use_sample_covariance=False, data_range=1.)
+                     for src, tgt in zip(estimated_target.numpy().reshape(-1, 32, 32),
+                                         target.numpy().reshape(-1, 32, 32))]
+    np.testing.assert_allclose(ssim.numpy(), np.reshape(expected_ssim, (3, 4)), rtol=1e-6)
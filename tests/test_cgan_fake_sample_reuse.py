@@ -0,0 +1,97 @@
+import types
+import pytest
+import torch
+from src.deep_reflectance_fusion.models import build_model
+from src.deep_reflectance_fusion.experiments import cGANFusionMODISLandsat
+
+
+def make_experiment(reuse_fake_sample):
+    torch.manual_seed(0)
+    generator = build_model({'name': 'unet',
+                             'input_size': [8, 32, 32],
+                             'out_channels': 4,
+                             'enc_filters': [8, 16, 32, 32],
+                             'enc_kwargs': [{'bn': False, 'relu': False}, {}, {}, {'stride': 1}],
+                             'dec_filters': [32, 16, 8, 8],
+                             'dec_kwargs': [{'kernel_size': 2, 'stride': 1, 'padding': 0}, {}, {},
+                                            {'relu': False, 'bn': False}]})
+    discriminator = build_model({'name': 'patchgan',
+                                 'input_size': [12, 32, 32],
+                                 'n_filters': [8, 16, 1],
+                                 'conv_kwargs': [{'bn': False}, {}, {'stride': 1, 'bn': False, 'relu': False}]})
+    dataset = [(torch.rand(8, 32, 32), torch.rand(4, 32, 32)) for _ in range(10)]
+    experiment = cGANFusionMODISLandsat(generator=generator,
+                                        discriminator=discriminator,
+                                        dataset=dataset,
+                                        split=[0.8, 0.2],
+                                        dataloader_kwargs={'batch_size': 2},
+                                        optimizer_kwargs={'generator': {'lr': 1e-3}, 'discriminator': {'lr': 1e-3}},
+                                        lr_scheduler_kwargs={'generator': {'gamma': 0.99},
+                                                             'discriminator': {'gamma': 0.99}},
+                                        supervision_weight=100,
+                                        seed=0,
+                                        reuse_fake_sample=reuse_fake_sample)
+    experiment.logger = types.SimpleNamespace()
+
+    # Count generator forward passes
+    experiment.n_forward = 0
+
+    def count_forward(module, inputs, output):
+        experiment.n_forward += 1
+    experiment.model.register_forward_hook(count_forward)
+    return experiment
+
+
+def make_batch(seed):
+    generator = torch.Generator().manual_seed(seed)
+    return torch.rand(2, 8, 32, 32, generator=generator), torch.rand(2, 4, 32, 32, generator=generator)
+
+
+def optimizers_sequence(experiment, n_batches):
+    """Reproduces lightning sequence of (batch_idx, optimizer_idx) training
+    steps given optimizers frequencies
+    """
+    optimizers = experiment.configure_optimizers()
+    frequencies = [optimizer.get('frequency') for optimizer in optimizers]
+    if None in frequencies:
+        return [(batch_idx, optimizer_idx) for batch_idx in range(n_batches) for optimizer_idx in range(2)]
+    cycle = sum([[optimizer_idx] * frequency for optimizer_idx, frequency in enumerate(frequencies)], [])
+    return [(batch_idx, cycle[batch_idx % len(cycle)]) for batch_idx in range(n_batches)]
+
+
+@pytest.mark.parametrize('reuse_fake_sample', [False, True])
+def test_generator_runs_once_per_training_batch(reuse_fake_sample):
+    experiment = make_experiment(reuse_fake_sample)
+    sequence = optimizers_sequence(experiment, n_batches=6)
+
+    # Both networks are updated on each batch when reusing fake samples, else alternately
+    assert len(sequence) == (12 if reuse_fake_sample else 6)
+    for batch_idx, optimizer_idx in sequence:
+        output = experiment.training_step(make_batch(batch_idx), batch_idx, optimizer_idx)
+        assert torch.isfinite(output['loss'])
+    assert experiment.n_forward == 6
+
+
+def test_fake_sample_cache_is_keyed_by_batch_index():
+    experiment = make_experiment(reuse_fake_sample=True)
+
+    # Discriminator step on the batch of generator step reuses fake sample
+    experiment.training_step(make_batch(0), 0, 0)
+    cache = experiment._fake_sample_cache
+    unfolded_batch = experiment._unfold_training_batch(make_batch(0), 0, 1)
+    assert all(tensor is cached_tensor for tensor, cached_tensor in zip(unfolded_batch, cache[1:]))
+    assert experiment.n_forward == 1 and experiment._fake_sample_cache is None
+
+    # Discriminator step on another batch generates its own fake sample
+    experiment.training_step(make_batch(1), 1, 0)
+    experiment.training_step(make_batch(2), 2, 1)
+    assert experiment.n_forward == 3 and experiment._fake_sample_cache is None
+
+
+@pytest.mark.parametrize('reuse_fake_sample', [False, True])
+def test_validation_step_runs_single_forward(reuse_fake_sample):
+    experiment = make_experiment(reuse_fake_sample)
+    with torch.no_grad():
+        for batch_idx in range(3):
+            experiment.validation_step(make_batch(batch_idx), batch_idx)
+    assert experiment.n_forward == 3
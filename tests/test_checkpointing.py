@@ -0,0 +1,56 @@
+import copy
+import pytest
+import torch
+from src.deep_reflectance_fusion.models import build_model
+
+
+def make_unet_cfg(checkpoint_every=None):
+    return {'name': 'unet',
+            'input_size': [8, 32, 32],
+            'out_channels': 4,
+            'checkpoint_every': checkpoint_every,
+            'enc_filters': [8, 16, 32, 32],
+            'enc_kwargs': [{'relu': False}, {}, {}, {'stride': 1}],
+            'dec_filters': [32, 16, 8, 8],
+            'dec_kwargs': [{'dropout': 0.4, 'kernel_size': 2, 'stride': 1, 'padding': 0},
+                           {'dropout': 0.4}, {}, {'relu': False, 'bn': False}]}
+
+
+def run_step(model, x, seed=1):
+    torch.manual_seed(seed)
+    output = model(x)
+    output.pow(2).mean().backward()
+    return output
+
+
+@pytest.mark.parametrize('checkpoint_every', [1, 2, 3, 8])
+def test_checkpointed_unet_matches_unet(checkpoint_every):
+    torch.manual_seed(0)
+    model = build_model(make_unet_cfg())
+    checkpointed_model = copy.deepcopy(model)
+    checkpointed_model.encoder.checkpoint_every = checkpoint_every
+    checkpointed_model.decoder.checkpoint_every = checkpoint_every
+    x = torch.randn(2, 8, 32, 32)
+
+    output = run_step(model, x)
+    checkpointed_output = run_step(checkpointed_model, x)
+
+    # Outputs, gradients and batch normalization running statistics must match
+    assert torch.allclose(checkpointed_output, output, atol=1e-6)
+    for (name, param), checkpointed_param in zip(model.named_parameters(), checkpointed_model.parameters()):
+        assert torch.allclose(checkpointed_param.grad, param.grad, atol=1e-6), f"Gradient mismatch on {name}"
+    for (name, buffer), checkpointed_buffer in zip(model.named_buffers(), checkpointed_model.buffers()):
+        assert torch.equal(checkpointed_buffer, buffer), f"Buffer mismatch on {name}"
+
+
+@pytest.mark.parametrize('checkpoint_every', [1, 8])
+def test_first_encoding_blocks_are_checkpointed(checkpoint_every):
+    model = build_model(make_unet_cfg(checkpoint_every))
+    features = model.encoder(torch.randn(2, 8, 32, 32))
+    assert all('Checkpoint' in type(feature.grad_fn).__name__ for feature in features)
+
+
+def test_checkpointing_disabled_in_eval_mode():
+    model = build_model(make_unet_cfg(checkpoint_every=1)).eval()
+    features = model.encoder(torch.randn(2, 8, 32, 32))
+    assert not any('Checkpoint' in type(feature.grad_fn).__name__ for feature in features)
@@ -0,0 +1,40 @@
+import pytest
+import torch
+from torch.utils.data import DataLoader
+from src.deep_reflectance_fusion.experiments.utils import collate
+
+
+def make_samples(n_samples, raw):
+    generator = torch.Generator().manual_seed(0)
+    dtype = torch.int16 if raw else torch.float32
+    samples = []
+    for _ in range(n_samples):
+        landsat, modis, target = torch.randint(0, 10000, (3, 4, 16, 16), generator=generator).to(dtype)
+        samples += [((landsat, modis), target)]
+    return samples
+
+
+def flatten(batch):
+    data, target = batch
+    return (list(data) if isinstance(data, tuple) else [data]) + [target]
+
+
+@pytest.mark.parametrize('raw', [False, True])
+def test_buffered_collate_matches_stack_and_reuses_buffers(raw):
+    samples = make_samples(n_samples=10, raw=raw)
+    stack_fn = collate.stack_raw_frames if raw else collate.stack_input_frames
+    collate_fn = collate.BufferedStackInputFrames(n_buffers=2, raw=raw)
+    loader = DataLoader(samples, batch_size=4, collate_fn=collate_fn, num_workers=0)
+    reference_loader = DataLoader(samples, batch_size=4, collate_fn=stack_fn)
+
+    storages = []
+    for batch, reference_batch in zip(loader, reference_loader):
+        for tensor, reference_tensor in zip(flatten(batch), flatten(reference_batch)):
+            assert tensor.dtype == reference_tensor.dtype
+            assert torch.equal(tensor, reference_tensor)
+        storages += [[tensor.data_ptr() for tensor in flatten(batch)]]
+
+    # Batches are written into the 2 buffers of the ring in turn, last smaller batch included
+    assert len(storages) == 3
+    assert storages[2] == storages[0]
+    assert all(ptr not in storages[0] for ptr in storages[1])
@@ -0,0 +1,65 @@
+import os
+import copy
+import glob
+import types
+import pytest
+import torch
+from src.utils import load_yaml
+from src.deep_reflectance_fusion.models import build_model
+from src.deep_reflectance_fusion.models.modules import fuse_for_inference, export_torchscript, check_parity
+from src.deep_reflectance_fusion.experiments import ResidualEarlyFusionMODISLandsat, ResidualcGANFusionMODISLandsat
+
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), '../src/deep_reflectance_fusion/config/modis_landsat_fusion')
+CONFIG_PATHS = sorted(glob.glob(os.path.join(CONFIG_DIR, '*/*.yaml')))
+
+
+def load_generator_cfg(cfg_path, width_divider=16):
+    """Loads configured generator with fewer filters to keep tests light,
+    layers specifications being left unchanged
+    """
+    cfg = load_yaml(cfg_path)['model']
+    cfg = copy.deepcopy(cfg.get('generator', cfg))
+    cfg['enc_filters'] = [max(n // width_divider, 4) for n in cfg['enc_filters']]
+    cfg['dec_filters'] = [max(n // width_divider, 4) for n in cfg['dec_filters']]
+    return cfg
+
+
+def make_generator(cfg_path):
+    torch.manual_seed(0)
+    model = build_model(load_generator_cfg(cfg_path))
+
+    # Run a few training steps such that batch normalization statistics are not trivial
+    with torch.no_grad():
+        for _ in range(3):
+            model(torch.rand(2, *model.input_size))
+    return model.eval()
+
+
+@pytest.mark.parametrize('cfg_path', CONFIG_PATHS, ids=os.path.basename)
+@pytest.mark.parametrize('trace', [False, True], ids=['script', 'trace'])
+def test_exported_generator_matches_eager(cfg_path, trace):
+    model = make_generator(cfg_path)
+    example = torch.rand(2, *model.input_size)
+    exported = export_torchscript(model=model, example=example, trace=trace)
+    assert check_parity(model=model, exported=exported, example=example, atol=1e-5) <= 1e-5
+
+
+@pytest.mark.parametrize('cfg_path', CONFIG_PATHS, ids=os.path.basename)
+def test_exported_fused_generator_matches_eager(cfg_path):
+    model = make_generator(cfg_path)
+    example = torch.rand(2, *model.input_size)
+    fused_model = fuse_for_inference(copy.deepcopy(model))
+    exported = export_torchscript(model=fused_model, example=example)
+    assert check_parity(model=model, exported=exported, example=example, atol=1e-4) <= 1e-4
+
+
+@pytest.mark.parametrize('experiment_cls', [ResidualEarlyFusionMODISLandsat, ResidualcGANFusionMODISLandsat])
+def test_exported_residual_model_matches_experiment_forward(experiment_cls):
+    # Residual experiments only hold generator as model attribute in forward pass
+    experiment = types.SimpleNamespace(model=make_generator(CONFIG_PATHS[0]))
+    example = torch.rand(2, *experiment.model.input_size)
+    exported = export_torchscript(model=experiment_cls.inference_model(experiment), example=example)
+    with torch.no_grad():
+        output = experiment_cls.forward(experiment, example)
+    assert torch.allclose(exported(example), output, atol=1e-5)
@@ -0,0 +1,47 @@
+import copy
+import pytest
+import torch
+from src.deep_reflectance_fusion.models import build_model
+from src.deep_reflectance_fusion.models.modules import quantize_weights_int8, quantize_static_int8
+
+
+def make_unet():
+    torch.manual_seed(0)
+    model = build_model({'name': 'unet',
+                         'input_size': [8, 32, 32],
+                         'out_channels': 4,
+                         'enc_filters': [8, 16, 32, 32],
+                         'enc_kwargs': [{'relu': False}, {'relu': True}, {'leak': 0.2, 'relu': True}, {'stride': 1}],
+                         'dec_filters': [32, 16, 8, 8],
+                         'dec_kwargs': [{'kernel_size': 2, 'stride': 1, 'padding': 0}, {}, {}, {'relu': False, 'bn': False}]})
+
+    # Run a few training steps such that batch normalization statistics are not trivial
+    with torch.no_grad():
+        for _ in range(3):
+            model(torch.rand(4, 8, 32, 32))
+    return model.eval()
+
+
+def test_weight_only_quantization_close_to_fp32():
+    model = make_unet()
+    quantized_model = quantize_weights_int8(model)
+    x = torch.rand(2, 8, 32, 32)
+    with torch.no_grad():
+        error = (quantized_model(x) - model(x)).abs().max()
+    assert error < 0.05
+
+
+@pytest.mark.skipif('fbgemm' not in torch.backends.quantized.supported_engines, reason="fbgemm engine unavailable")
+def test_static_quantization_close_to_fp32():
+    model = make_unet()
+    reference = copy.deepcopy(model)
+    calibration_inputs = [torch.rand(4, 8, 32, 32) for _ in range(4)]
+    quantized_model = quantize_static_int8(model, calibration_inputs, backend='fbgemm')
+    x = torch.rand(2, 8, 32, 32)
+    with torch.no_grad():
+        output, quantized_output = model(x), quantized_model(x)
+
+    # Input model is left unchanged and quantized convolutions are int8
+    assert all(torch.equal(p, q) for p, q in zip(model.state_dict().values(), reference.state_dict().values()))
+    assert any(isinstance(m, torch.nn.quantized.Conv2d) for m in quantized_model.modules())
+    assert (quantized_output - output).abs().max() < 0.1 * output.abs().max()
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import pytest
+import torch
+from src.prepare_data.preprocessing.patch_extraction import PatchExport, PatchDataset, ShardWriter
+from src.deep_reflectance_fusion.data import MODISLandsatReflectanceFusionDataset, FlatConcatDataset, \
+    ShardedFusionDataset
+
+
+def make_store(root, n_patches=5, size=8):
+    """Dumps patches with time series of different lengths following
+    PatchExport protocol
+    """
+    rng = np.random.RandomState(0)
+    export = PatchExport(root)
+    for patch_idx in range(n_patches):
+        export.setup_output_dir(patch_idx)
+        index = export.setup_index(patch_idx, [0, size, 0, size])
+        for day in range(3 + patch_idx):
+            modis, landsat = rng.randint(0, 10000, (2, 4, size, size)).astype(np.int16)
+            index = export.update_index(index, patch_idx, f'2018-01-{day + 1:02d}')
+            export.dump_patches(patch_idx, modis, landsat, f'2018-01-{day + 1:02d}')
+        export.dump_index(index, patch_idx)
+
+
+@pytest.fixture
+def stores(tmp_path):
+    """Exports patches store into small shards of a few records as done by
+    export_shards.py, returns patches dataset and shards directory
+    """
+    root, shards_root = str(tmp_path / 'patches'), str(tmp_path / 'shards')
+    make_store(root)
+    dataset = MODISLandsatReflectanceFusionDataset(root=root, raw=True)
+    with ShardWriter(output_dir=shards_root, max_shard_size=2 * 8 * 4 * 8 * 8 * 2) as writer:
+        for position, name in enumerate(dataset.manifest.names):
+            patch_dataset = PatchDataset(root=os.path.join(root, str(name)), manifest=dataset.manifest,
+                                         position=position)
+            writer.write(name=str(name),
+                         dates=dataset.manifest.frame_dates(position).astype(str),
+                         modis_frames=patch_dataset.load_time_serie('modis'),
+                         landsat_frames=patch_dataset.load_time_serie('landsat'))
+    return dataset, shards_root
+
+
+def assert_samples_equal(sample, other_sample):
+    (landsat, modis), target = sample
+    (other_landsat, other_modis), other_target = other_sample
+    assert torch.equal(landsat, other_landsat)
+    assert torch.equal(modis, other_modis)
+    assert torch.equal(target, other_target)
+
+
+def test_sharded_samples_match_patches_samples(stores):
+    dataset, shards_root = stores
+    names = [str(dataset.manifest.names[i]) for i in (0, 2, 3)]
+    sharded_dataset = ShardedFusionDataset(root=shards_root, names=names)
+    samples = list(FlatConcatDataset([dataset[i] for i in (0, 2, 3)]))
+    sharded_samples = list(sharded_dataset)
+
+    assert len(os.listdir(shards_root)) > 2
+    assert len(sharded_dataset) == len(sharded_samples) == len(samples)
+    for sample, sharded_sample in zip(samples, sharded_samples):
+        assert_samples_equal(sample, sharded_sample)
+
+
+@pytest.mark.parametrize('world_size,num_workers', [(2, 1), (2, 3), (3, 2)])
+def test_sharded_splits_are_balanced_and_disjoint(stores, world_size, num_workers):
+    dataset, shards_root = stores
+    samples = list(FlatConcatDataset(dataset))
+    n_splits = world_size * num_workers
+    splits_samples = []
+    for split in range(n_splits):
+        sharded_dataset = ShardedFusionDataset(root=shards_root)
+        sharded_dataset._get_world_size = lambda: world_size
+        sharded_dataset._get_split = lambda: (split, n_splits)
+        splits_samples += [list(sharded_dataset)]
+
+    # Split s holds samples s, s + n_splits, etc. up to leftovers dropped to balance ranks
+    n_samples = len(samples) // world_size * world_size
+    for split, split_samples in enumerate(splits_samples):
+        assert len(split_samples) == len(range(split, n_samples, n_splits))
+        for sample, split_sample in zip(samples[split:n_samples:n_splits], split_samples):
+            assert_samples_equal(sample, split_sample)
+
+    # Worker w of rank r reads split r + world_size * w, all ranks read as many samples
+    for rank in range(world_size):
+        rank_length = sum(len(splits_samples[rank + world_size * worker]) for worker in range(num_workers))
+        assert rank_length == len(sharded_dataset)
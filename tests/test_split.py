@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import pytest
+from src.prepare_data.preprocessing import PatchManifest
+from src.deep_reflectance_fusion.data import SplitManifest
+
+
+def make_manifest(order=None, n_patches=23):
+    """Builds manifest of patches with time series of different lengths,
+    listed in specified order, without dumping any frame
+    """
+    order = range(n_patches) if order is None else order
+    names = [f'patch_{idx:03d}' for idx in order]
+    indices = [{'features': {'patch_idx': int(idx), 'patch_bounds': [0, 8, 0, 8]},
+                'files': {str(t + 1): {'date': f'2018-01-{t + 1:02d}',
+                                       'modis': f'modis/2018-01-{t + 1:02d}.h5',
+                                       'landsat': f'landsat/2018-01-{t + 1:02d}.h5'}
+                          for t in range(2 + idx % 5)}}
+               for idx in order]
+    return PatchManifest.from_indices(names, indices)
+
+
+def make_cfg(root, split_cache, split=(0.7, 0.15, 0.15)):
+    return {'root': root,
+            'split': dict(zip(('train', 'val', 'test'), split)),
+            'split_cache': split_cache}
+
+
+@pytest.mark.parametrize('split', [[0.7, 0.15, 0.15], [0.8, 0.2]])
+def test_split_subsets_are_disjoint_and_cover_patches(split):
+    manifest = make_manifest()
+    split_manifest = SplitManifest.from_manifest(manifest=manifest, split=split, seed=73)
+    subsets = [split_manifest.subsets[key] for key in SplitManifest._subsets[:len(split)]]
+
+    # Subsets do not overlap and leftovers go to last subset
+    names = sum(subsets, [])
+    assert sorted(names) == sorted(manifest.names.tolist())
+    assert len(set(names)) == len(names)
+    assert [len(subset) for subset in subsets[:-1]] == [int(r * len(manifest)) for r in split[:-1]]
+
+
+def test_reloaded_split_matches_drawn_split(tmp_path):
+    manifest = make_manifest()
+    directory = str(tmp_path / 'splits')
+    split_manifest = SplitManifest.get_or_create(directory=directory, manifest=manifest,
+                                                 split=[0.7, 0.15, 0.15], seed=73)
+    reloaded_split_manifest = SplitManifest.get_or_create(directory=directory, manifest=manifest,
+                                                          split=[0.7, 0.15, 0.15], seed=73)
+    assert len(os.listdir(directory)) == 1
+    assert reloaded_split_manifest.subsets == split_manifest.subsets
+
+    # Split is independent of patches listing order
+    shuffled_manifest = make_manifest(order=np.random.RandomState(0).permutation(23))
+    shuffled_split_manifest = SplitManifest.from_manifest(manifest=shuffled_manifest, split=[0.7, 0.15, 0.15], seed=73)
+    assert shuffled_split_manifest.subsets == split_manifest.subsets
+
+
+def test_split_from_config_without_cached_split_raises(tmp_path, monkeypatch):
+    manifest = make_manifest()
+    monkeypatch.setattr(PatchManifest, 'from_root', classmethod(lambda cls, root: manifest))
+    cfg = make_cfg(root=str(tmp_path), split_cache=str(tmp_path / 'splits'))
+    with pytest.raises(FileNotFoundError):
+        SplitManifest.from_config(cfg, seed=73, create=False)
+
+    split_manifest = SplitManifest.from_config(cfg, seed=73)
+    assert SplitManifest.from_config(cfg, seed=73, create=False).subsets == split_manifest.subsets
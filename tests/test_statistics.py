@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pytest
+from src.prepare_data.preprocessing.patch_extraction import PatchExport, PatchManifest
+
+
+def make_store(root, n_patches=3, n_dates=4, n_bands=4, size=8):
+    """Dumps random int16 frames with some out of valid range pixels following
+    PatchExport protocol and returns dumped frames by file type
+    """
+    rng = np.random.RandomState(0)
+    export = PatchExport(root)
+    frames = {'modis': [], 'landsat': []}
+    for patch_idx in range(n_patches):
+        export.setup_output_dir(patch_idx)
+        index = export.setup_index(patch_idx, [0, size, 0, size])
+        for day in range(n_dates):
+            modis, landsat = rng.randint(-100, 10100, (2, n_bands, size, size)).astype(np.int16)
+            index = export.update_index(index, patch_idx, f'2018-01-{day + 1:02d}')
+            export.dump_patches(patch_idx, modis, landsat, f'2018-01-{day + 1:02d}')
+            frames['modis'] += [modis]
+            frames['landsat'] += [landsat]
+        export.dump_index(index, patch_idx)
+    return frames
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_computed_statistics_match_numpy(tmp_path, n_jobs):
+    pytest.importorskip('docopt')
+    pytest.importorskip('progress')
+    from src.prepare_data.preprocessing.patch_extraction import compute_statistics
+
+    root = str(tmp_path)
+    frames = make_store(root)
+    compute_statistics.main({'--root': root, '--njobs': str(n_jobs), '--valid_min': '0', '--valid_max': '10000'})
+    manifest = PatchManifest.load(os.path.join(root, PatchManifest._manifest_name))
+
+    for file_type in PatchManifest._file_types:
+        # Gather bandwise valid pixels of all frames
+        bands = np.stack(frames[file_type], axis=1).reshape(4, -1)
+        statistics = manifest.statistics[file_type]
+        for band_idx, band in enumerate(bands):
+            valid_pixels = band[(band >= 0) & (band <= 10000)].astype(np.float64)
+            assert statistics['valid_count'][band_idx] == valid_pixels.size
+            assert statistics['total_count'][band_idx] == band.size
+            assert np.isclose(statistics['mean'][band_idx], valid_pixels.mean(), rtol=1e-10)
+            assert np.isclose(statistics['std'][band_idx], valid_pixels.std(), rtol=1e-10)
@@ -0,0 +1,31 @@
+import copy
+import pytest
+import torch
+from src.deep_reflectance_fusion.models import build_model
+
+
+UNET_CFG = {'name': 'unet',
+            'input_size': [8, 32, 32],
+            'out_channels': 4,
+            'enc_filters': [8, 16, 32, 32],
+            'enc_kwargs': [{'relu': False}, {}, {}, {'stride': 1}],
+            'dec_filters': [32, 16, 8, 8],
+            'dec_kwargs': [{'kernel_size': 2, 'stride': 1, 'padding': 0}, {}, {}, {'relu': False, 'bn': False}]}
+
+
+@pytest.mark.parametrize('input_size', [[8, 32, 32], [8, 64, 48]])
+def test_unet_output_size_matches_forward(input_size):
+    cfg = copy.deepcopy(UNET_CFG)
+    cfg['input_size'] = input_size
+    model = build_model(cfg).eval()
+    with torch.no_grad():
+        output = model(torch.rand(2, *input_size))
+    assert tuple(output.shape[1:]) == tuple(model.output_size)
+
+
+@pytest.mark.parametrize('input_size', [[8, 36, 32], [8, 32, 20]])
+def test_unet_with_incompatible_input_size_fails_at_build(input_size):
+    cfg = copy.deepcopy(UNET_CFG)
+    cfg['input_size'] = input_size
+    with pytest.raises(AssertionError, match="does not match skip features size"):
+        build_model(cfg)